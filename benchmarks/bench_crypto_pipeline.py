@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the crypto streaming path without Binance or a Kafka broker.
+
+    replay server -> binance_websocket shards -> in-memory Kafka -> consumer thread
+    (decode + calculate_direction_trade_values) -> latency from exchange time T
+
+Run from the project root:
+    python -m benchmarks.bench_crypto_pipeline --duration 20 --rate 5000 --shards 2
+    python -m benchmarks.bench_crypto_pipeline --rate 1000 --burst-multiplier 100 --burst-every 10
+"""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+
+import binance_websocket
+from benchmarks.in_memory_kafka import InMemoryBroker, InMemoryProducer
+from benchmarks.replay_server import add_source_arguments, build_server
+from utils.compact_trade_format import CompactTradeSerializer, decode_trade_messages
+from utils.trade_codecs import get_codec
+from utils.trade_direction import add_direction_values
+
+DEFAULT_SYMBOLS = ["btcusdt", "ethusdt", "bnbusdt", "adausdt", "maticusdt", "solusdt"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class TransformerConsumer(threading.Thread):
+    """Polls the in-memory topic like the Mage Kafka source and runs the streaming transformer"""
+
+    def __init__(self, broker, topic, batch_size):
+        super().__init__(name="transformer-consumer", daemon=True)
+        self.broker = broker
+        self.topic = topic
+        self.batch_size = batch_size
+        self.latencies_ms = []
+        self.consumed = 0
+        self.batches = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set() or self.broker.size(self.topic) > self.consumed:
+            records = self.broker.poll(self.topic, max_records=self.batch_size, timeout=0.1)
+            if not records:
+                continue
+            messages = add_direction_values(decode_trade_messages([record.value for record in records]))
+            done_ms = time.time() * 1000
+            self.latencies_ms.extend(done_ms - message["timestamp"] for message in messages)
+            self.consumed += len(messages)
+            self.batches += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+
+async def run_benchmark(args):
+    server = await build_server(args, port=args.port).start()
+    broker = InMemoryBroker()
+    codec = get_codec(args.codec)
+    value_serializer = CompactTradeSerializer() if args.wire_format == "compact" else codec.encode
+    base_url = f"ws://127.0.0.1:{args.port}/stream"
+
+    symbols = [f"sym{i}usdt" for i in range(args.symbols)] if args.symbols else DEFAULT_SYMBOLS
+    shards = []
+    for shard_id, shard_symbols in enumerate(binance_websocket.assign_shards(symbols, args.shards)):
+        producer = InMemoryProducer(broker, value_serializer=value_serializer,
+                                    key_serializer=lambda k: k.encode("utf-8") if k else None)
+        publisher = binance_websocket.TradePublisher(
+            producer, codec, batch_size=args.publish_batch_size, linger_ms=args.linger_ms,
+            overflow_policy=args.overflow_policy)
+        shards.append(binance_websocket.Shard(shard_id, shard_symbols, publisher, base_url=base_url))
+
+    consumer = TransformerConsumer(broker, binance_websocket.KAFKA_TOPIC, args.consumer_batch_size)
+    consumer.start()
+
+    started = time.monotonic()
+    publishing = asyncio.create_task(binance_websocket.run_shards(shards, report=lambda healths: None))
+    await asyncio.sleep(args.duration)
+    publishing.cancel()
+    try:
+        await publishing
+    except asyncio.CancelledError:
+        pass
+    await server.stop()
+
+    consumer.stop()
+    consumer.join()
+    elapsed = time.monotonic() - started
+    for shard in shards:
+        shard.publisher.close()
+
+    health = binance_websocket.aggregate_health([shard.health() for shard in shards])
+    latencies = sorted(consumer.latencies_ms)
+    return {
+        "duration_seconds": round(elapsed, 2),
+        "frames_sent": server.frames_sent,
+        "published": health["published"],
+        "dropped": health["dropped"],
+        "consumed": consumer.consumed,
+        "consumer_batches": consumer.batches,
+        "throughput_msgs_per_sec": round(consumer.consumed / elapsed, 1),
+        "latency_p50_ms": percentile(latencies, 0.50),
+        "latency_p99_ms": percentile(latencies, 0.99),
+        "latency_max_ms": latencies[-1] if latencies else None,
+        "max_queue_high_watermark": health["max_queue_high_watermark"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=15, help="Seconds to run")
+    parser.add_argument("--port", type=int, default=9443)
+    parser.add_argument("--symbols", type=int, default=0, help="Number of synthetic symbols (default: the 6 live ones)")
+    parser.add_argument("--shards", type=int, default=None, help="Websocket connections (default: automatic)")
+    parser.add_argument("--codec", default="auto")
+    parser.add_argument("--wire-format", default="json", choices=["json", "compact"])
+    parser.add_argument("--publish-batch-size", type=int, default=binance_websocket.PUBLISH_BATCH_SIZE)
+    parser.add_argument("--linger-ms", type=float, default=binance_websocket.PUBLISH_LINGER_MS)
+    parser.add_argument("--overflow-policy", default=binance_websocket.OVERFLOW_POLICY,
+                        choices=binance_websocket.OVERFLOW_POLICIES)
+    parser.add_argument("--consumer-batch-size", type=int, default=100, help="Mirrors batch_size in the Kafka loader")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = asyncio.run(run_benchmark(args))
+    width = max(len(key) for key in results)
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:,.2f}"
+        print(f"{key:<{width}}  {value}")
+
+
+if __name__ == "__main__":
+    main()
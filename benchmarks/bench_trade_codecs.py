@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Single-core throughput of each installed trade codec.
+
+Run from the project root:
+    python -m benchmarks.bench_trade_codecs --messages 200000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from utils.compact_trade_format import CompactTradeSerializer, decode_compact_trade
+from utils.trade_codecs import available_codecs, get_codec
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "MATICUSDT", "SOLUSDT"]
+
+
+def make_frames(count, seed=7):
+    """Synthetic combined-stream trade frames shaped like Binance futures @trade events"""
+    rng = random.Random(seed)
+    frames = []
+    now_ms = int(time.time() * 1000)
+    for i in range(count):
+        symbol = rng.choice(SYMBOLS)
+        frames.append(json.dumps({
+            "stream": f"{symbol.lower()}@trade",
+            "data": {
+                "e": "trade",
+                "E": now_ms + i,
+                "T": now_ms + i,
+                "s": symbol,
+                "t": 5000000000 + i,
+                "p": f"{rng.uniform(0.3, 70000):.2f}",
+                "q": f"{rng.uniform(0.001, 50):.3f}",
+                "X": "MARKET",
+                "m": rng.random() < 0.5,
+            },
+        }, separators=(",", ":")).encode("utf-8"))
+    return frames
+
+
+def make_payloads(events, processing_time):
+    return [{
+        "symbol": e.symbol,
+        "price": e.price,
+        "quantity": e.quantity,
+        "timestamp": e.timestamp,
+        "buyer_maker": e.buyer_maker,
+        "trade_id": e.trade_id,
+        "stream": e.stream,
+        "processing_time": processing_time,
+        "exchange": "binance",
+        "data_type": "trade",
+    } for e in events]
+
+
+def bench_codec(codec, frames):
+    start = time.perf_counter()
+    events = [codec.decode_trade(frame) for frame in frames]
+    decode_seconds = time.perf_counter() - start
+
+    payloads = make_payloads(events, datetime.now().isoformat())
+
+    start = time.perf_counter()
+    encoded = [codec.encode(payload) for payload in payloads]
+    encode_seconds = time.perf_counter() - start
+
+    count = len(frames)
+    return {
+        "codec": codec.name,
+        "decode_msgs_per_sec": count / decode_seconds,
+        "encode_msgs_per_sec": count / encode_seconds,
+        "round_trip_msgs_per_sec": count / (decode_seconds + encode_seconds),
+        "avg_payload_bytes": sum(len(b) for b in encoded) / count,
+    }
+
+
+def bench_compact(frames):
+    """Kafka-side cost of the compact wire format: encode in the publisher, decode in the loader"""
+    payloads = make_payloads([get_codec("json").decode_trade(frame) for frame in frames],
+                             datetime.now().isoformat())
+    serialize = CompactTradeSerializer()
+
+    start = time.perf_counter()
+    encoded = [serialize(payload) for payload in payloads]
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for value in encoded:
+        decode_compact_trade(value)
+    decode_seconds = time.perf_counter() - start
+
+    count = len(frames)
+    return {
+        "codec": "compact",
+        "decode_msgs_per_sec": count / decode_seconds,
+        "encode_msgs_per_sec": count / encode_seconds,
+        "round_trip_msgs_per_sec": count / (decode_seconds + encode_seconds),
+        "avg_payload_bytes": sum(len(b) for b in encoded) / count,
+    }
+
+
+def print_row(result):
+    print(f"{result['codec']:<10}"
+          f"{result['decode_msgs_per_sec']:>14,.0f}"
+          f"{result['encode_msgs_per_sec']:>14,.0f}"
+          f"{result['round_trip_msgs_per_sec']:>16,.0f}"
+          f"{result['avg_payload_bytes']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs per codec")
+    args = parser.parse_args()
+
+    frames = make_frames(args.messages)
+    print(f"{args.messages} frames, codecs installed: {', '.join(available_codecs())}")
+    print(f"{'codec':<10}{'decode/s':>14}{'encode/s':>14}{'round trip/s':>16}{'bytes/msg':>12}")
+
+    for name in available_codecs():
+        codec = get_codec(name)
+        results = [bench_codec(codec, frames) for _ in range(args.repeat)]
+        print_row(max(results, key=lambda r: r["round_trip_msgs_per_sec"]))
+
+    # The compact row decodes Kafka values, not websocket frames
+    results = [bench_compact(frames) for _ in range(args.repeat)]
+    print_row(max(results, key=lambda r: r["round_trip_msgs_per_sec"]))
+
+
+if __name__ == "__main__":
+    main()
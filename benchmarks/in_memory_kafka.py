@@ -0,0 +1,101 @@
+"""
+In-memory stand-in for the parts of kafka-python the publisher and benchmarks use.
+
+InMemoryProducer mirrors KafkaProducer.send (serializers, futures with callbacks) and
+appends records to an InMemoryBroker. Consumers poll the broker from any thread.
+"""
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+
+
+class RecordMetadata(NamedTuple):
+    topic: str
+    partition: int
+    offset: int
+
+
+class ConsumerRecord(NamedTuple):
+    topic: str
+    partition: int
+    offset: int
+    key: bytes
+    value: bytes
+
+
+class InMemoryFuture:
+    """An already-resolved FutureRecordMetadata"""
+
+    def __init__(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+
+    def add_callback(self, f, *args, **kwargs):
+        if self.exception is None:
+            f(*args, self.value, **kwargs)
+        return self
+
+    def add_errback(self, f, *args, **kwargs):
+        if self.exception is not None:
+            f(*args, self.exception, **kwargs)
+        return self
+
+    def get(self, timeout=None):
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+class InMemoryBroker:
+    """Single-partition topics held in memory"""
+
+    def __init__(self):
+        self._records = defaultdict(list)
+        self._positions = defaultdict(int)    # (topic, group) -> next offset
+        self._condition = threading.Condition()
+
+    def append(self, topic, key, value):
+        with self._condition:
+            records = self._records[topic]
+            offset = len(records)
+            records.append(ConsumerRecord(topic, 0, offset, key, value))
+            self._condition.notify_all()
+        return RecordMetadata(topic, 0, offset)
+
+    def poll(self, topic, group="default", max_records=100, timeout=1.0):
+        """Return up to max_records unread records, waiting up to timeout for the first one"""
+        key = (topic, group)
+        with self._condition:
+            if self._positions[key] >= len(self._records[topic]):
+                self._condition.wait(timeout)
+            start = self._positions[key]
+            batch = self._records[topic][start:start + max_records]
+            self._positions[key] = start + len(batch)
+        return batch
+
+    def size(self, topic):
+        with self._condition:
+            return len(self._records[topic])
+
+
+class InMemoryProducer:
+    def __init__(self, broker, value_serializer=None, key_serializer=None):
+        self.broker = broker
+        self.value_serializer = value_serializer
+        self.key_serializer = key_serializer
+
+    def send(self, topic, value=None, key=None):
+        try:
+            if self.key_serializer is not None:
+                key = self.key_serializer(key)
+            if self.value_serializer is not None:
+                value = self.value_serializer(value)
+            return InMemoryFuture(self.broker.append(topic, key, value))
+        except Exception as e:
+            return InMemoryFuture(exception=e)
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self, timeout=None):
+        pass
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local websocket server that replays Binance combined-stream trade frames.
+
+Frames are synthetic, or replayed from a recording (one raw frame per line, e.g. captured
+from the real stream). Each connection only receives the symbols requested in its
+?streams= query, so a sharded publisher works unchanged. Trade times (T, E) are set
+to the send time, which lets downstream stages measure end-to-end latency.
+
+Run from the project root:
+    python -m benchmarks.replay_server --rate 2000 --burst-multiplier 50 --burst-every 30
+
+then point the publisher at it with BINANCE_WS_BASE_URL = "ws://127.0.0.1:9443/stream".
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import urllib.parse
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 0.01
+
+
+class RateSchedule:
+    """Base rate in frames/sec, multiplied for burst_duration seconds every burst_every seconds"""
+
+    def __init__(self, rate, burst_multiplier=1.0, burst_every=None, burst_duration=1.0):
+        self.rate = rate
+        self.burst_multiplier = burst_multiplier
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+
+    def rate_at(self, elapsed):
+        if self.burst_every and elapsed % self.burst_every >= self.burst_every - self.burst_duration:
+            return self.rate * self.burst_multiplier
+        return self.rate
+
+
+class SyntheticTrades:
+    """Random-walk trades for each symbol with sequential trade ids"""
+
+    def __init__(self, seed=7):
+        self._rng = random.Random(seed)
+        self._prices = {}
+        self._trade_ids = {}
+
+    def frame(self, symbol, now_ms):
+        rng = self._rng
+        price = self._prices.get(symbol, rng.uniform(1, 60000))
+        price = max(price * (1 + rng.gauss(0, 0.0002)), 0.0001)
+        self._prices[symbol] = price
+        trade_id = self._trade_ids.get(symbol, 1_000_000) + 1
+        self._trade_ids[symbol] = trade_id
+        return json.dumps({
+            "stream": f"{symbol}@trade",
+            "data": {
+                "e": "trade",
+                "E": now_ms,
+                "T": now_ms,
+                "s": symbol.upper(),
+                "t": trade_id,
+                "p": f"{price:.4f}",
+                "q": f"{rng.expovariate(2.0):.3f}",
+                "X": "MARKET",
+                "m": rng.random() < 0.5,
+            },
+        }, separators=(",", ":"))
+
+
+class RecordedTrades:
+    """Cycles through a recording, restamping T/E with the send time"""
+
+    def __init__(self, path):
+        with open(path) as f:
+            frames = [json.loads(line) for line in f if line.strip()]
+        self._by_symbol = {}
+        for frame in frames:
+            symbol = frame["stream"].split("@", 1)[0]
+            self._by_symbol.setdefault(symbol, []).append(frame)
+        self._cycles = {symbol: itertools.cycle(items) for symbol, items in self._by_symbol.items()}
+
+    def frame(self, symbol, now_ms):
+        cycle = self._cycles.get(symbol)
+        if cycle is None:
+            return None
+        frame = next(cycle)
+        frame["data"]["T"] = now_ms
+        frame["data"]["E"] = now_ms
+        return json.dumps(frame, separators=(",", ":"))
+
+
+class ReplayServer:
+    def __init__(self, source, schedule, host="127.0.0.1", port=9443):
+        self.source = source
+        self.schedule = schedule
+        self.host = host
+        self.port = port
+        self.frames_sent = 0
+        self._server = None
+
+    async def _handle(self, websocket):
+        path = websocket.request.path if hasattr(websocket, "request") else websocket.path
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(path).query)
+        streams = query.get("streams", [""])[0].split("/")
+        symbols = [stream.split("@", 1)[0] for stream in streams if stream]
+        if not symbols:
+            await websocket.close()
+            return
+
+        started = time.monotonic()
+        owed = 0.0
+        symbol_cycle = itertools.cycle(symbols)
+        try:
+            while True:
+                elapsed = time.monotonic() - started
+                owed += self.schedule.rate_at(elapsed) * TICK_SECONDS
+                now_ms = int(time.time() * 1000)
+                while owed >= 1:
+                    frame = self.source.frame(next(symbol_cycle), now_ms)
+                    owed -= 1
+                    if frame is not None:
+                        await websocket.send(frame)
+                        self.frames_sent += 1
+                await asyncio.sleep(TICK_SECONDS)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_queue=None)
+        logger.info(f"Replaying trades on ws://{self.host}:{self.port}/stream")
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def add_source_arguments(parser):
+    parser.add_argument("--rate", type=float, default=1000, help="Frames per second per connection")
+    parser.add_argument("--burst-multiplier", type=float, default=1.0, help="e.g. 10 or 100 for 10x-100x bursts")
+    parser.add_argument("--burst-every", type=float, default=None, help="Seconds between bursts")
+    parser.add_argument("--burst-duration", type=float, default=1.0, help="Length of each burst in seconds")
+    parser.add_argument("--recording", default=None, help="File with one combined-stream frame per line")
+
+
+def build_server(args, host="127.0.0.1", port=9443):
+    source = RecordedTrades(args.recording) if args.recording else SyntheticTrades()
+    schedule = RateSchedule(args.rate, args.burst_multiplier, args.burst_every, args.burst_duration)
+    return ReplayServer(source, schedule, host, port)
+
+
+async def serve_forever(args):
+    server = await build_server(args, args.host, args.port).start()
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logger.info(f"Sent {server.frames_sent} frames")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9443)
+    add_source_arguments(parser)
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
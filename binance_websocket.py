@@ -1,12 +1,27 @@
 #!/usr/bin/env python3
-import json
 import asyncio
 import websockets
 from kafka import KafkaProducer
 import logging
+import time
+import hashlib
+import multiprocessing
+import threading
+import queue as queue_module
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import sys
 
+from utils.compact_trade_format import CompactTradeSerializer
+from utils.publisher_metrics import PublisherMetrics, start_metrics_server
+from utils.trade_backfill import (
+    ReconnectBackoff,
+    RestAggTradesFetcher,
+    TradeIdTracker,
+    backfill_gap,
+)
+from utils.trade_codecs import get_codec
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,119 +36,565 @@ KAFKA_TOPIC = "binance-crypto-trades"        # Replace with your topic name
 # List of symbols you want to subscribe to
 SYMBOLS = ["btcusdt", "ethusdt", "bnbusdt", "adausdt", "maticusdt", "solusdt"]  # Add more symbols as needed
 
-# Create a combined stream URL
+# Combined stream URLs are built per shard
 # Example: wss://fstream.binance.com/stream?streams=btcusdt@trade/ethusdt@trade/bnbusdt@trade
-STREAMS = "/".join([f"{symbol}@trade" for symbol in SYMBOLS])
-BINANCE_WS_URL = f"wss://fstream.binance.com/stream?streams={STREAMS}"
+BINANCE_WS_BASE_URL = "wss://fstream.binance.com/stream"
+
+# Sharding configuration
+# Symbols are spread over several websocket connections, each with its own Kafka producer,
+# and optionally over worker processes so ingestion is not capped by one event loop.
+MAX_STREAMS_PER_CONNECTION = 200  # Binance futures limit on streams per combined connection
+NUM_SHARDS = None                 # None picks the fewest shards that respect the limit above
+NUM_WORKER_PROCESSES = 1          # Shards are split round-robin across this many processes
+
+# Publishing pipeline configuration
+# Raw frames are queued by the receive loop and published in micro-batches by a worker thread.
+QUEUE_MAX_SIZE = 10000          # Maximum number of raw frames waiting to be published
+PUBLISH_BATCH_SIZE = 500        # Maximum frames handed to the worker in one batch
+PUBLISH_LINGER_MS = 50          # How long to wait for a batch to fill before publishing it
+OVERFLOW_POLICY = "block"       # "block", "drop_newest" or "drop_oldest" when the queue is full
+STATS_INTERVAL_SECONDS = 30     # How often pipeline stats are logged
+CODEC = "auto"                  # "auto", "msgspec", "orjson" or "json" (see utils/trade_codecs.py)
+WIRE_FORMAT = "json"            # "json" or "compact" (see utils/compact_trade_format.py)
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+# Reconnect and backfill configuration
+RECONNECT_BACKOFF_BASE_SECONDS = 0.5   # First reconnect waits up to this long (jittered)
+RECONNECT_BACKOFF_CAP_SECONDS = 60     # Upper bound for the exponential backoff
+BACKFILL_ENABLED = True                # Recover trade-id gaps from the REST aggTrades endpoint
+BINANCE_REST_BASE_URL = "https://fapi.binance.com"
 
-# Initialize the Kafka producer
-try:
-    producer = KafkaProducer(
+# Metrics endpoint (Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics)
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108             # Worker processes serve on METRICS_PORT + worker index
+
+def create_producer(codec, wire_format=WIRE_FORMAT):
+    """Create the Kafka producer used by the publisher"""
+    if wire_format == "compact":
+        value_serializer = CompactTradeSerializer()
+    elif wire_format == "json":
+        value_serializer = codec.encode
+    else:
+        raise ValueError(f"Unknown wire format: {wire_format}")
+
+    return KafkaProducer(
         bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+        value_serializer=value_serializer,
         key_serializer=lambda k: k.encode('utf-8') if k else None,
         acks='all',
         retries=3,
         batch_size=16384,
         linger_ms=10
     )
-    logger.info(f"Kafka producer initialized for {KAFKA_BOOTSTRAP_SERVERS}")
-except Exception as e:
-    logger.error(f"Failed to initialize Kafka producer: {e}")
-    sys.exit(1)
 
-async def process_websocket_messages():
+
+def transform_trade(event, processing_time, data_type="trade"):
+    """Build the Kafka payload for a decoded TradeEvent"""
+    return {
+        "symbol": event.symbol,
+        "price": event.price,
+        "quantity": event.quantity,
+        "timestamp": event.timestamp,
+        "buyer_maker": event.buyer_maker,
+        "trade_id": event.trade_id,
+        "stream": event.stream,
+        "processing_time": processing_time,
+        "exchange": "binance",
+        "data_type": data_type
+    }
+
+
+class PipelineStats:
+    """Counters describing throughput and backpressure of the publishing pipeline"""
+
+    def __init__(self):
+        self.received = 0
+        self.published = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.send_errors = 0
+        self.batches = 0
+        self.queue_high_watermark = 0
+        self.blocked_seconds = 0.0
+        self.gaps_detected = 0
+        self.missing_trades = 0
+        self.backfilled = 0
+        self.backfill_errors = 0
+        self.started_at = time.monotonic()
+        # Backfill counters are written from the backfill thread
+        self._backfill_lock = threading.Lock()
+
+    def record_backfill(self, backfilled=0, errors=0):
+        with self._backfill_lock:
+            self.backfilled += backfilled
+            self.backfill_errors += errors
+
+    def snapshot(self, queue_depth=0):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        with self._backfill_lock:
+            backfilled, backfill_errors = self.backfilled, self.backfill_errors
+        return {
+            "received": self.received,
+            "published": self.published,
+            "invalid": self.invalid,
+            "dropped": self.dropped,
+            "send_errors": self.send_errors,
+            "batches": self.batches,
+            "queue_depth": queue_depth,
+            "queue_high_watermark": self.queue_high_watermark,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "gaps_detected": self.gaps_detected,
+            "missing_trades": self.missing_trades,
+            "backfilled": backfilled,
+            "backfill_errors": backfill_errors,
+            "publish_rate": round(self.published / elapsed, 1),
+        }
+
+
+class TradePublisher:
+    """
+    Decouples websocket receipt from Kafka publishing.
+
+    The receive coroutine only enqueues raw frames. A worker coroutine drains the queue
+    into micro-batches (bounded by batch_size and linger_ms) and hands each batch to a
+    dedicated thread that decodes, transforms and publishes it, so JSON work and
+    producer.send never run on the event loop.
+
+    The worker thread also tracks the last trade id per symbol. When a jump is seen
+    (typically right after a reconnect) the missing range is fetched by backfill_fetcher
+    on a separate thread and published with data_type "trade_backfill".
+    """
+
+    def __init__(self, producer, codec, topic=KAFKA_TOPIC, queue_max_size=QUEUE_MAX_SIZE,
+                 batch_size=PUBLISH_BATCH_SIZE, linger_ms=PUBLISH_LINGER_MS,
+                 overflow_policy=OVERFLOW_POLICY, backfill_fetcher=None, metrics=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.producer = producer
+        self.codec = codec
+        self.topic = topic
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.queue = asyncio.Queue(maxsize=queue_max_size)
+        self.stats = PipelineStats()
+        self.tracker = TradeIdTracker()
+        self.backfill_fetcher = backfill_fetcher
+        self.metrics = metrics
+        # A single thread keeps batches (and therefore per-symbol ordering) sequential
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-publisher")
+        self._backfill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trade-backfill")
+
+    async def enqueue(self, frame):
+        """Queue a raw websocket frame, applying the overflow policy when the queue is full"""
+        self.stats.received += 1
+        queue = self.queue
+
+        if queue.full():
+            if self.overflow_policy == "drop_newest":
+                self.stats.dropped += 1
+                return
+            if self.overflow_policy == "drop_oldest":
+                queue.get_nowait()
+                queue.task_done()
+                self.stats.dropped += 1
+            else:
+                blocked_since = time.monotonic()
+                await queue.put(frame)
+                self.stats.blocked_seconds += time.monotonic() - blocked_since
+                self._record_depth()
+                return
+
+        queue.put_nowait(frame)
+        self._record_depth()
+
+    def _record_depth(self):
+        depth = self.queue.qsize()
+        if depth > self.stats.queue_high_watermark:
+            self.stats.queue_high_watermark = depth
+
+    async def _next_batch(self):
+        """Wait for the first frame, then collect more until the batch is full or linger expires"""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.linger
+
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def run_worker(self):
+        """Publish queued frames in micro-batches until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                await loop.run_in_executor(self._executor, self.publish_batch, batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def publish_batch(self, frames):
+        """Decode, transform and publish a batch of raw frames (runs on the worker thread)"""
+        processing_time = datetime.now().isoformat()
+        stats = self.stats
+        send = self.producer.send
+        decode_trade = self.codec.decode_trade
+        observe = self.tracker.observe
+        topic = self.topic
+        metrics = self.metrics
+        now = time.time()
+
+        for frame in frames:
+            event = decode_trade(frame)
+            if event is None:
+                stats.invalid += 1
+                continue
+
+            if metrics is not None:
+                metrics.trades_received.inc(event.symbol)
+                if event.timestamp is not None:
+                    lag = now - event.timestamp / 1000.0
+                    metrics.event_lag.observe(lag)
+                    metrics.last_event_lag.set(lag, event.symbol)
+
+            gap = observe(event)
+            if gap is not None:
+                stats.gaps_detected += 1
+                stats.missing_trades += gap.missing
+                logger.warning(f"Detected gap of {gap.missing} trades for {gap.symbol} "
+                               f"(trade ids {gap.last_trade_id + 1}-{gap.next_trade_id - 1})")
+                if self.backfill_fetcher is not None:
+                    self._backfill_executor.submit(self.backfill, gap)
+
+            transformed_data = transform_trade(event, processing_time)
+
+            try:
+                # Publish to Kafka using symbol as key for partitioning
+                sent_at = time.monotonic()
+                future = send(topic=topic, key=event.symbol, value=transformed_data)
+                stats.published += 1
+                if metrics is not None:
+                    future.add_callback(metrics.on_send_success, event.symbol, sent_at)
+                    future.add_errback(metrics.on_send_error, event.symbol)
+            except Exception as e:
+                stats.send_errors += 1
+                logger.error(f"Failed to publish to Kafka: {e}")
+
+        stats.batches += 1
+
+    def backfill(self, gap):
+        """Fetch and publish the trades missing from a gap (runs on the backfill thread)"""
+        try:
+            events = backfill_gap(gap, self.backfill_fetcher)
+        except Exception as e:
+            self.stats.record_backfill(errors=1)
+            logger.error(f"Failed to backfill {gap.missing} trades for {gap.symbol}: {e}")
+            return
+
+        processing_time = datetime.now().isoformat()
+        for event in events:
+            transformed_data = transform_trade(event, processing_time, data_type="trade_backfill")
+            try:
+                self.producer.send(topic=self.topic, key=event.symbol, value=transformed_data)
+                self.stats.record_backfill(backfilled=1)
+            except Exception as e:
+                self.stats.record_backfill(errors=1)
+                logger.error(f"Failed to publish backfilled trade to Kafka: {e}")
+        logger.info(f"Backfilled {len(events)} aggregate trades for {gap.symbol}")
+
+    async def drain(self, timeout=10):
+        """Wait for queued frames to be published"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out draining publisher queue with {self.queue.qsize()} frames left")
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._backfill_executor.shutdown(wait=True)
+
+
+def shard_for_symbol(symbol, num_shards):
+    """
+    Rendezvous (highest random weight) hashing: stable across runs and processes, and
+    changing num_shards only moves the symbols whose winning shard changed.
+    """
+    symbol = symbol.lower()
+
+    def weight(shard_id):
+        digest = hashlib.blake2b(f"{symbol}:{shard_id}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    return max(range(num_shards), key=weight)
+
+
+def assign_shards(symbols, num_shards=NUM_SHARDS, max_streams=MAX_STREAMS_PER_CONNECTION):
+    """Split symbols into shards, adding shards until none exceeds the per-connection limit"""
+    symbols = list(dict.fromkeys(symbol.lower() for symbol in symbols))
+    if num_shards is None:
+        num_shards = max(1, -(-len(symbols) // max_streams))
+
+    while True:
+        shards = [[] for _ in range(num_shards)]
+        for symbol in symbols:
+            shards[shard_for_symbol(symbol, num_shards)].append(symbol)
+        if max(len(shard) for shard in shards) <= max_streams:
+            return shards
+        num_shards += 1
+
+
+def build_stream_url(symbols, base_url=None):
+    streams = "/".join(f"{symbol}@trade" for symbol in symbols)
+    return f"{base_url or BINANCE_WS_BASE_URL}?streams={streams}"
+
+
+class Shard:
+    """One websocket connection, its symbols and its own publisher/producer"""
+
+    def __init__(self, shard_id, symbols, publisher, base_url=None):
+        self.shard_id = shard_id
+        self.symbols = symbols
+        self.url = build_stream_url(symbols, base_url)
+        self.publisher = publisher
+        self.connected = False
+        self.connects = 0
+        self.last_message_at = None
+
+    def health(self):
+        publisher = self.publisher
+        last_message_age = None
+        if self.last_message_at is not None:
+            last_message_age = round(time.monotonic() - self.last_message_at, 3)
+        return {
+            "shard_id": self.shard_id,
+            "symbols": len(self.symbols),
+            "connected": self.connected,
+            "connects": self.connects,
+            "last_message_age": last_message_age,
+            **publisher.stats.snapshot(publisher.queue.qsize()),
+        }
+
+
+def aggregate_health(healths):
+    """Combine per-shard health snapshots into one view across shards and processes"""
+    summed = ("symbols", "received", "published", "invalid", "dropped", "send_errors",
+              "batches", "queue_depth", "publish_rate", "gaps_detected", "missing_trades",
+              "backfilled", "backfill_errors")
+    totals = {key: sum(h[key] for h in healths) for key in summed}
+    totals["publish_rate"] = round(totals["publish_rate"], 1)
+    totals["shards"] = len(healths)
+    totals["connected_shards"] = sum(1 for h in healths if h["connected"])
+    totals["max_queue_high_watermark"] = max((h["queue_high_watermark"] for h in healths), default=0)
+    totals["disconnected_shards"] = [h["shard_id"] for h in healths if not h["connected"]]
+    return totals
+
+
+async def process_websocket_messages(shard):
+    publisher = shard.publisher
+    backoff = ReconnectBackoff(RECONNECT_BACKOFF_BASE_SECONDS, RECONNECT_BACKOFF_CAP_SECONDS)
     while True:
         try:
-            async with websockets.connect(BINANCE_WS_URL) as websocket:
-                print(f"Connected to Binance WebSocket for symbols: {', '.join(SYMBOLS).upper()}")
-                logger.info(f"Publishing to Kafka topic: {KAFKA_TOPIC}")
+            async with websockets.connect(shard.url) as websocket:
+                shard.connected = True
+                shard.connects += 1
+                print(f"Shard {shard.shard_id} connected to Binance WebSocket for {len(shard.symbols)} symbols: "
+                      f"{', '.join(shard.symbols).upper()}")
+                logger.info(f"Shard {shard.shard_id} publishing to Kafka topic: {publisher.topic}")
 
+                message = await websocket.recv()
+                # Only a connection that actually delivers data counts as recovered
+                backoff.reset()
                 while True:
+                    shard.last_message_at = time.monotonic()
+                    if publisher.metrics is not None:
+                        publisher.metrics.frames_received.inc(str(shard.shard_id))
+                    await publisher.enqueue(message)
                     message = await websocket.recv()
-                    data = json.loads(message)
-
-                    # Each message from combined streams has the following structure:
-                    # {
-                    #   "stream": "btcusdt@trade",
-                    #   "data": { ... trade data ... }
-                    # }
-                    
-                    stream = data.get("stream")
-                    trade_data = data.get("data", {})
-
-                    if not stream or not trade_data:
-                        print("Invalid message format received.")
-                        continue
-
-                    symbol = trade_data.get("s")
-                    price = float(trade_data.get("p", 0))
-                    quantity = float(trade_data.get("q", 0))
-                    timestamp = trade_data.get("T")
-                    buyer_maker = trade_data.get("m")
-                    trade_id = trade_data.get("t")
-                    
-                    # Add additional useful fields
-                    transformed_data = {
-                        "symbol": symbol,
-                        "price": price,
-                        "quantity": quantity,
-                        "timestamp": timestamp,
-                        "buyer_maker": buyer_maker,
-                        "trade_id": trade_id,
-                        "stream": stream,
-                        "processing_time": datetime.now().isoformat(),
-                        "exchange": "binance",
-                        "data_type": "trade"
-                    }
-
-                    try:
-                        # Publish to Kafka using symbol as key for partitioning
-                        future = producer.send(
-                            topic=KAFKA_TOPIC,
-                            key=symbol,
-                            value=transformed_data
-                        )
-                        
-                        # Optional: wait for confirmation (comment out for better performance)
-                        # result = future.get(timeout=10)
-                        
-                        print(f"Published trade for {symbol}: Price={price}, Quantity={quantity}")
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to publish to Kafka: {e}")
 
         except websockets.exceptions.ConnectionClosed:
-            print("WebSocket connection closed. Reconnecting in 5 seconds...")
-            await asyncio.sleep(5)
+            shard.connected = False
+            if publisher.metrics is not None:
+                publisher.metrics.reconnects.inc(str(shard.shard_id))
+            delay = backoff.next_delay()
+            print(f"Shard {shard.shard_id} WebSocket connection closed. Reconnecting in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+        except Exception as e:
+            shard.connected = False
+            if publisher.metrics is not None:
+                publisher.metrics.reconnects.inc(str(shard.shard_id))
+            delay = backoff.next_delay()
+            print(f"Shard {shard.shard_id} error: {e}. Reconnecting in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+
+
+def log_aggregate_health(healths):
+    logger.info(f"Publisher health: {aggregate_health(healths)}")
+    for health in healths:
+        logger.debug(f"Shard health: {health}")
+
+
+async def report_health(shards, report, interval=STATS_INTERVAL_SECONDS):
+    """Periodically hand per-shard health snapshots to report()"""
+    while True:
+        await asyncio.sleep(interval)
+        report([shard.health() for shard in shards])
+
+
+async def run_shards(shards, report=log_aggregate_health):
+    """Run every shard's receive loop and publishing worker on this event loop"""
+    tasks = []
+    for shard in shards:
+        tasks.append(asyncio.create_task(shard.publisher.run_worker()))
+    tasks.append(asyncio.create_task(report_health(shards, report)))
+    try:
+        await asyncio.gather(*(process_websocket_messages(shard) for shard in shards))
+    finally:
+        for shard in shards:
+            await shard.publisher.drain()
+        for task in tasks:
+            task.cancel()
+        logger.info(f"Final publisher health: {aggregate_health([shard.health() for shard in shards])}")
+
+
+def create_shards(shard_symbols, shard_ids, metrics=None):
+    """Create a producer and publisher for each shard"""
+    codec = get_codec(CODEC)
+    backfill_fetcher = RestAggTradesFetcher(BINANCE_REST_BASE_URL) if BACKFILL_ENABLED else None
+    shards = []
+    for shard_id, symbols in zip(shard_ids, shard_symbols):
+        publisher = TradePublisher(create_producer(codec), codec, backfill_fetcher=backfill_fetcher,
+                                   metrics=metrics)
+        if metrics is not None:
+            metrics.track_queue(shard_id, publisher.queue)
+        shards.append(Shard(shard_id, symbols, publisher))
+    return shards
+
+
+def cleanup(shards):
+    """Cleanup function to stop publishers and close Kafka producers"""
+    for shard in shards:
+        try:
+            shard.publisher.close()
+            shard.publisher.producer.flush()
+            shard.publisher.producer.close()
         except Exception as e:
-            print(f"Error: {e}. Reconnecting in 5 seconds...")
-            await asyncio.sleep(5)
+            logger.error(f"Error closing Kafka producer for shard {shard.shard_id}: {e}")
+    logger.info(f"Closed {len(shards)} Kafka producers")
+
+
+def start_metrics(port):
+    """Create the metric set and serve it over HTTP, or return None when disabled"""
+    if not METRICS_ENABLED:
+        return None
+    metrics = PublisherMetrics()
+    try:
+        start_metrics_server(metrics.registry, METRICS_HOST, port)
+    except OSError as e:
+        logger.error(f"Failed to start metrics endpoint on port {port}: {e}")
+    return metrics
+
 
-def cleanup():
-    """Cleanup function to close Kafka producer"""
+def run_worker_process(shard_symbols, shard_ids, health_queue, metrics_port):
+    """Entry point of a worker process: runs its shards and reports health to the parent"""
+    metrics = start_metrics(metrics_port)
     try:
-        if producer:
-            producer.flush()
-            producer.close()
-            logger.info("Kafka producer closed successfully")
+        shards = create_shards(shard_symbols, shard_ids, metrics)
     except Exception as e:
-        logger.error(f"Error closing Kafka producer: {e}")
+        logger.error(f"Failed to initialize Kafka producers for shards {shard_ids}: {e}")
+        sys.exit(1)
+
+    try:
+        asyncio.run(run_shards(shards, report=health_queue.put))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cleanup(shards)
+
+
+def run_worker_processes(shard_symbols, num_processes):
+    """Split shards round-robin across worker processes and aggregate their health reports"""
+    health_queue = multiprocessing.Queue()
+    processes = []
+    for worker in range(num_processes):
+        shard_ids = list(range(worker, len(shard_symbols), num_processes))
+        if not shard_ids:
+            continue
+        process = multiprocessing.Process(
+            target=run_worker_process,
+            args=([shard_symbols[i] for i in shard_ids], shard_ids, health_queue, METRICS_PORT + worker),
+            name=f"binance-publisher-{worker}",
+        )
+        process.start()
+        processes.append(process)
+
+    latest = {}
+    try:
+        while any(process.is_alive() for process in processes):
+            try:
+                healths = health_queue.get(timeout=1)
+            except queue_module.Empty:
+                continue
+            for health in healths:
+                latest[health["shard_id"]] = health
+            log_aggregate_health(list(latest.values()))
+    finally:
+        for process in processes:
+            process.join()
+
 
 if __name__ == '__main__':
+    shard_symbols = assign_shards(SYMBOLS)
+    num_processes = max(1, min(NUM_WORKER_PROCESSES, len(shard_symbols)))
+
+    print(f"Starting Binance WebSocket stream publisher to Kafka topic: {KAFKA_TOPIC}")
+    print(f"Monitoring symbols: {', '.join(SYMBOLS).upper()}")
+    print(f"Kafka servers: {KAFKA_BOOTSTRAP_SERVERS}")
+    print(f"Using '{CODEC}' codec with '{WIRE_FORMAT}' wire format")
+    print(f"Batching up to {PUBLISH_BATCH_SIZE} frames every {PUBLISH_LINGER_MS}ms "
+          f"(queue size {QUEUE_MAX_SIZE}, overflow policy '{OVERFLOW_POLICY}')")
+    print(f"Sharding {len(SYMBOLS)} symbols across {len(shard_symbols)} connections "
+          f"in {num_processes} process(es)")
+    print("Press Ctrl+C to stop...")
+
+    if num_processes > 1:
+        try:
+            run_worker_processes(shard_symbols, num_processes)
+        except KeyboardInterrupt:
+            print("\nShutting down gracefully...")
+        sys.exit(0)
+
+    metrics = start_metrics(METRICS_PORT)
+
+    # Initialize the Kafka producers
+    try:
+        shards = create_shards(shard_symbols, list(range(len(shard_symbols))), metrics)
+        logger.info(f"Kafka producers initialized for {KAFKA_BOOTSTRAP_SERVERS}")
+    except Exception as e:
+        logger.error(f"Failed to initialize Kafka producer: {e}")
+        sys.exit(1)
+
     try:
-        print(f"Starting Binance WebSocket stream publisher to Kafka topic: {KAFKA_TOPIC}")
-        print(f"Monitoring symbols: {', '.join(SYMBOLS).upper()}")
-        print(f"Kafka servers: {KAFKA_BOOTSTRAP_SERVERS}")
-        print("Press Ctrl+C to stop...")
-        
-        asyncio.run(process_websocket_messages())
-        
+        asyncio.run(run_shards(shards))
+
     except KeyboardInterrupt:
         print("\nShutting down gracefully...")
-        cleanup()
+        cleanup(shards)
         sys.exit(0)
     except Exception as e:
         logger.error(f"Fatal error: {e}")
-        cleanup()
-        sys.exit(1)
\ No newline at end of file
+        cleanup(shards)
+        sys.exit(1)
@@ -0,0 +1,76 @@
+import atexit
+import os
+from typing import Dict, List
+
+from mage_ai.io.config import ConfigFileLoader, ConfigKey
+from mage_ai.settings.repo import get_repo_path
+from mage_ai.streaming.sinks.base_python import BasePythonSink
+
+from utils.bigquery_trade_sink import BigQueryTradeSink
+from utils.symbol_state_store import split_metadata
+
+if 'streaming_sink' not in globals():
+    from mage_ai.data_preparation.decorators import streaming_sink
+
+TABLE_ID = 'lyrical-drive-439810-j7.mage_demos.kafka_crypto'
+CONFIG_PROFILE = 'default'
+SPOOL_PATH = '/home/src/mage_data/cole-ws/kafka_demo_/bigquery_spool.sqlite'
+
+# Flush when any of these is reached
+MAX_ROWS = 50000
+MAX_BYTES = 64 * 1024 * 1024
+MAX_AGE_SECONDS = 120   # BigQuery allows 1,500 load jobs per table per day
+
+
+def load_credentials():
+    """
+    Service account credentials from the io_config.yaml profile, like the other Mage
+    exporters, falling back to GOOGLE_APPLICATION_CREDENTIALS. None means the client
+    uses application default credentials.
+    """
+    from google.oauth2 import service_account
+
+    config = ConfigFileLoader(os.path.join(get_repo_path(), 'io_config.yaml'), CONFIG_PROFILE)
+    key_path = config.get(ConfigKey.GOOGLE_SERVICE_ACC_KEY_FILEPATH)
+    if key_path and os.path.exists(key_path):
+        return service_account.Credentials.from_service_account_file(key_path)
+    key = config.get(ConfigKey.GOOGLE_SERVICE_ACC_KEY)
+    if key and key.get('private_key'):
+        return service_account.Credentials.from_service_account_info(key)
+
+    gcp_credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+    if gcp_credentials_path:
+        return service_account.Credentials.from_service_account_file(gcp_credentials_path)
+    return None
+
+
+@streaming_sink
+class CustomSink(BasePythonSink):
+    def init_client(self):
+        """
+        Buffer streaming batches locally and load them into BigQuery in micro-batches
+        (see utils/bigquery_trade_sink.py).
+        """
+        from google.cloud import bigquery
+
+        client = bigquery.Client(project=TABLE_ID.split('.')[0], credentials=load_credentials())
+
+        self.sink = BigQueryTradeSink(
+            client,
+            TABLE_ID,
+            SPOOL_PATH,
+            max_rows=MAX_ROWS,
+            max_bytes=MAX_BYTES,
+            max_age_seconds=MAX_AGE_SECONDS,
+        )
+        self.sink.start_age_timer()
+        # Load whatever is still buffered when the pipeline stops
+        atexit.register(self.sink.close)
+
+    def batch_write(self, messages: List[Dict]):
+        """
+        Spool the batch; rows are loaded once the buffer is full or old enough.
+        Messages may be plain trades or {"data": {...}, "metadata": {...}}.
+        """
+        rows, _ = split_metadata(messages)
+        self.sink.write(rows)
@@ -3,6 +3,7 @@ import asyncio
 import json
 import os
 import sys
+import time
 
 try:
     from mcp.server import Server, NotificationOptions
@@ -13,6 +14,11 @@ try:
         Tool,
         TextContent,
     )
+    from utils.bm25_index import BM25Index, query_terms, snippet
+    from utils.chunk_store import ChunkStore, chunk_id_from_uri
+    from utils.chunk_table import ChunkTableFile, open_corpus
+    from utils.corpus_file import CorpusFile, CorpusNotReady
+    from utils.vector_index import get_embedder, hybrid_search, load_or_build_index
     print("All imports successful", file=sys.stderr)
 except ImportError as e:
     print(f"Import error: {e}", file=sys.stderr)
@@ -20,55 +26,131 @@ except ImportError as e:
 
 # Initialize the MCP server
 server = Server("simple-document-server")
-DOCUMENT_CHUNKS = []
+STORE = ChunkStore([])
+RESOURCES = None
+SEARCH_INDEX = None
+VECTOR_INDEX = None
+EMBEDDER = None
+SEARCH_MODES = ("bm25", "vector", "hybrid")
+DEFAULT_SEARCH_MODE = os.getenv("DOCUMENT_SEARCH_MODE", "bm25")
+HYBRID_ALPHA = float(os.getenv("DOCUMENT_HYBRID_ALPHA", "0.5"))
+CORPUS_PATH = os.getenv("DOCUMENT_CORPUS_PATH")
+RELOAD_CHECK_SECONDS = float(os.getenv("DOCUMENT_CORPUS_RELOAD_SECONDS", "1.0"))
+_last_reload_check = 0.0
+
+def vector_index_path():
+    """Where the vector index is persisted: DOCUMENT_VECTOR_INDEX_PATH, else next to the corpus or mmap'd chunk text"""
+    path = os.getenv("DOCUMENT_VECTOR_INDEX_PATH")
+    if path:
+        return path
+    data_path = CORPUS_PATH or os.getenv("DOCUMENT_MMAP_PATH")
+    return f"{data_path}.vectors.npz" if data_path else None
+
+def set_store(store):
+    """Swap in a chunk store; resources and search indexes are rebuilt lazily on first use"""
+    global STORE, RESOURCES, SEARCH_INDEX, VECTOR_INDEX
+    previous = STORE
+    STORE = store
+    RESOURCES = None
+    SEARCH_INDEX = None
+    VECTOR_INDEX = None
+    previous.close()
+
+def load_store(chunks):
+    """Index chunks passed in memory (the DOCUMENT_CHUNKS environment variable)"""
+    set_store(ChunkStore(chunks, mmap_path=os.getenv("DOCUMENT_MMAP_PATH")))
+
+def refresh_store():
+    """Reopen the corpus file when it has been rewritten; keeps serving the old one until the new one is complete"""
+    global _last_reload_check
+    if not CORPUS_PATH:
+        return
+    now = time.monotonic()
+    if now - _last_reload_check < RELOAD_CHECK_SECONDS:
+        return
+    _last_reload_check = now
+    if isinstance(STORE, (CorpusFile, ChunkTableFile)) and not STORE.changed():
+        return
+    try:
+        corpus = open_corpus(CORPUS_PATH)
+    except CorpusNotReady as e:
+        print(f"Corpus not reloaded: {e}", file=sys.stderr)
+        return
+    if corpus.generation == STORE.generation:
+        STORE.signature = corpus.signature
+        corpus.close()
+        return
+    print(f"Loaded corpus {CORPUS_PATH} generation {corpus.generation} with {len(corpus)} chunks", file=sys.stderr)
+    set_store(corpus)
+
+def resources():
+    global RESOURCES
+    if RESOURCES is None:
+        RESOURCES = [Resource(**descriptor) for descriptor in STORE.descriptors]
+    return RESOURCES
+
+def bm25_index():
+    """Build the BM25 index for the current store on first search"""
+    global SEARCH_INDEX
+    if SEARCH_INDEX is None:
+        SEARCH_INDEX = BM25Index(STORE.text_at(row) for row in range(len(STORE)))
+    return SEARCH_INDEX
+
+def vector_index():
+    """Load the embedder and the persisted vector index (or build it) on the first vector or hybrid search"""
+    global VECTOR_INDEX, EMBEDDER
+    if VECTOR_INDEX is None:
+        if EMBEDDER is None:
+            EMBEDDER = get_embedder(os.getenv("DOCUMENT_EMBEDDER", "hashing"))
+        VECTOR_INDEX = load_or_build_index(
+            EMBEDDER, STORE.chunk_ids, (STORE.text_at(row) for row in range(len(STORE))),
+            vector_index_path(), fingerprint=STORE.generation
+        )
+    return VECTOR_INDEX
+
+def search(query, max_results, mode):
+    """Return [(row, score, extra fields)] and the number of matching chunks"""
+    if mode == "bm25":
+        hits, total_matches = bm25_index().search(query, k=max_results)
+        return [(row, score, {}) for row, score in hits], total_matches
+
+    index = vector_index()
+    query_vector = EMBEDDER.embed([query])[0]
+    if mode == "vector":
+        hits = [(row, score, {}) for row, score in index.search(query_vector, max_results) if score > 0]
+        return hits, len(hits)
+
+    hits = hybrid_search(bm25_index(), index, query, query_vector, k=max_results, alpha=HYBRID_ALPHA)
+    return [
+        (row, fused, {"bm25_score": round(bm25_score, 4), "vector_score": round(cosine, 4)})
+        for row, fused, bm25_score, cosine in hits
+    ], len(hits)
 
 @server.list_resources()
 async def handle_list_resources():
     """List available document resources"""
-    print(f"Listing {len(DOCUMENT_CHUNKS)} resources", file=sys.stderr)
-    resources = []
-    for chunk in DOCUMENT_CHUNKS:
-        resources.append(
-            Resource(
-                uri=f"document://great_attractor/chunk_{chunk['chunk_id']}",
-                name=f"Document Chunk {chunk['chunk_id']}",
-                description=f"Section {chunk['chunk_id']} of the Great Attractor research paper",
-                mimeType="text/plain"
-            )
-        )
-    return resources
+    refresh_store()
+    print(f"Listing {len(STORE)} resources", file=sys.stderr)
+    return resources()
 
 @server.read_resource()
 async def handle_read_resource(uri: str):
     """Read content from a specific document resource"""
     # Convert URI to string if it's a Pydantic URL object
     uri_str = str(uri)
-    print(f"Reading resource: {uri_str}", file=sys.stderr)
-    
-    if uri_str.startswith("document://great_attractor/chunk_"):
-        try:
-            chunk_id = int(uri_str.split("_")[-1])
-            print(f"Looking for chunk_id: {chunk_id}", file=sys.stderr)
-            
-            # Ensure we have the right data structure
-            chunks_to_search = DOCUMENT_CHUNKS
-            if isinstance(DOCUMENT_CHUNKS, dict) and 'chunks' in DOCUMENT_CHUNKS:
-                chunks_to_search = DOCUMENT_CHUNKS['chunks']
-            
-            for chunk in chunks_to_search:
-                if chunk.get("chunk_id") == chunk_id:
-                    content = chunk.get("text", "")
-                    print(f"Found chunk {chunk_id}, returning {len(content)} characters", file=sys.stderr)
-                    return content
-            
-            print(f"Chunk {chunk_id} not found in {len(chunks_to_search)} available chunks", file=sys.stderr)
-            raise ValueError(f"Chunk {chunk_id} not found")
-            
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing chunk_id from {uri_str}: {e}", file=sys.stderr)
-            raise ValueError(f"Invalid chunk URI: {uri_str}")
-    
-    raise ValueError(f"Resource not found: {uri_str}")
+    refresh_store()
+    chunk_id = chunk_id_from_uri(uri_str)
+    if chunk_id is None:
+        raise ValueError(f"Resource not found: {uri_str}")
+
+    try:
+        content = STORE.text(chunk_id)
+    except KeyError:
+        print(f"Chunk {chunk_id} not found in {len(STORE)} available chunks", file=sys.stderr)
+        raise ValueError(f"Chunk {chunk_id} not found")
+
+    print(f"Read chunk {chunk_id}, returning {len(content)} characters", file=sys.stderr)
+    return content
 
 @server.list_tools()
 async def handle_list_tools():
@@ -76,15 +158,27 @@ async def handle_list_tools():
     return [
         Tool(
             name="search_document",
-            description="Search for relevant document chunks",
+            description="Search document chunks by keyword (BM25), semantic (vector) or hybrid relevance to the query",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "query": {"type": "string"},
-                    "max_results": {"type": "integer", "default": 3}
+                    "max_results": {"type": "integer", "default": 3},
+                    "mode": {"type": "string", "enum": list(SEARCH_MODES), "default": DEFAULT_SEARCH_MODE}
                 },
                 "required": ["query"]
             }
+        ),
+        Tool(
+            name="read_chunks",
+            description="Read the text of several document chunks in one call",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "chunk_ids": {"type": "array", "items": {"type": "integer"}}
+                },
+                "required": ["chunk_ids"]
+            }
         )
     ]
 
@@ -92,26 +186,18 @@ async def handle_list_tools():
 async def handle_call_tool(name: str, arguments: dict):
     """Handle tool calls"""
     print(f"Tool called: {name} with args: {arguments}", file=sys.stderr)
-    print(f"Available chunks: {len(DOCUMENT_CHUNKS)}", file=sys.stderr)
+    refresh_store()
+    print(f"Available chunks: {len(STORE)}", file=sys.stderr)
     
     if name == "search_document":
         query = arguments.get("query", "")
         max_results = arguments.get("max_results", 3)
+        mode = arguments.get("mode", DEFAULT_SEARCH_MODE)
         
-        print(f"Searching for: {query} with max_results: {max_results}", file=sys.stderr)
-        print(f"DOCUMENT_CHUNKS contains: {len(DOCUMENT_CHUNKS)} chunks", file=sys.stderr)
+        print(f"Searching for: {query} with max_results: {max_results} ({mode})", file=sys.stderr)
         
         try:
-            # Ensure DOCUMENT_CHUNKS is a list
-            chunks_to_search = DOCUMENT_CHUNKS
-            if isinstance(DOCUMENT_CHUNKS, dict):
-                if 'chunks' in DOCUMENT_CHUNKS:
-                    chunks_to_search = DOCUMENT_CHUNKS['chunks']
-                else:
-                    # Convert dict values to list if it's a dict of chunks
-                    chunks_to_search = list(DOCUMENT_CHUNKS.values())
-            
-            if not chunks_to_search:
+            if not len(STORE):
                 print("WARNING: No document chunks available for search!", file=sys.stderr)
                 return [TextContent(
                     type="text",
@@ -122,24 +208,34 @@ async def handle_call_tool(name: str, arguments: dict):
                     })
                 )]
             
-            print(f"Searching through {len(chunks_to_search)} chunks", file=sys.stderr)
+            if mode not in SEARCH_MODES:
+                raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+            
+            started = time.perf_counter()
+            hits, total_matches = search(query, max_results, mode)
+            # Snippets need only the query's terms; vector searches never build the BM25 index
+            terms = query_terms(query)
             
-            # Simple search - return first few chunks that exist
-            chunk_ids = []
-            for i, chunk in enumerate(chunks_to_search):
-                if i >= max_results:
-                    break
-                chunk_id = chunk.get("chunk_id", i) if isinstance(chunk, dict) else i
-                chunk_ids.append(chunk_id)
+            results = []
+            for row, score, extra in hits:
+                chunk_id = int(STORE.chunk_ids[row])
+                results.append({
+                    "chunk_id": chunk_id,
+                    "score": round(score, 4),
+                    **extra,
+                    "snippet": snippet(STORE.text(chunk_id), terms)
+                })
             
             result = {
-                "chunk_ids": chunk_ids,
-                "total_matches": len(chunks_to_search),
+                "chunk_ids": [hit["chunk_id"] for hit in results],
+                "results": results,
+                "total_matches": total_matches,
                 "query": query,
-                "debug_chunks_type": str(type(chunks_to_search))
+                "mode": mode,
+                "search_ms": round((time.perf_counter() - started) * 1000, 3)
             }
             
-            print(f"Search result: {result}", file=sys.stderr)
+            print(f"Search returned {result['chunk_ids']} of {total_matches} matches in {result['search_ms']}ms", file=sys.stderr)
             
             return [TextContent(
                 type="text",
@@ -155,49 +251,49 @@ async def handle_call_tool(name: str, arguments: dict):
                 text=json.dumps({"error": str(e), "query": query})
             )]
     
+    if name == "read_chunks":
+        chunks = []
+        missing = []
+        for chunk_id in arguments.get("chunk_ids", []):
+            try:
+                chunks.append({"chunk_id": chunk_id, "text": STORE.text(chunk_id)})
+            except KeyError:
+                missing.append(chunk_id)
+        
+        print(f"Read {len(chunks)} chunks, {len(missing)} missing", file=sys.stderr)
+        return [TextContent(
+            type="text",
+            text=json.dumps({"chunks": chunks, "missing": missing})
+        )]
+    
     raise ValueError(f"Unknown tool: {name}")
 
 async def main():
     print("Starting MCP server", file=sys.stderr)
     
-    # Load document chunks from environment variable
-    chunks_env = os.getenv("DOCUMENT_CHUNKS")
-    global DOCUMENT_CHUNKS
-    
-    if chunks_env:
-        try:
-            DOCUMENT_CHUNKS = json.loads(chunks_env)
-            print(f"Loaded {len(DOCUMENT_CHUNKS)} chunks from environment", file=sys.stderr)
-            
-            # Debug: print first chunk info
-            if DOCUMENT_CHUNKS:
-                print(f"DOCUMENT_CHUNKS type: {type(DOCUMENT_CHUNKS)}", file=sys.stderr)
-                
-                if isinstance(DOCUMENT_CHUNKS, list):
-                    first_chunk = DOCUMENT_CHUNKS[0]
-                    print(f"First chunk keys: {list(first_chunk.keys())}", file=sys.stderr)
-                    print(f"First chunk ID: {first_chunk.get('chunk_id', 'NO_ID')}", file=sys.stderr)
-                    print(f"First chunk text preview: {first_chunk.get('text', 'NO_TEXT')[:100]}...", file=sys.stderr)
-                elif isinstance(DOCUMENT_CHUNKS, dict):
-                    print(f"DOCUMENT_CHUNKS is a dict with keys: {list(DOCUMENT_CHUNKS.keys())}", file=sys.stderr)
-                    # Convert dict to list if needed
-                    if 'chunks' in DOCUMENT_CHUNKS:
-                        DOCUMENT_CHUNKS = DOCUMENT_CHUNKS['chunks']
-                        print(f"Extracted chunks list with {len(DOCUMENT_CHUNKS)} items", file=sys.stderr)
-                    else:
-                        print("DOCUMENT_CHUNKS is a dict but no 'chunks' key found", file=sys.stderr)
-                else:
-                    print(f"DOCUMENT_CHUNKS is unexpected type: {type(DOCUMENT_CHUNKS)}", file=sys.stderr)
-            else:
-                print("DOCUMENT_CHUNKS is empty", file=sys.stderr)
-            
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse DOCUMENT_CHUNKS: {e}", file=sys.stderr)
-            print(f"Raw DOCUMENT_CHUNKS: {chunks_env[:200]}...", file=sys.stderr)
-            sys.exit(1)
+    if CORPUS_PATH:
+        # Load document chunks lazily from the corpus file; reopened when it changes
+        refresh_store()
+        print(f"Serving {len(STORE)} chunks from {CORPUS_PATH}", file=sys.stderr)
     else:
-        print("No DOCUMENT_CHUNKS environment variable found", file=sys.stderr)
-        print("Available env vars:", [k for k in os.environ.keys() if 'CHUNK' in k.upper()], file=sys.stderr)
+        # Load document chunks from environment variable
+        chunks_env = os.getenv("DOCUMENT_CHUNKS")
+        
+        if chunks_env:
+            try:
+                chunks = json.loads(chunks_env)
+            except json.JSONDecodeError as e:
+                print(f"Failed to parse DOCUMENT_CHUNKS: {e}", file=sys.stderr)
+                print(f"Raw DOCUMENT_CHUNKS: {chunks_env[:200]}...", file=sys.stderr)
+                sys.exit(1)
+            load_store(chunks)
+            print(f"Indexed {len(STORE)} chunks from environment", file=sys.stderr)
+            if len(STORE):
+                print(f"First chunk ID: {STORE.chunk_ids[0]}", file=sys.stderr)
+                print(f"First chunk text preview: {STORE.text_at(0)[:100]}...", file=sys.stderr)
+        else:
+            print("No DOCUMENT_CORPUS_PATH or DOCUMENT_CHUNKS environment variable found", file=sys.stderr)
+            print("Available env vars:", [k for k in os.environ.keys() if 'CHUNK' in k.upper()], file=sys.stderr)
     
     # Run the server
     try:
@@ -0,0 +1,17 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Blocks import shared code as `utils.x` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A wall clock that only moves when a test advances clock.now"""
+    clock = SimpleNamespace(now=1_000.0)
+    monkeypatch.setattr(time, "time", lambda: clock.now)
+    return clock
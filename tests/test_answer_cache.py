@@ -0,0 +1,35 @@
+from utils.answer_cache import AnswerCache, answer_cache_key
+
+
+def test_least_recently_used_answers_are_evicted(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), max_entries=2)
+    for key in ("a", "b"):
+        clock.now += 1
+        cache.put(key, key, f"answer {key}")
+    clock.now += 1
+    assert cache.get("a")["answer"] == "answer a"   # a is now more recent than b
+
+    clock.now += 1
+    cache.put("c", "c", "answer c")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert len(cache) == 2
+    assert cache.stats["evicted"] == 1
+    cache.close()
+
+
+def test_expired_answers_are_misses(tmp_path, clock):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), ttl_seconds=60)
+    cache.put("a", "a", "answer a")
+    clock.now += 61
+    assert cache.get("a") is None
+    assert cache.stats == {"hits": 0, "misses": 1, "expired": 1, "evicted": 0}
+    cache.close()
+
+
+def test_key_covers_retrieval_corpus_and_layout():
+    key = answer_cache_key("model", "system", 0.2, 1000, "What is  it?", [1, 2], "v1", "retrieved")
+    assert key == answer_cache_key("model", "system", 0.2, 1000, " What is it? ", [1, 2], "v1", "retrieved")
+    assert key != answer_cache_key("model", "system", 0.2, 1000, "What is it?", [1, 3], "v1", "retrieved")
+    assert key != answer_cache_key("model", "system", 0.2, 1000, "What is it?", [1, 2], "v2", "retrieved")
+    assert key != answer_cache_key("model", "system", 0.2, 1000, "What is it?", [1, 2], "v1", "full-document")
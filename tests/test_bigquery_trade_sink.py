@@ -0,0 +1,109 @@
+import pytest
+
+from utils.bigquery_trade_sink import BigQueryTradeSink, LoadJobFailed
+
+
+def trade(trade_id, symbol="BTCUSDT"):
+    return {"symbol": symbol, "trade_id": trade_id, "price": 100.0, "timestamp": 1_700_000_000_000 + trade_id}
+
+
+class FakeLoader:
+    """Stands in for _load_rows; fails with the queued errors first"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.jobs = []
+        self.rows = []
+
+    def __call__(self, client, table_id, job_id, rows):
+        self.jobs.append(job_id)
+        if self.errors:
+            raise self.errors.pop(0)
+        self.rows.extend(rows)
+
+
+def make_sink(tmp_path, loader, **kwargs):
+    kwargs.setdefault("max_rows", 3)
+    kwargs.setdefault("loaded_retention_hours", 0)
+    return BigQueryTradeSink(None, "project.dataset.trades", str(tmp_path / "spool.sqlite"), load_rows=loader,
+                             **kwargs)
+
+
+def test_redelivered_rows_are_loaded_once(tmp_path):
+    loader = FakeLoader()
+    sink = make_sink(tmp_path, loader)
+    sink.write([trade(1), trade(2)])
+    sink.write([trade(2), trade(3)])
+    assert [row["trade_id"] for row in loader.rows] == [1, 2, 3]
+
+    # Already loaded keys are ignored too
+    sink.write([trade(1), trade(3), trade(4)])
+    sink.close()
+    assert [row["trade_id"] for row in loader.rows] == [1, 2, 3, 4]
+    assert sink.stats["duplicates"] == 3
+
+
+def test_failed_batch_is_retried_on_the_next_write(tmp_path):
+    loader = FakeLoader(ConnectionError("timed out"))
+    sink = make_sink(tmp_path, loader, retry_interval_seconds=0)
+    sink.write([trade(1), trade(2), trade(3)])
+    assert loader.rows == []
+    assert sink._flush_due()
+
+    sink.write([trade(4)])
+    assert [row["trade_id"] for row in loader.rows] == [1, 2, 3]
+    # An unknown outcome is retried under the same job id, so BigQuery can reject a duplicate load
+    assert loader.jobs[0] == loader.jobs[1]
+    assert sink.stats["load_errors"] == 1
+    sink.close()
+
+
+def test_failed_job_is_retried_under_a_new_job_id(tmp_path):
+    loader = FakeLoader(LoadJobFailed("invalid"))
+    sink = make_sink(tmp_path, loader, retry_interval_seconds=0)
+    sink.write([trade(1), trade(2), trade(3)])
+    sink.write([])
+    assert loader.jobs[0].endswith("_0") and loader.jobs[1].endswith("_1")
+    assert loader.jobs[0][:-2] == loader.jobs[1][:-2]
+    sink.close()
+
+
+def test_retry_waits_for_the_retry_interval(tmp_path):
+    loader = FakeLoader(ConnectionError("timed out"))
+    sink = make_sink(tmp_path, loader, retry_interval_seconds=3600)
+    sink.write([trade(1), trade(2), trade(3)])
+    sink.write([trade(4)])
+    assert len(loader.jobs) == 1
+    sink.close()
+    assert [row["trade_id"] for row in loader.rows] == [1, 2, 3, 4]
+
+
+def test_in_flight_batch_is_resubmitted_after_a_restart(tmp_path):
+    loader = FakeLoader(ConnectionError("process died"))
+    sink = make_sink(tmp_path, loader)
+    sink.write([trade(1), trade(2), trade(3)])
+    sink.spool.close()
+
+    restarted_loader = FakeLoader()
+    make_sink(tmp_path, restarted_loader).close()
+    assert restarted_loader.jobs == loader.jobs
+    assert [row["trade_id"] for row in restarted_loader.rows] == [1, 2, 3]
+
+
+def test_rows_wait_for_the_buffer_to_fill(tmp_path):
+    loader = FakeLoader()
+    sink = make_sink(tmp_path, loader, max_rows=10, max_age_seconds=3600)
+    sink.write([trade(1), trade(2)])
+    assert loader.jobs == []
+    assert not sink._flush_due()
+    sink.close()
+    assert len(loader.jobs) == 1
+
+
+@pytest.mark.parametrize("rows", [[{"symbol": "BTCUSDT", "trade_id": None}], []])
+def test_rows_without_trade_ids_are_dropped(tmp_path, rows):
+    loader = FakeLoader()
+    sink = make_sink(tmp_path, loader)
+    sink.write(rows)
+    sink.close()
+    assert loader.jobs == []
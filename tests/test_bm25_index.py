@@ -0,0 +1,68 @@
+import pytest
+
+from utils.bm25_index import BM25Index, query_terms, snippet, stem, tokenize
+
+TEXTS = [
+    "The Great Attractor pulls galaxies toward it.",
+    "Galaxy clusters such as the Norma Cluster trace the attractor's mass.",
+    "Dark energy drives the expansion of the universe.",
+    "The attractor, the attractor and again the attractor.",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BM25Index(TEXTS)
+
+
+def test_tokenize_drops_stop_words_and_stems():
+    assert tokenize("The galaxies were clustering") == ["galaxy", "cluster"]
+    assert tokenize("attractor's pull") == ["attractor", "pull"]
+    assert stem("class") == "class" and stem("runs") == "run" and stem("2024") == "2024"
+
+
+def test_query_terms_are_distinct_and_ordered(index):
+    assert query_terms("galaxies Galaxy the clusters") == ["galaxy", "cluster"]
+    assert index.query_terms("galaxies Galaxy the clusters") == ["galaxy", "cluster"]
+
+
+def test_ranking_prefers_term_frequency_and_rare_terms(index):
+    hits, total = index.search("attractor", k=4)
+    assert total == 3
+    assert hits[0][0] == 3
+    assert {row for row, _ in hits} == {0, 1, 3}
+
+    hits, total = index.search("norma galaxies", k=2)
+    assert [row for row, _ in hits] == [1, 0]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_no_match_and_zero_k(index):
+    assert index.search("quasar", k=3) == ([], 0)
+    assert index.search("attractor", k=0) == ([], 3)
+
+
+def test_ties_go_to_the_earlier_row():
+    index = BM25Index(["alpha beta", "gamma", "alpha beta", "alpha beta"])
+    hits, total = index.search("alpha", k=2)
+    assert [row for row, _ in hits] == [0, 2]
+    assert total == 3
+
+
+def test_empty_index():
+    index = BM25Index([])
+    assert len(index) == 0
+    assert index.search("anything") == ([], 0)
+
+
+def test_snippet_centres_on_the_first_query_term():
+    text = "Filler words. " * 40 + "The Norma Cluster sits near the centre. " + "More filler. " * 40
+    excerpt = snippet(text, query_terms("norma"), width=80)
+    assert "Norma Cluster" in excerpt
+    assert excerpt.startswith("...") and excerpt.endswith("...")
+    assert len(excerpt) <= 80 + 40 + 6
+
+
+def test_snippet_without_a_match_is_the_start_of_the_text():
+    assert snippet("Short text.", ["quasar"]) == "Short text."
+    assert snippet("word " * 100, ["quasar"], width=20).endswith("...")
@@ -0,0 +1,57 @@
+import pytest
+
+from utils.chunk_store import ChunkStore, chunk_id_from_uri, chunk_uri, normalize_chunks
+
+CHUNKS = [
+    {"chunk_id": 4, "text": "The Great Attractor", "doc_id": "paper.pdf"},
+    {"chunk_id": 7, "text": "Zone of Avoidance — Milky Way plane", "doc_id": "paper.pdf"},
+    {"chunk_id": 9, "text": "", "doc_id": "paper.pdf"},
+]
+
+
+@pytest.fixture(params=["memory", "mmap"])
+def store(request, tmp_path):
+    mmap_path = str(tmp_path / "texts" / "chunks.bin") if request.param == "mmap" else None
+    store = ChunkStore(CHUNKS, mmap_path=mmap_path)
+    yield store
+    store.close()
+
+
+def test_reads_by_chunk_id_and_row(store):
+    assert len(store) == 3
+    assert list(store.chunk_ids) == [4, 7, 9]
+    assert store.text(7) == "Zone of Avoidance — Milky Way plane"
+    assert store.text_at(0) == "The Great Attractor"
+    assert store.text(9) == ""
+    assert 4 in store and 5 not in store
+    with pytest.raises(KeyError):
+        store.text(5)
+
+
+def test_descriptors_round_trip_through_uris(store):
+    uris = [descriptor["uri"] for descriptor in store.descriptors]
+    assert uris == [chunk_uri(4), chunk_uri(7), chunk_uri(9)]
+    assert [chunk_id_from_uri(uri) for uri in uris] == [4, 7, 9]
+
+
+@pytest.mark.parametrize("uri", ["document://great_attractor/chunk_x", "file:///chunk_1", ""])
+def test_other_uris_are_not_chunks(uri):
+    assert chunk_id_from_uri(uri) is None
+
+
+def test_empty_mmap_store(tmp_path):
+    store = ChunkStore([{"chunk_id": 0, "text": ""}], mmap_path=str(tmp_path / "chunks.bin"))
+    assert store.text(0) == ""
+    store.close()
+
+
+def test_duplicate_chunk_ids_are_rejected():
+    with pytest.raises(ValueError):
+        ChunkStore([{"chunk_id": 1, "text": "a"}, {"chunk_id": 1, "text": "b"}])
+
+
+def test_normalize_chunks_accepts_block_outputs():
+    assert normalize_chunks(None) == []
+    assert normalize_chunks({"chunks": CHUNKS}) == CHUNKS
+    assert normalize_chunks({"a": CHUNKS[0]}) == [CHUNKS[0]]
+    assert ChunkStore([{"text": "a"}, {"text": "b"}]).chunk_ids.tolist() == [0, 1]
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.chunk_table import TABLE_HEADER, ChunkTable, ChunkTableFile, open_corpus, write_chunk_table
+from utils.corpus_file import CorpusNotReady
+from utils.text_chunker import iter_chunks
+
+TEXT = ("1 Introduction\n\nThe Great Attractor lies in the Zone of Avoidance. Its pull was inferred from "
+        "peculiar velocities.\n\n2 Observations\n\nX-ray surveys found the Norma Cluster — Abell 3627 — near "
+        "its centre.\n\n3 Results\n\nThe Shapley Supercluster lies beyond it.")
+
+
+@pytest.fixture
+def table():
+    chunks = iter_chunks(TEXT, max_tokens=30, min_tokens=1, overlap_sentences=0, page_starts=[(1, 0), (2, 120)])
+    return ChunkTable.from_chunks(TEXT, ({**chunk, "doc_id": "great_attractor.pdf"} for chunk in chunks))
+
+
+def test_headings_are_interned(table):
+    assert table.headings == ["1 Introduction", "2 Observations", "3 Results"]
+    assert [chunk["heading"] for chunk in table] == ["1 Introduction", "2 Observations", "3 Results"]
+    assert all(chunk["text"] == TEXT[chunk["start_char"]:chunk["end_char"]] for chunk in table)
+
+
+def test_dict_round_trip(table):
+    restored = ChunkTable.from_dict(json.loads(json.dumps(table.to_dict())))
+    assert list(restored) == list(table)
+
+
+def test_file_round_trip_keeps_headings_and_non_ascii_text(tmp_path, table):
+    path = str(tmp_path / "corpus")
+    generation = write_chunk_table(path, table)
+    assert write_chunk_table(path, table) == generation
+
+    corpus = open_corpus(path)
+    assert isinstance(corpus, ChunkTableFile)
+    assert corpus.generation == generation
+    assert [corpus.chunk_at(row) for row in range(len(corpus))] == list(table)
+    assert corpus.chunk(int(table.chunk_ids[1]))["heading"] == "2 Observations"
+    corpus.close()
+
+
+def test_reads_tables_written_before_the_heading_column(tmp_path, table):
+    text = table.text.encode("utf-8")
+    byte_starts, byte_ends = table.byte_offsets()
+    columns = b"".join(column.astype(dtype).tobytes() for column, dtype in (
+        (table.chunk_ids, np.int64), (byte_starts, np.int64), (byte_ends, np.int64), (table.starts, np.int64),
+        (table.ends, np.int64), (table.doc_index, np.int32), (table.pages, np.int32),
+        (table.token_counts, np.int32)))
+    docs = json.dumps(table.doc_ids).encode("utf-8")
+    path = tmp_path / "corpus"
+    path.write_bytes(TABLE_HEADER.pack(b"CHNKTBL1", len(table), len(docs), len(text), b"\0" * 16)
+                     + columns + docs + text)
+
+    corpus = open_corpus(str(path))
+    assert [corpus.text_at(row) for row in range(len(corpus))] == [table.text_at(row) for row in range(len(table))]
+    assert corpus.chunk_at(0)["heading"] is None
+    corpus.close()
+
+
+def test_truncated_table_is_not_ready(tmp_path, table):
+    path = tmp_path / "corpus"
+    write_chunk_table(str(path), table)
+    path.write_bytes(path.read_bytes()[:-5])
+    with pytest.raises(CorpusNotReady):
+        ChunkTableFile(str(path))
@@ -0,0 +1,79 @@
+import json
+import sys
+
+import pytest
+
+from utils.compact_trade_format import (
+    CompactTradeSerializer,
+    decode_compact_trade,
+    decode_trade_message,
+    decode_trade_messages,
+    is_compact,
+)
+
+INT64_MAX = 2 ** 63 - 1
+
+
+def trade(**fields):
+    payload = {
+        "symbol": "BTCUSDT",
+        "price": 67123.45,
+        "quantity": 0.0015,
+        "timestamp": 1700000000120,
+        "buyer_maker": True,
+        "trade_id": 3912345678,
+        "stream": "btcusdt@trade",
+        "processing_time": "2026-10-18T12:00:00.123456",
+        "exchange": "binance",
+        "data_type": "trade",
+    }
+    payload.update(fields)
+    if "symbol" in fields:
+        payload["stream"] = f"{fields['symbol'].lower()}@trade"
+    return payload
+
+
+@pytest.mark.parametrize("payload", [
+    trade(),
+    trade(buyer_maker=False, data_type="trade_backfill"),
+    trade(buyer_maker=None, trade_id=None, timestamp=None),
+    trade(symbol="币安人生USDT"),
+    trade(symbol="ÄÖÜ€USDT"),
+    trade(price=sys.float_info.max, quantity=sys.float_info.min),
+    trade(price=5e-324, quantity=1e308),
+    trade(price=0.0, quantity=0.0),
+    trade(price=0.1 + 0.2, quantity=123456789.123456789),
+    trade(trade_id=INT64_MAX, timestamp=INT64_MAX),
+    trade(trade_id=0, timestamp=0),
+], ids=["trade", "backfill", "nulls", "cjk symbol", "accented symbol", "largest price",
+        "denormal price", "zero", "inexact decimals", "int64 max", "zero ids"])
+def test_round_trip(payload):
+    encoded = CompactTradeSerializer()(payload)
+
+    assert is_compact(encoded)
+    assert decode_compact_trade(encoded) == payload
+    assert decode_trade_message(encoded) == payload
+
+
+def test_compact_message_is_smaller_than_json():
+    payload = trade()
+
+    assert len(CompactTradeSerializer()(payload)) < len(json.dumps(payload)) / 4
+
+
+def test_mixed_layouts_decode_to_the_same_dicts():
+    first, second = trade(), trade(symbol="ETHUSDT", buyer_maker=False)
+    messages = [CompactTradeSerializer()(first), json.dumps(second).encode("utf-8"), first]
+
+    assert decode_trade_messages(messages) == [first, second, first]
+    assert not is_compact(json.dumps(first).encode("utf-8"))
+
+
+def test_unknown_version_is_rejected():
+    encoded = bytearray(CompactTradeSerializer()(trade()))
+    encoded[1] = 99
+
+    with pytest.raises(ValueError):
+        decode_compact_trade(bytes(encoded))
+    with pytest.raises(ValueError):
+        CompactTradeSerializer(version=99)
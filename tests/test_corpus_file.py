@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from utils.corpus_file import CorpusFile, CorpusNotReady, index_path_for, write_corpus
+
+CHUNKS = [{"chunk_id": 3, "text": "The Great Attractor"}, {"chunk_id": 5, "text": "Norma Cluster — Abell 3627"}]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "corpus.jsonl")
+    generation = write_corpus(path, CHUNKS)
+    corpus = CorpusFile(path)
+    assert corpus.generation == generation
+    assert len(corpus) == 2 and corpus.chunk_ids.tolist() == [3, 5]
+    assert corpus.text(5) == "Norma Cluster — Abell 3627"
+    assert corpus.chunk_at(0) == CHUNKS[0]
+    assert 3 in corpus and 4 not in corpus
+    assert [descriptor["uri"] for descriptor in corpus.descriptors][-1].endswith("chunk_5")
+    with pytest.raises(KeyError):
+        corpus.text(4)
+    corpus.close()
+
+
+def test_unchanged_chunks_keep_the_generation_and_files(tmp_path):
+    path = str(tmp_path / "corpus.jsonl")
+    generation = write_corpus(path, CHUNKS)
+    modified = os.stat(path).st_mtime_ns
+    assert write_corpus(path, [dict(chunk) for chunk in CHUNKS]) == generation
+    assert os.stat(path).st_mtime_ns == modified
+    assert write_corpus(path, CHUNKS[:1]) != generation
+
+
+def test_rewrite_is_detected_by_an_open_reader(tmp_path):
+    path = str(tmp_path / "corpus.jsonl")
+    write_corpus(path, CHUNKS)
+    corpus = CorpusFile(path)
+    assert not corpus.changed()
+    write_corpus(path, CHUNKS + [{"chunk_id": 6, "text": "Shapley"}])
+    assert corpus.changed()
+    # The open reader keeps serving the file it mapped
+    assert corpus.text(3) == "The Great Attractor"
+    corpus.close()
+
+
+def test_missing_corpus_is_not_ready(tmp_path):
+    with pytest.raises(CorpusNotReady):
+        CorpusFile(str(tmp_path / "missing.jsonl"))
+
+
+def test_mismatched_generations_are_not_ready(tmp_path):
+    path = str(tmp_path / "corpus.jsonl")
+    write_corpus(path, CHUNKS)
+    stale_index = open(index_path_for(path), "rb").read()
+    write_corpus(path, CHUNKS[:1])
+    # As if a reader caught the writer between its two renames
+    with open(index_path_for(path), "wb") as f:
+        f.write(stale_index)
+    with pytest.raises(CorpusNotReady):
+        CorpusFile(path)
+
+
+def test_truncated_index_is_not_ready(tmp_path):
+    path = str(tmp_path / "corpus.jsonl")
+    write_corpus(path, CHUNKS)
+    with open(index_path_for(path), "r+b") as f:
+        f.truncate(10)
+    with pytest.raises(CorpusNotReady):
+        CorpusFile(path)
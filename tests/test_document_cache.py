@@ -0,0 +1,98 @@
+import hashlib
+
+import requests
+
+from utils.document_cache import DocumentCache
+
+
+class Response:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+
+class Server:
+    """Serves documents by URL with ETags, answering conditional requests with 304"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+        self.offline = False
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        if self.offline:
+            raise requests.ConnectionError("offline")
+        body = self.documents[url]
+        etag = hashlib.md5(body).hexdigest()
+        if (headers or {}).get("If-None-Match") == etag:
+            return Response(304)
+        return Response(200, body, {"ETag": etag})
+
+
+def test_unchanged_document_is_revalidated_not_downloaded(tmp_path):
+    server = Server({"https://example.org/a.pdf": b"%PDF a" * 100})
+    cache = DocumentCache(str(tmp_path))
+    path, content_hash = cache.fetch("https://example.org/a.pdf", session=server)
+    assert cache.fetch("https://example.org/a.pdf", session=server) == (path, content_hash)
+    assert server.requests[1][1] == {"If-None-Match": hashlib.md5(b"%PDF a" * 100).hexdigest()}
+    assert (cache.stats["downloaded"], cache.stats["revalidated"]) == (1, 1)
+
+    server.offline = True
+    assert cache.fetch("https://example.org/a.pdf", session=server) == (path, content_hash)
+    assert cache.stats["stale"] == 1
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF a" * 100
+    cache.close()
+
+
+def test_pages_are_shared_by_content_hash(tmp_path):
+    body = b"%PDF same"
+    server = Server({"https://example.org/a.pdf": body, "https://mirror.example.org/a.pdf": body})
+    cache = DocumentCache(str(tmp_path))
+    _, content_hash = cache.fetch("https://example.org/a.pdf", session=server)
+    cache.put_pages(content_hash, "PyPDF2-3", [{"page": 1, "text": "hello"}])
+    _, mirrored_hash = cache.fetch("https://mirror.example.org/a.pdf", session=server)
+    assert mirrored_hash == content_hash
+    assert cache.get_pages(content_hash, "PyPDF2-3") == [{"page": 1, "text": "hello"}]
+    assert cache.get_pages(content_hash, "PyPDF2-4") is None
+    cache.close()
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path, clock):
+    documents = {f"https://example.org/{name}.pdf": name.encode() * 400 for name in "abc"}
+    server = Server(documents)
+    cache = DocumentCache(str(tmp_path), max_bytes=1000)
+    hashes = {}
+    for name in "ab":
+        clock.now += 1
+        hashes[name] = cache.fetch(f"https://example.org/{name}.pdf", session=server)[1]
+    clock.now += 1
+    cache.fetch("https://example.org/a.pdf", session=server)    # A 304 hit makes a the most recent
+
+    clock.now += 1
+    hashes["c"] = cache.fetch("https://example.org/c.pdf", session=server)[1]
+    assert cache.stats["evicted"] == 1
+    assert cache.size() <= 1000
+    assert not (tmp_path / "blobs" / f"{hashes['b']}.bin").exists()
+    assert (tmp_path / "blobs" / f"{hashes['a']}.bin").exists()
+
+    # An evicted document is downloaded again rather than revalidated
+    cache.fetch("https://example.org/b.pdf", session=server)
+    assert "If-None-Match" not in server.requests[-1][1]
+    cache.close()
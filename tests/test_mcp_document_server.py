@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from utils.chunk_store import ChunkStore, chunk_uri
+from utils.corpus_file import index_path_for, write_corpus
+
+CHUNKS = [
+    {"chunk_id": 0, "text": "The Great Attractor is a gravitational anomaly in intergalactic space."},
+    {"chunk_id": 1, "text": "The Norma Cluster lies near the centre of the Great Attractor."},
+    {"chunk_id": 2, "text": "Dark matter halos dominate the mass of galaxy clusters."},
+    {"chunk_id": 3, "text": "The Shapley Supercluster lies beyond the Great Attractor."},
+]
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    server = pytest.importorskip("mcp_document_server")
+    path = str(tmp_path / "corpus.jsonl")
+    write_corpus(path, CHUNKS)
+    monkeypatch.delenv("DOCUMENT_VECTOR_INDEX_PATH", raising=False)
+    monkeypatch.setattr(server, "CORPUS_PATH", path)
+    monkeypatch.setattr(server, "RELOAD_CHECK_SECONDS", 0.0)
+    monkeypatch.setattr(server, "_last_reload_check", 0.0)
+    yield server
+    server.set_store(ChunkStore([]))
+
+
+def call(server, name, **arguments):
+    return json.loads(asyncio.run(server.handle_call_tool(name, arguments))[0].text)
+
+
+def test_vector_search_does_not_build_the_bm25_index(server):
+    result = call(server, "search_document", query="Norma Cluster", mode="vector", max_results=2)
+    assert result["chunk_ids"][0] == 1
+    assert "Norma Cluster" in result["results"][0]["snippet"]
+    assert server.SEARCH_INDEX is None
+    assert server.VECTOR_INDEX is not None
+
+
+def test_bm25_search_does_not_load_the_vector_index(server):
+    result = call(server, "search_document", query="Norma Cluster", mode="bm25")
+    assert result["chunk_ids"] == [1, 2]
+    assert server.VECTOR_INDEX is None and server.SEARCH_INDEX is not None
+
+
+def test_rewritten_corpus_is_served_with_fresh_indexes(server):
+    call(server, "search_document", query="Norma", mode="hybrid")
+    old_generation = server.STORE.generation
+
+    write_corpus(server.CORPUS_PATH, CHUNKS + [{"chunk_id": 4, "text": "Laniakea contains the Norma region."}])
+    result = call(server, "search_document", query="Laniakea", mode="hybrid")
+    assert server.STORE.generation != old_generation
+    assert result["chunk_ids"][0] == 4
+    assert len(server.SEARCH_INDEX) == len(server.VECTOR_INDEX) == 5
+
+
+def test_unreadable_corpus_keeps_the_loaded_one(server):
+    call(server, "search_document", query="Norma")
+    generation = server.STORE.generation
+
+    os.remove(index_path_for(server.CORPUS_PATH))
+    with open(server.CORPUS_PATH, "ab") as f:
+        f.write(b"\n")
+    result = call(server, "search_document", query="Norma", mode="bm25")
+    assert server.STORE.generation == generation
+    assert result["chunk_ids"] == [1]
+
+
+def test_search_then_read_chunks(server):
+    found = call(server, "search_document", query="Great Attractor", max_results=2)
+    assert found["mode"] == "bm25"
+    assert found["total_matches"] == 3
+    assert len(found["chunk_ids"]) == 2
+    assert all("Great Attractor" in result["snippet"] for result in found["results"])
+
+    read = call(server, "read_chunks", chunk_ids=found["chunk_ids"] + [99])
+    assert [chunk["chunk_id"] for chunk in read["chunks"]] == found["chunk_ids"]
+    assert read["chunks"][0]["text"] == CHUNKS[found["chunk_ids"][0]]["text"]
+    assert read["missing"] == [99]
+
+
+def test_hybrid_results_carry_both_scores(server):
+    result = call(server, "search_document", query="dark matter halos", mode="hybrid", max_results=1)
+    assert result["chunk_ids"] == [2]
+    assert set(result["results"][0]) >= {"bm25_score", "vector_score", "snippet"}
+
+
+def test_bad_search_mode_is_reported(server):
+    result = call(server, "search_document", query="Norma", mode="fuzzy")
+    assert "Unknown search mode" in result["error"]
+
+
+def test_resources_list_and_read(server):
+    resources = asyncio.run(server.handle_list_resources())
+    assert [str(resource.uri) for resource in resources] == [chunk_uri(chunk["chunk_id"]) for chunk in CHUNKS]
+    assert asyncio.run(server.handle_read_resource(chunk_uri(3))) == CHUNKS[3]["text"]
+    with pytest.raises(ValueError):
+        asyncio.run(server.handle_read_resource(chunk_uri(42)))
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.mcp_session_pool import MCPSessionPool, get_session_pool
+
+SERVER = SimpleNamespace(command="python", args=["mcp_document_server.py"], env={"DOCUMENT_CORPUS_PATH": "c"}, cwd=None)
+
+
+class FakeSession:
+    def __init__(self, number):
+        self.number = number
+        self.healthy = True
+        self.closed = False
+
+    async def send_ping(self):
+        if not self.healthy:
+            raise ConnectionError("server went away")
+
+
+class FakeServerPool(MCPSessionPool):
+    """Hands out in-process fake sessions instead of spawning MCP servers"""
+
+    def __init__(self, **kwargs):
+        self.sessions = []
+        super().__init__(**kwargs)
+
+    async def _session_task(self, pooled):
+        session = FakeSession(len(self.sessions))
+        self.sessions.append(session)
+        pooled.session = session
+        pooled.ready.set_result(session)
+        await pooled.closing.wait()
+        session.closed = True
+
+
+async def session_number(session):
+    return session.number
+
+
+@pytest.fixture
+def pool():
+    pool = FakeServerPool(idle_timeout_seconds=3600)
+    yield pool
+    pool.close()
+
+
+def test_sessions_are_reused(pool):
+    assert [pool.run(SERVER, session_number, version="v1") for _ in range(3)] == [0, 0, 0]
+    assert pool.stats["created"] == 1 and pool.stats["reused"] == 2
+    assert pool.idle_sessions() == 1
+
+
+def test_new_version_retires_old_sessions(pool):
+    assert pool.run(SERVER, session_number, version="v1") == 0
+    assert pool.run(SERVER, session_number, version="v2") == 1
+    assert pool.sessions[0].closed
+    assert pool.stats["evicted_version"] == 1
+    assert pool.run(SERVER, session_number, version="v2") == 1
+
+
+def test_session_is_discarded_after_an_error(pool):
+    async def fail(session):
+        raise RuntimeError("request failed mid-stream")
+
+    pool.run(SERVER, session_number)
+    with pytest.raises(RuntimeError):
+        pool.run(SERVER, fail)
+    assert pool.sessions[0].closed
+    assert pool.stats["discarded"] == 1
+    assert pool.run(SERVER, session_number) == 1
+
+
+def test_session_failing_its_health_check_is_replaced():
+    pool = FakeServerPool(health_check_seconds=0, idle_timeout_seconds=3600)
+    try:
+        pool.run(SERVER, session_number)
+        assert pool.run(SERVER, session_number) == 0     # Pinged, healthy, reused
+        pool.sessions[0].healthy = False
+        assert pool.run(SERVER, session_number) == 1
+        assert pool.stats["health_check_failures"] == 1
+        assert pool.sessions[0].closed
+    finally:
+        pool.close()
+
+
+def test_close_closes_idle_sessions_and_cancels_idle_eviction(pool):
+    pool.run(SERVER, session_number)
+    pool.close()
+    assert pool.sessions[0].closed
+    assert pool._evictor.cancelled()
+    assert not pool._thread.is_alive()
+    with pytest.raises(RuntimeError):
+        pool.run(SERVER, session_number)
+    pool.close()  # A second close is a no-op
+
+
+def test_one_pool_per_process():
+    assert get_session_pool() is get_session_pool()
@@ -0,0 +1,57 @@
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from utils.pdf_extraction import iter_pages
+
+HELVETICA = DictionaryObject({
+    NameObject("/Type"): NameObject("/Font"),
+    NameObject("/Subtype"): NameObject("/Type1"),
+    NameObject("/BaseFont"): NameObject("/Helvetica"),
+})
+# Tf and Tj without operands make extract_text raise
+BROKEN_PAGE = "BT /F1 Tf Tj ET"
+
+
+def write_pdf(path, contents):
+    """One page per content stream, with Helvetica as /F1"""
+    writer = PdfWriter()
+    for content in contents:
+        page = PageObject.create_blank_page(None, 612, 792)
+        stream = DecodedStreamObject()
+        stream.set_data(content.encode("latin-1"))
+        page[NameObject("/Contents")] = stream
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): HELVETICA})})
+        writer.add_page(page)
+    with open(path, "wb") as output:
+        writer.write(output)
+    return str(path)
+
+
+def text_page(number):
+    return f"BT /F1 12 Tf 72 720 Td (Page {number}) Tj ET"
+
+
+def test_process_pool_returns_pages_in_order(tmp_path):
+    path = write_pdf(tmp_path / "document.pdf", [text_page(number) for number in range(1, 21)])
+
+    pages = list(iter_pages(path, max_workers=2, pages_per_task=3, parallel_threshold=1))
+
+    assert [page["page"] for page in pages] == list(range(1, 21))
+    assert [page["text"] for page in pages] == [f"Page {number}" for number in range(1, 21)]
+    assert pages == list(iter_pages(path, max_workers=1))
+
+
+def test_failing_page_is_recorded_and_the_rest_are_kept(tmp_path):
+    contents = [text_page(number) for number in range(1, 11)]
+    contents[4] = BROKEN_PAGE
+    path = write_pdf(tmp_path / "document.pdf", contents)
+
+    for pages in (list(iter_pages(path, max_workers=2, pages_per_task=3, parallel_threshold=1)),
+                  list(iter_pages(path, max_workers=1))):
+        assert [page["page"] for page in pages] == list(range(1, 11))
+        failed = pages[4]
+        assert failed["text"] == "" and failed["chars"] == 0 and failed["error"]
+        assert [page["text"] for page in pages if page is not failed] == [
+            f"Page {number}" for number in range(1, 11) if number != 5]
+        assert not any(page.get("error") for page in pages if page is not failed)
@@ -0,0 +1,20 @@
+from utils.process_instances import drop_instance, shared_instance
+from utils.symbol_state_store import get_state_store
+
+
+def test_one_instance_per_key():
+    first = shared_instance(("test", "a"), object)
+    assert shared_instance(("test", "a"), object) is first
+    assert shared_instance(("test", "b"), object) is not first
+    drop_instance(("test", "a"))
+    assert shared_instance(("test", "a"), object) is not first
+
+
+def test_closed_state_store_is_reopened(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    store = get_state_store(path)
+    assert get_state_store(path) is store
+    store.close()
+    reopened = get_state_store(path)
+    assert reopened is not store
+    reopened.close()
@@ -0,0 +1,93 @@
+from utils.chunk_table import ChunkTable
+from utils.prompt_context import CACHE_CONTROL, MIN_CACHE_TOKENS, ContextAssembler, merge_passages, trim_to_tokens
+from utils.text_chunker import approximate_tokens, iter_chunks
+
+
+def document_table(sections, paragraphs=4):
+    """A chunk table built the way chunk_pdf_text builds it, after a round trip through the block output"""
+    text = "\n\n".join(
+        f"{number} Section on Region {number}\n\n" + "\n\n".join(
+            f"Region {number} paragraph {paragraph}. Galaxies there move toward the Great Attractor at several "
+            f"hundred kilometres per second, and the Norma Cluster lies near its centre."
+            for paragraph in range(paragraphs))
+        for number in range(1, sections + 1))
+    table = ChunkTable.from_chunks(text, iter_chunks(text, max_tokens=200, min_tokens=50))
+    return ChunkTable.from_dict(table.to_dict())
+
+
+def breakpoint_tokens(system, count_tokens=approximate_tokens):
+    """Estimated tokens up to and including the block carrying cache_control, or 0 without one"""
+    marked = [i for i, block in enumerate(system) if "cache_control" in block]
+    if not marked:
+        return 0
+    return sum(count_tokens(block["text"]) for block in system[:marked[-1] + 1])
+
+
+def test_chunk_table_document_is_the_cached_prefix():
+    table = document_table(sections=12)
+    assembler = ContextAssembler()
+    assembler.set_document(table)
+    system, messages, chunk_ids = assembler.build("Where is it?", [(3, table.text_at(3)), (1, table.text_at(1))])
+
+    assert assembler.document_text is not None
+    assert system[-1]["cache_control"] == CACHE_CONTROL
+    assert breakpoint_tokens(system) >= MIN_CACHE_TOKENS
+    assert all("cache_control" not in block for block in messages[0]["content"])
+    assert chunk_ids == [3, 1]
+
+
+def test_outline_is_the_cached_prefix_when_the_document_is_too_large():
+    table = document_table(sections=99, paragraphs=3)
+    assembler = ContextAssembler(full_document_token_limit=1000)
+    assembler.set_document(table)
+    first, messages, chunk_ids = assembler.build("Where is it?", [(2, table.text_at(2)), (0, table.text_at(0))])
+    second, _, _ = assembler.build("Something else?", [(5, table.text_at(5))])
+
+    assert assembler.document_text is None
+    assert first == second
+    assert "DOCUMENT OUTLINE:\n[Section 0] 1 Section on Region 1\n[Section 1] 2 Section on Region 2" in first[-1]["text"]
+    assert breakpoint_tokens(first) >= MIN_CACHE_TOKENS
+    assert messages[0]["content"][0]["text"].startswith("CONTEXT:\n[Section 0]")
+    assert chunk_ids == [0, 2]
+
+
+def test_no_breakpoint_on_a_prefix_too_short_to_cache():
+    table = document_table(sections=2, paragraphs=1)
+    assembler = ContextAssembler(full_document_token_limit=0)
+    assembler.set_document(table)
+    system, messages, _ = assembler.build("Where is it?", [(0, table.text_at(0))])
+    assert assembler.prefix_tokens < MIN_CACHE_TOKENS
+    assert breakpoint_tokens(system) == 0
+    assert all("cache_control" not in block for block in messages[0]["content"])
+
+
+def test_layout_changes_with_the_preamble():
+    assembler = ContextAssembler()
+    before = assembler.layout
+    assembler.set_document([{"chunk_id": 0, "text": "x", "heading": "1 Introduction"}])
+    assert assembler.layout != before
+
+
+def test_oversized_top_chunk_is_trimmed_by_token_count():
+    def count_words(text):
+        return len(text.split())
+
+    assembler = ContextAssembler(token_budget=5, count_tokens=count_words)
+    selected = assembler.select([(0, "one two three four five six seven"), (1, "eight")])
+    assert selected == [(0, "one two three four five ")]
+    assert trim_to_tokens("short", 5, count_words) == "short"
+
+
+def test_overlapping_chunks_are_merged():
+    text = "".join(f"sentence number {i}. " for i in range(100))
+    chunks = [(1, text[900:2000]), (0, text[:1000])]
+    assert merge_passages(chunks) == [([0, 1], text[:2000])]
+
+
+def test_chunk_and_prompt_budgets_use_the_same_token_counts():
+    text = " ".join(f"The attractor pulls galaxy number {i} toward the Norma Cluster." for i in range(200))
+    chunks = list(iter_chunks(text, max_tokens=100, min_tokens=10, overlap_sentences=0))
+    assembler = ContextAssembler(token_budget=100)
+    for chunk in chunks:
+        # A chunk that fits the chunker's budget fits an equal prompt budget untrimmed
+        assert assembler.select([(chunk["chunk_id"], chunk["text"])]) == [(chunk["chunk_id"], chunk["text"])]
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from utils.symbol_state_store import SymbolStateStore, split_metadata
+
+
+def live(trade_id, symbol="BTCUSDT", price=100.0):
+    return {"symbol": symbol, "price": price, "quantity": 1.0, "trade_id": trade_id, "data_type": "trade"}
+
+
+def backfill(trade_id, symbol="BTCUSDT", price=100.0):
+    return dict(live(trade_id, symbol, price), data_type="trade_backfill")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SymbolStateStore(str(tmp_path / "state.sqlite"))
+    yield store
+    store.close()
+
+
+def test_filter_new_drops_live_trades_at_or_below_the_watermark(store):
+    assert [m["trade_id"] for m in store.filter_new([live(1), live(2), live(3)])] == [1, 2, 3]
+    assert [m["trade_id"] for m in store.filter_new([live(2), live(3), live(4)])] == [4]
+    assert store.replayed == 2
+
+
+def test_filter_new_tracks_symbols_separately(store):
+    store.filter_new([live(10, "BTCUSDT"), live(5, "ETHUSDT")])
+    fresh = store.filter_new([live(6, "BTCUSDT"), live(6, "ETHUSDT")])
+    assert [(m["symbol"], m["trade_id"]) for m in fresh] == [("ETHUSDT", 6)]
+
+
+def test_backfills_below_the_watermark_are_kept_once(store):
+    store.filter_new([live(10), live(20)])
+    fresh = store.filter_new([backfill(12), backfill(15), backfill(12)])
+    assert [m["trade_id"] for m in fresh] == [12, 15]
+    assert store.filter_new([backfill(15), live(21)]) == [live(21)]
+    assert store.replayed == 2
+
+
+def test_backfill_keys_survive_a_restart(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    store = SymbolStateStore(path)
+    store.filter_new([live(20), backfill(12)])
+    store.end_batch()
+    store.close()
+
+    reopened = SymbolStateStore(path)
+    assert reopened.filter_new([live(20), backfill(12), backfill(13)]) == [backfill(13)]
+    reopened.close()
+
+
+def test_gap_backfill_and_filter_end_to_end(tmp_path):
+    binance_websocket = pytest.importorskip("binance_websocket")
+    from utils.trade_codecs import JsonCodec
+
+    class Producer:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, topic, key, value):
+            self.sent.append(value)
+
+    def fetcher(symbol, start_time_ms, end_time_ms):
+        # Trades 3-6 were missed; 3-4 and 5-6 were aggregated
+        return [
+            {"a": 1, "p": "101", "q": "2", "f": 3, "l": 4, "T": 1003, "m": False},
+            {"a": 2, "p": "102", "q": "1", "f": 5, "l": 6, "T": 1005, "m": True},
+        ]
+
+    def frame(trade_id):
+        return json.dumps({"stream": "btcusdt@trade", "data": {
+            "s": "BTCUSDT", "p": "100", "q": "1", "T": 1000 + trade_id, "m": False, "t": trade_id}})
+
+    producer = Producer()
+    publisher = binance_websocket.TradePublisher(producer, JsonCodec(), backfill_fetcher=fetcher)
+    publisher.publish_batch([frame(1), frame(2), frame(7), frame(8)])
+    publisher.close()
+
+    assert publisher.stats.gaps_detected == 1
+    assert publisher.stats.snapshot()["backfilled"] == 2
+    # The backfill runs on its own thread, so it can land before or after the live trades
+    live_messages = [m for m in producer.sent if m["data_type"] == "trade"]
+    backfills = [m for m in producer.sent if m["data_type"] == "trade_backfill"]
+    assert [m["trade_id"] for m in live_messages] == [1, 2, 7, 8]
+    assert [m["trade_id"] for m in backfills] == [4, 6]
+
+    store = SymbolStateStore(str(tmp_path / "state.sqlite"))
+    assert len(store.filter_new(live_messages)) == 4
+    assert store.filter_new(backfills) == backfills
+    # Kafka redelivers everything after a restart; nothing is applied twice
+    assert store.filter_new(producer.sent) == []
+    assert store.replayed == 6
+    store.close()
+
+
+def test_split_metadata():
+    payloads, metadata = split_metadata([{"data": live(1), "metadata": {"offset": 3}}, live(2)])
+    assert payloads == [live(1), live(2)]
+    assert metadata == [{"offset": 3}]
@@ -0,0 +1,71 @@
+import pytest
+
+from utils.text_chunker import approximate_tokens, is_heading, iter_chunks
+
+BODY = ("The Great Attractor is a gravitational anomaly in intergalactic space. It lies within the "
+        "Laniakea Supercluster. Its mass is estimated at tens of thousands of galaxies. ")
+
+
+@pytest.mark.parametrize("line, next_line", [
+    ("# Introduction", None),
+    ("2 Results", None),
+    ("3.1. Data and Methods", "We used the 2MASS redshift survey."),
+    ("ABSTRACT", None),
+])
+def test_headings(line, next_line):
+    assert is_heading(line, next_line)
+
+
+@pytest.mark.parametrize("line, next_line", [
+    ("100 Mpc away from the", "Great Attractor lies the Shapley Supercluster."),
+    ("2 Galaxies lie within the", "attractor region."),
+    ("THE NORMA CLUSTER AND", "its surroundings"),
+    ("3 Galaxies within 100 Mpc of", None),
+    ("1999 The survey began", None),
+])
+def test_wrapped_body_lines_are_not_headings(line, next_line):
+    assert not is_heading(line, next_line)
+
+
+def test_wrapped_number_line_stays_inside_its_paragraph():
+    text = ("1 Introduction\n\nThe Shapley Supercluster lies roughly\n"
+            "100 Mpc away from the\nGreat Attractor, behind the Zone of Avoidance.")
+    chunks = list(iter_chunks(text, max_tokens=200, min_tokens=1))
+    assert len(chunks) == 1
+    assert chunks[0]["heading"] == "1 Introduction"
+
+
+def test_headings_start_chunks_and_chunks_are_spans_of_the_text():
+    text = "\n\n".join(["1 Introduction", BODY * 3, "2 Observations", BODY * 3, "3 Results", BODY * 3])
+    chunks = list(iter_chunks(text, max_tokens=200, min_tokens=20, overlap_sentences=0))
+    assert [chunk["heading"] for chunk in chunks] == ["1 Introduction", "2 Observations", "3 Results"]
+    for chunk in chunks:
+        assert text[chunk["start_char"]:chunk["end_char"]] == chunk["text"]
+    assert " ".join(chunk["text"] for chunk in chunks).split() == text.split()
+
+
+def test_chunks_respect_max_tokens_and_overlap_by_a_sentence():
+    text = "\n\n".join(BODY * 2 for _ in range(10))
+    chunks = list(iter_chunks(text, max_tokens=60, min_tokens=10, overlap_sentences=1))
+    assert len(chunks) > 1
+    assert all(chunk["token_count"] <= 60 for chunk in chunks)
+    assert all(approximate_tokens(chunk["text"]) <= 60 for chunk in chunks)
+    for previous, following in zip(chunks, chunks[1:]):
+        assert following["start_char"] < previous["end_char"]
+        assert following["start_char"] >= previous["start_char"]
+    assert chunks[-1]["end_char"] == len(text.rstrip())
+
+
+def test_long_sentence_is_split_at_whitespace():
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = list(iter_chunks(text, max_tokens=50, min_tokens=10))
+    assert all(chunk["token_count"] <= 50 for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks).split() == text.split()
+
+
+def test_pages_are_assigned_from_page_starts():
+    text = BODY + "\n\n" + BODY
+    chunks = list(iter_chunks(text, max_tokens=40, min_tokens=1, overlap_sentences=0,
+                              page_starts=[(0, 0), (1, len(BODY) + 2)]))
+    assert chunks[0]["page"] == 0
+    assert chunks[-1]["page"] == 1
@@ -0,0 +1,74 @@
+from utils.text_cleaner import TextCleaner, normalize_line
+
+BODY = [
+    "The Great Attractor lies behind the Zone of Avoidance.\nIts pull was first inferred from peculiar velocities.",
+    "Galaxies in the Norma Cluster move toward it.\nThe Shapley Supercluster lies further out.",
+    "Redshift surveys map the local flow.\nThe dipole repeller sits opposite the attractor.",
+    "X-ray surveys see through the galactic plane.\nThey found the Norma Cluster to be massive.",
+    "Laniakea is the supercluster that contains the Milky Way.\nIts flows converge on the Great Attractor.",
+]
+
+
+def page(number, body, total=len(BODY)):
+    return f"Evidence of the Great Attractor\n{body}\nPage {number} of {total}"
+
+
+def test_running_header_and_footer_are_removed():
+    pages = [page(number, body) for number, body in enumerate(BODY, 1)]
+    cleaner = TextCleaner()
+
+    text, starts = cleaner.clean(pages)
+
+    assert cleaner.boilerplate == {"evidence of the great attractor", "page # of #"}
+    assert "Evidence of the Great Attractor" not in text
+    assert "Page" not in text
+    assert text == "\n\n".join(BODY)
+    assert [text[start:].split("\n", 1)[0] for _, start in starts] == [body.split("\n")[0] for body in BODY]
+
+
+def test_body_lines_that_appear_once_are_kept():
+    # Page 3 opens with a line unique to it, where a header would be; it is content
+    pages = [page(number, body) for number, body in enumerate(BODY, 1)]
+    pages[2] = f"Figure 3: The local velocity flow\n{pages[2]}"
+    cleaner = TextCleaner()
+
+    text, _ = cleaner.clean(pages)
+
+    assert "Figure 3: The local velocity flow" in text
+    assert all(line in text for body in BODY for line in body.split("\n"))
+
+
+def test_lines_repeated_mid_page_are_content():
+    # "Step 1" style lines recur at page edges and between paragraphs, like a numbered list
+    pages = ["\n".join([f"Step {number}", *BODY[number - 1].split("\n"), f"Step {number + 1}",
+                         *BODY[number % 5].split("\n"), f"Step {number + 2}"])
+             for number in range(1, 6)]
+    cleaner = TextCleaner()
+
+    text, _ = cleaner.clean(pages)
+
+    assert "step #" not in cleaner.boilerplate
+    assert text.count("Step") == 15
+
+
+def test_too_few_pages_learn_nothing():
+    pages = [page(number, body, total=2) for number, body in enumerate(BODY[:2], 1)]
+    cleaner = TextCleaner()
+
+    text, _ = cleaner.clean(pages)
+
+    assert cleaner.boilerplate == set()
+    assert text.count("Evidence of the Great Attractor") == 2
+
+
+def test_rules_are_applied_in_one_pass():
+    cleaner = TextCleaner(learn_boilerplate=False)
+
+    text, starts = cleaner.clean(["gravi-\ntational  pull\n\n\n\nof the  attractor", "", "  "])
+
+    assert text == "gravitational pull\n\nof the attractor"
+    assert starts == [(0, 0)]
+
+
+def test_normalize_line():
+    assert normalize_line("  Page 12   of 40 ") == "page # of #"
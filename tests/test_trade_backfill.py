@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from utils.trade_backfill import TradeGap, TradeIdTracker, backfill_gap
+from utils.trade_codecs import TradeEvent, get_codec
+
+
+def trade(trade_id, timestamp, symbol="BTCUSDT"):
+    return TradeEvent(f"{symbol.lower()}@trade", symbol, 100.0, 1.0, timestamp, False, trade_id)
+
+
+def agg(agg_id, first, last, timestamp, quantity=1.0):
+    return {"a": agg_id, "p": "100.5", "q": str(quantity), "f": first, "l": last, "T": timestamp, "m": True}
+
+
+class FakeFetcher:
+    limit = 1000
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def __call__(self, symbol, start_time_ms, end_time_ms):
+        self.calls.append((symbol, start_time_ms, end_time_ms))
+        page = [record for record in self.records if start_time_ms <= record["T"] <= end_time_ms]
+        return page[:self.limit]
+
+
+def test_tracker_reports_gaps_and_ignores_duplicates():
+    tracker = TradeIdTracker()
+    assert tracker.observe(trade(10, 1000)) is None
+    assert tracker.observe(trade(11, 1001)) is None
+    assert tracker.observe(trade(11, 1001)) is None
+    gap = tracker.observe(trade(15, 1005))
+    assert gap == TradeGap("BTCUSDT", 11, 15, 1001, 1005)
+    assert gap.missing == 3
+    assert tracker.observe(trade(14, 1004)) is None
+    assert tracker.last_trade_ids() == {"BTCUSDT": 15}
+
+
+def test_backfill_keeps_only_aggregates_inside_the_gap():
+    gap = TradeGap("BTCUSDT", 11, 20, 1001, 1010)
+    fetcher = FakeFetcher([
+        agg(1, 9, 11, 1001),     # already published
+        agg(2, 11, 13, 1002),    # straddles the start of the gap
+        agg(3, 12, 14, 1003),
+        agg(4, 15, 15, 1004, quantity=2.5),
+        agg(5, 16, 19, 1008),
+        agg(6, 19, 21, 1010),    # straddles the end of the gap
+    ])
+
+    events = backfill_gap(gap, fetcher)
+
+    assert [event.trade_id for event in events] == [14, 15, 19]
+    assert events[1].quantity == 2.5
+    assert events[1].price == 100.5
+    assert all(gap.last_trade_id < event.trade_id < gap.next_trade_id for event in events)
+    assert all(event.stream == "btcusdt@trade" for event in events)
+
+
+def test_backfill_pages_through_results():
+    gap = TradeGap("BTCUSDT", 0, 10, 1000, 1100)
+    fetcher = FakeFetcher([agg(i, i, i, 1000 + i) for i in range(1, 10)])
+    fetcher.limit = 4
+
+    events = backfill_gap(gap, fetcher)
+
+    assert [event.trade_id for event in events] == list(range(1, 10))
+    assert len(fetcher.calls) > 1
+
+
+def test_backfill_rejects_oversized_gaps():
+    with pytest.raises(ValueError):
+        backfill_gap(TradeGap("BTCUSDT", 0, 20_000, 0, 1), FakeFetcher([]), max_trades=1000)
+
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, topic, key, value):
+        self.sent.append((topic, key, value))
+
+
+def frame(trade_id, timestamp, symbol="BTCUSDT"):
+    return json.dumps({"stream": f"{symbol.lower()}@trade", "data": {
+        "s": symbol, "p": "100.0", "q": "1.0", "T": timestamp, "m": False, "t": trade_id}})
+
+
+def test_publisher_backfills_a_gap_into_published_trades():
+    binance_websocket = pytest.importorskip("binance_websocket")
+    producer = FakeProducer()
+    fetcher = FakeFetcher([agg(1, 11, 12, 1001), agg(2, 13, 14, 1003), agg(3, 15, 15, 1005)])
+    publisher = binance_websocket.TradePublisher(producer, get_codec("json"), topic="trades",
+                                                 backfill_fetcher=fetcher)
+
+    publisher.publish_batch([frame(10, 1000), frame(15, 1005), frame(16, 1006)])
+    publisher.close()   # waits for the backfill thread
+
+    live = [value for _, _, value in producer.sent if value["data_type"] == "trade"]
+    backfilled = [value for _, _, value in producer.sent if value["data_type"] == "trade_backfill"]
+    assert [value["trade_id"] for value in live] == [10, 15, 16]
+    assert [value["trade_id"] for value in backfilled] == [12, 14]
+    assert all(topic == "trades" and key == "BTCUSDT" for topic, key, _ in producer.sent)
+    assert fetcher.calls[0] == ("BTCUSDT", 1000, 1005)
+
+    stats = publisher.stats.snapshot()
+    assert (stats["gaps_detected"], stats["missing_trades"]) == (1, 4)
+    assert (stats["published"], stats["backfilled"], stats["backfill_errors"]) == (3, 2, 0)
+
+
+def test_publisher_counts_a_failed_backfill():
+    binance_websocket = pytest.importorskip("binance_websocket")
+
+    def unavailable(symbol, start_time_ms, end_time_ms):
+        raise ConnectionError("REST endpoint unavailable")
+
+    producer = FakeProducer()
+    publisher = binance_websocket.TradePublisher(producer, get_codec("json"), backfill_fetcher=unavailable)
+
+    publisher.publish_batch([frame(10, 1000), frame(15, 1005)])
+    publisher.close()
+
+    assert [value["trade_id"] for _, _, value in producer.sent] == [10, 15]
+    stats = publisher.stats.snapshot()
+    assert (stats["gaps_detected"], stats["backfilled"], stats["backfill_errors"]) == (1, 0, 1)
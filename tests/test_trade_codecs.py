@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from utils.trade_codecs import JsonCodec, TradeEvent, available_codecs, get_codec
+
+FRAME = {
+    "stream": "btcusdt@trade",
+    "data": {
+        "e": "trade", "E": 1700000000123, "s": "BTCUSDT", "t": 3912345678,
+        "p": "67123.45000000", "q": "0.00150000", "T": 1700000000120, "m": True, "M": True,
+    },
+}
+PAYLOAD = {
+    "symbol": "BTCUSDT",
+    "price": 67123.45,
+    "quantity": 0.0015,
+    "timestamp": 1700000000120,
+    "buyer_maker": False,
+    "trade_id": 3912345678,
+    "stream": "btcusdt@trade",
+    "processing_time": "2026-10-18T12:00:00.123456",
+    "exchange": "binance",
+    "data_type": "trade",
+}
+
+
+@pytest.fixture(params=available_codecs())
+def codec(request):
+    return get_codec(request.param)
+
+
+def test_json_is_always_available():
+    assert available_codecs()[-1] == "json"
+    assert get_codec("auto").name == available_codecs()[0]
+
+
+def test_codecs_decode_the_same_trade(codec):
+    expected = TradeEvent("btcusdt@trade", "BTCUSDT", 67123.45, 0.0015, 1700000000120, True, 3912345678)
+
+    for frame in (json.dumps(FRAME), json.dumps(FRAME).encode("utf-8")):
+        assert codec.decode_trade(frame) == expected
+        assert codec.decode_trade(frame) == JsonCodec().decode_trade(frame)
+
+
+@pytest.mark.parametrize("frame", [
+    "not json",
+    "[1, 2]",
+    json.dumps({"result": None, "id": 1}),
+    json.dumps({"data": FRAME["data"]}),
+], ids=["garbage", "list", "subscription reply", "no stream"])
+def test_codecs_reject_the_same_frames(codec, frame):
+    assert codec.decode_trade(frame) is None
+    assert JsonCodec().decode_trade(frame) is None
+
+
+def test_codecs_encode_the_same_payload(codec):
+    encoded = codec.encode(PAYLOAD)
+
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == json.loads(JsonCodec().encode(PAYLOAD)) == PAYLOAD
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        get_codec("pickle")
@@ -0,0 +1,79 @@
+import copy
+
+import pandas as pd
+import pytest
+
+from utils.trade_direction import add_direction_values, direction_columns
+
+
+def row_loop(messages):
+    """The original per-message loop of calculate_direction_trade_values"""
+    symbol_totals = {}
+    for message in sorted(messages, key=lambda x: (x['symbol'], x['timestamp'])):
+        symbol = message['symbol']
+        price = message['price']
+        quantity = message['quantity']
+        if symbol not in symbol_totals:
+            symbol_totals[symbol] = {'cumulative_price': 0, 'trade_count': 0}
+        trade_value_usd = price * quantity
+        message['trade_value_usd'] = trade_value_usd
+        if message['buyer_maker']:
+            message['buy_value'] = 0
+            message['sell_value'] = trade_value_usd
+            message['trade_side'] = 'SELL'
+        else:
+            message['buy_value'] = trade_value_usd
+            message['sell_value'] = 0
+            message['trade_side'] = 'BUY'
+        message['net_buy_pressure'] = message['buy_value'] - message['sell_value']
+        symbol_totals[symbol]['cumulative_price'] += price
+        symbol_totals[symbol]['trade_count'] += 1
+        message['cumulative_price_total'] = symbol_totals[symbol]['cumulative_price']
+        message['average_price'] = symbol_totals[symbol]['cumulative_price'] / symbol_totals[symbol]['trade_count']
+    return messages
+
+
+def mixed_trades():
+    # Interleaved symbols, out-of-order timestamps and both sides
+    return pd.DataFrame({
+        "symbol": ["BTCUSDT", "ETHUSDT", "BTCUSDT", "SOLUSDT", "ETHUSDT", "BTCUSDT", "ETHUSDT"],
+        "timestamp": [1700000000300, 1700000000100, 1700000000100, 1700000000200,
+                      1700000000050, 1700000000200, 1700000000400],
+        "price": [67123.45, 3512.1, 67120.01, 145.678, 3511.9, 67125.5, 3513.3],
+        "quantity": [0.015, 1.2, 0.5, 10.0, 0.01, 2.25, 0.333],
+        "buyer_maker": [True, False, False, True, True, False, True],
+    })
+
+
+@pytest.mark.parametrize("trades", [
+    mixed_trades(),
+    mixed_trades().iloc[:0],
+    mixed_trades().iloc[:1],
+], ids=["mixed", "empty", "single"])
+def test_matches_the_row_loop(trades):
+    messages = trades.to_dict("records")
+
+    expected = row_loop(copy.deepcopy(messages))
+    actual = add_direction_values(messages)
+
+    assert actual == expected
+    assert [message["trade_side"] for message in actual] == [message["trade_side"] for message in expected]
+
+
+def test_columns_align_with_the_input_order():
+    trades = mixed_trades()
+
+    columns, totals = direction_columns(trades["symbol"], trades["timestamp"], trades["price"],
+                                        trades["quantity"], trades["buyer_maker"])
+
+    expected = pd.DataFrame(row_loop(trades.to_dict("records")))
+    for name, values in columns.items():
+        assert values.tolist() == expected[name].tolist(), name
+    assert totals["ETHUSDT"] == (3511.9 + 3512.1 + 3513.3, 3)
+
+
+def test_empty_batch_has_empty_columns():
+    columns, totals = direction_columns([], [], [], [], [])
+
+    assert all(len(values) == 0 for values in columns.values())
+    assert totals == {}
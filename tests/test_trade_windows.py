@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from utils.trade_windows import OrderFlowEngine, TwoStackAggregator, WindowSpec
+
+
+def trade(timestamp, price=100.0, quantity=1.0, symbol="BTCUSDT", buy_value=0.0, sell_value=0.0):
+    return {"symbol": symbol, "timestamp": timestamp, "price": price, "quantity": quantity,
+            "buy_value": buy_value, "sell_value": sell_value}
+
+
+def by_window(records, window):
+    return [record for record in records if record["window"] == window]
+
+
+def test_aggregator_matches_a_rescan_while_evicting():
+    generator = random.Random(7)
+    aggregator = TwoStackAggregator()
+    items = []
+    timestamp = 0
+    for _ in range(2000):
+        timestamp += generator.randint(0, 50)
+        price = generator.uniform(90, 110)
+        value = (1, 1.0, price, 0.0, 0.0, price, price)
+        aggregator.push(timestamp, value)
+        items.append((timestamp, price))
+        cutoff = timestamp - 1000
+        aggregator.evict_through(cutoff)
+        items = [item for item in items if item[0] > cutoff]
+
+        count, volume, notional, _, _, high, low = aggregator.aggregate()
+        prices = [price for _, price in items]
+        assert count == len(items) == len(aggregator)
+        assert notional == pytest.approx(sum(prices))
+        assert (high, low) == (max(prices), min(prices))
+
+
+def test_sliding_window_evicts_trades_that_leave_it():
+    engine = OrderFlowEngine(windows=[WindowSpec("1s", 1_000)], allowed_lateness_ms=0)
+    engine.process([trade(1_000, price=10.0), trade(1_500, price=20.0)])
+    [record] = engine.process([trade(2_200, price=30.0)])
+    # The window ends at the watermark (2200) and no longer holds the trade at 1000
+    assert (record["window_start"], record["window_end"]) == (1_200, 2_200)
+    assert record["trade_count"] == 2
+    assert record["vwap"] == pytest.approx(25.0)
+    assert (record["high"], record["low"]) == (30.0, 20.0)
+
+
+def test_out_of_order_trades_wait_for_the_watermark_and_late_ones_are_dropped():
+    engine = OrderFlowEngine(windows=[WindowSpec("10s", 10_000)], allowed_lateness_ms=2_000)
+    assert engine.process([trade(1_000)]) == []   # Watermark 0 (1000 - lateness) releases nothing
+    assert engine.process([trade(5_000), trade(3_000)])[0]["trade_count"] == 2
+    assert engine.watermark == 3_000
+
+    engine.process([trade(2_500), trade(4_000)])
+    assert engine.late_trades == 1
+    [record] = engine.flush()
+    assert record["trade_count"] == 4
+    assert record["window_end"] == 5_000
+
+
+def test_hopping_window_emits_once_per_hop_boundary():
+    engine = OrderFlowEngine(windows=[WindowSpec("2s_hop_1s", 2_000, 1_000)], allowed_lateness_ms=0)
+    records = []
+    for timestamp in range(500, 5_000, 250):
+        records += engine.process([trade(timestamp, buy_value=100.0)])
+    ends = [record["window_end"] for record in records]
+    assert ends == [1_000, 2_000, 3_000, 4_000]
+    # Each 2s window holds the trades in (end - 2000, end]; the first one starts before the stream
+    assert [record["trade_count"] for record in records] == [3, 7, 8, 8]
+    assert all(record["imbalance"] == 1.0 for record in records)
+
+
+def test_symbols_are_windowed_separately():
+    engine = OrderFlowEngine(windows=[WindowSpec("1s", 1_000)], allowed_lateness_ms=0)
+    records = engine.process([trade(1_000, symbol="BTCUSDT"), trade(1_000, symbol="ETHUSDT", price=5.0)])
+    assert {record["symbol"]: record["vwap"] for record in by_window(records, "1s")} == {
+        "BTCUSDT": 100.0, "ETHUSDT": 5.0}
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from utils.bm25_index import BM25Index
+from utils.vector_index import HashingEmbedder, VectorIndex, get_embedder, hybrid_search, load_or_build_index
+
+TEXTS = [
+    "The Great Attractor pulls galaxies toward it.",
+    "The Norma Cluster lies near the centre of the Great Attractor.",
+    "Dark energy drives the expansion of the universe.",
+    "Galaxy clusters trace the distribution of dark matter.",
+]
+
+
+def random_unit_vectors(count, dim, seed):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = get_embedder("hashing-64")
+    vectors = embedder.embed(TEXTS)
+    assert vectors.shape == (4, 64)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors, HashingEmbedder(dim=64).embed(TEXTS))
+    assert not embedder.embed([""]).any()
+
+
+def test_exact_search_finds_the_closest_text():
+    embedder = HashingEmbedder()
+    index = VectorIndex(embedder.embed(TEXTS))
+    hits = index.search(embedder.embed(["Norma Cluster centre"])[0], k=2)
+    assert hits[0][0] == 1
+    assert hits[0][1] > hits[1][1]
+
+
+def test_ivf_search_matches_exact_search_when_probing_every_cluster():
+    vectors = random_unit_vectors(600, 16, seed=1)
+    exact = VectorIndex(vectors)
+    ivf = VectorIndex(vectors, nlist=12, nprobe=12, exact_threshold=100)
+    assert ivf.centroids is not None and exact.centroids is None
+    for query in random_unit_vectors(10, 16, seed=2):
+        assert [row for row, _ in ivf.search(query, k=5)] == [row for row, _ in exact.search(query, k=5)]
+
+
+def test_ivf_search_with_few_probes_finds_an_indexed_vector():
+    vectors = random_unit_vectors(600, 16, seed=3)
+    ivf = VectorIndex(vectors, nlist=12, nprobe=2, exact_threshold=100)
+    row, score = ivf.search(vectors[123], k=1)[0]
+    assert row == 123 and score == pytest.approx(1.0)
+
+
+def test_saved_index_is_reused_until_chunks_or_embedder_change(tmp_path, monkeypatch):
+    path = str(tmp_path / "vectors.npz")
+    embedder = HashingEmbedder()
+    built = load_or_build_index(embedder, [0, 1, 2, 3], TEXTS, path)
+
+    def fail(texts):
+        raise AssertionError("the saved index should have been reused")
+
+    monkeypatch.setattr(embedder, "embed", fail)
+    reused = load_or_build_index(embedder, [0, 1, 2, 3], TEXTS, path)
+    assert np.array_equal(reused.embeddings, built.embeddings)
+    monkeypatch.undo()
+
+    changed = load_or_build_index(embedder, [0, 1, 2, 3], TEXTS[:3] + ["Something else entirely."], path)
+    assert changed.fingerprint != built.fingerprint
+    other_embedder = load_or_build_index(HashingEmbedder(dim=32), [0, 1, 2, 3], TEXTS, path)
+    assert other_embedder.embeddings.shape == (4, 32)
+
+
+def test_ivf_index_survives_a_save(tmp_path):
+    vectors = random_unit_vectors(300, 8, seed=4)
+    index = VectorIndex(vectors, nlist=6, nprobe=6, exact_threshold=100, embedder_name="test", fingerprint="f")
+    index.save(str(tmp_path / "vectors.npz"))
+    loaded = VectorIndex.load(str(tmp_path / "vectors.npz"))
+    query = random_unit_vectors(1, 8, seed=5)[0]
+    assert loaded.search(query, k=4) == index.search(query, k=4)
+    assert (loaded.embedder_name, loaded.fingerprint) == ("test", "f")
+
+
+def test_corrupt_saved_index_is_rebuilt(tmp_path):
+    path = tmp_path / "vectors.npz"
+    path.write_bytes(b"not an npz file")
+    index = load_or_build_index(HashingEmbedder(), [0, 1, 2, 3], TEXTS, str(path))
+    assert len(index) == 4
+
+
+def test_hybrid_scores_fuse_normalized_bm25_and_cosine():
+    embedder = HashingEmbedder()
+    bm25 = BM25Index(TEXTS)
+    vectors = VectorIndex(embedder.embed(TEXTS))
+    query = "dark matter clusters"
+    hits = hybrid_search(bm25, vectors, query, embedder.embed([query])[0], k=4, alpha=0.5)
+    assert hits[0][0] == 3
+
+    top_bm25 = max(bm25_score for _, _, bm25_score, _ in hits)
+    for row, fused, bm25_score, cosine in hits:
+        assert fused == pytest.approx(0.5 * cosine + 0.5 * bm25_score / top_bm25)
+    assert [fused for _, fused, _, _ in hits] == sorted((fused for _, fused, _, _ in hits), reverse=True)
+
+    lexical_only = hybrid_search(bm25, vectors, query, embedder.embed([query])[0], k=1, alpha=0.0)
+    assert lexical_only[0][1] == pytest.approx(1.0)
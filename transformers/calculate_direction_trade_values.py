@@ -1,8 +1,15 @@
 from typing import Dict, List
 
+from utils.compact_trade_format import decode_trade_messages
+from utils.symbol_state_store import get_state_store, split_metadata
+from utils.trade_direction import add_direction_values
+
 if 'transformer' not in globals():
     from mage_ai.data_preparation.decorators import transformer
 
+# Per-symbol running totals survive across batches and restarts (see utils/symbol_state_store.py)
+STATE_STORE_PATH = '/home/src/mage_data/cole-ws/kafka_demo_/symbol_state.sqlite'
+
 
 @transformer
 def transform(messages: List[Dict], *args, **kwargs):
@@ -15,50 +22,32 @@ def transform(messages: List[Dict], *args, **kwargs):
        Transformed messages with buy/sell pressure calculations and price totals
    """
    
-   # Sort messages by timestamp and symbol to maintain order
-   messages_sorted = sorted(messages, key=lambda x: (x['symbol'], x['timestamp']))
-   
-   # Track running totals per symbol
-   symbol_totals = {}
-   
-   for message in messages_sorted:
-       symbol = message['symbol']
-       price = message['price']
-       quantity = message['quantity']
-       
-       # Initialize symbol tracking if not exists
-       if symbol not in symbol_totals:
-           symbol_totals[symbol] = {'cumulative_price': 0, 'trade_count': 0}
-       
-       # Basic trade value (price × quantity)
-       trade_value_usd = price * quantity
-       message['trade_value_usd'] = trade_value_usd
-       
-       # Directional values based on trade side
-       # buyer_maker = True means market sell order (bearish)
-       # buyer_maker = False means market buy order (bullish)
-       
-       if message['buyer_maker']:
-           # This is a sell order
-           message['buy_value'] = 0
-           message['sell_value'] = trade_value_usd
-           message['trade_side'] = 'SELL'
-       else:
-           # This is a buy order
-           message['buy_value'] = trade_value_usd
-           message['sell_value'] = 0
-           message['trade_side'] = 'BUY'
-       
-       # Net buying pressure (positive = more buying, negative = more selling)
-       message['net_buy_pressure'] = message['buy_value'] - message['sell_value']
-       
-       # Cumulative price totals
-       symbol_totals[symbol]['cumulative_price'] += price
-       symbol_totals[symbol]['trade_count'] += 1
-       
-       message['cumulative_price_total'] = symbol_totals[symbol]['cumulative_price']
-       message['average_price'] = symbol_totals[symbol]['cumulative_price'] / symbol_totals[symbol]['trade_count']
+   state = get_state_store(
+       kwargs.get('state_store_path', STATE_STORE_PATH),
+       checkpoint_every_batches=kwargs.get('checkpoint_every_batches', 1),
+   )
+
+   # Kafka offsets are present when the loader sets include_metadata: true
+   messages, metadata = split_metadata(messages)
+
+   # Raw Kafka values (compact or JSON) when the loader uses serialization_method RAW_VALUE
+   messages = decode_trade_messages(messages)
+
+   # Trades redelivered after a restart were already counted in the running totals
+   received = len(messages)
+   messages = state.filter_new(messages)
+
+   # Columnar pass over the batch (see utils/trade_direction.py):
+   # - trade_value_usd = price × quantity
+   # - buyer_maker = True means market sell order (bearish), False means market buy order (bullish)
+   # - net_buy_pressure = buy_value - sell_value (positive = more buying)
+   # - cumulative_price_total / average_price continue per symbol from the previous batch
+   messages = add_direction_values(messages, state=state)
+
+   state.record_offsets(metadata)
+   state.end_batch()
    
-   print(f"Processed {len(messages)} trades with directional values and price totals")
+   print(f"Processed {len(messages)} trades with directional values and price totals "
+         f"({received - len(messages)} already-applied trades skipped)")
    
    return messages
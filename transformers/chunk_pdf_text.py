@@ -1,7 +1,10 @@
+from utils.chunk_table import ChunkTable
+from utils.text_chunker import get_token_counter, iter_chunks
+
 @transformer
 def chunk_document(data, **kwargs):
     """
-    Split the cleaned document into manageable chunks with overlap
+    Split the cleaned document into token-budgeted chunks along headings, paragraphs and sentences
     """
     # Check if data is available
     if data is None or "text" not in data:
@@ -10,69 +13,42 @@ def chunk_document(data, **kwargs):
     text = data["text"]
     metadata = data["metadata"]
     
-    print("Chunking document with fixed size approach...")
+    variables = kwargs.get('variables', {})
+    
+    print("Chunking document on headings, paragraphs and sentences...")
     
-    # Set chunking parameters
-    chunk_size = 4000  # characters per chunk
-    overlap = 500      # overlap between chunks to maintain context
+    # Set chunking parameters; sizes are in model tokens
+    max_tokens = int(variables.get('chunk_max_tokens', 1000))
+    overlap_sentences = int(variables.get('chunk_overlap_sentences', 1))  # 0 disables overlap
+    max_overlap_tokens = int(variables.get('chunk_max_overlap_tokens', 64))
+    count_tokens = get_token_counter(variables.get('chunk_tokenizer', 'approximate'))
     
-    # Calculate how many chunks we'll need
     doc_length = len(text)
-    estimated_chunks = (doc_length // (chunk_size - overlap)) + 1
     print(f"Document length: {doc_length} characters")
-    print(f"Will create approximately {estimated_chunks} chunks")
     
-    # Create chunks with simple fixed-size approach
-    chunks = []
-    
-    # Special case: if text is smaller than chunk_size, just use one chunk
-    if doc_length <= chunk_size:
-        chunks.append({
-            "chunk_id": 0,
-            "text": text,
-            "start_char": 0,
-            "end_char": doc_length,
-            "character_count": doc_length,
-            "doc_id": metadata['source_url']
-        })
-    else:
-        # Use a straightforward loop with explicit indices
-        chunk_id = 0
-        for i in range(0, doc_length, chunk_size - overlap):
-            # Calculate chunk boundaries
-            start = i
-            end = min(i + chunk_size, doc_length)
-            
-            # Don't create tiny chunks at the end
-            if end - start < 200 and chunk_id > 0:
-                break
-                
-            # Extract chunk text
-            chunk_text = text[start:end]
-            
-            # Create chunk with metadata
-            chunks.append({
-                "chunk_id": chunk_id,
-                "text": chunk_text,
-                "start_char": start,
-                "end_char": end,
-                "character_count": len(chunk_text),
-                "doc_id": metadata['source_url']
-            })
-            
-            chunk_id += 1
+    def tagged(chunks):
+        for chunk in chunks:
+            chunk["doc_id"] = metadata['source_url']
             
             # Log progress for larger documents
-            if chunk_id % 5 == 0:
-                print(f"Created {chunk_id} chunks so far...")
+            if (chunk["chunk_id"] + 1) % 50 == 0:
+                print(f"Created {chunk['chunk_id'] + 1} chunks so far...")
+            yield chunk
+    
+    # Chunks are generated lazily and kept only as offsets into the one copy of the text
+    chunk_table = ChunkTable.from_chunks(text, tagged(iter_chunks(
+        text, max_tokens=max_tokens, overlap_sentences=overlap_sentences, max_overlap_tokens=max_overlap_tokens,
+        count_tokens=count_tokens, page_starts=data.get("page_starts")
+    )))
     
     # Create result
     result = {
-        "chunks": chunks,
-        "chunk_count": len(chunks),
+        "chunk_table": chunk_table.to_dict(),
+        "chunk_count": len(chunk_table),
         "total_characters": doc_length,
+        "total_tokens": int(chunk_table.token_counts.sum()),
         "metadata": metadata
     }
     
-    print(f"Document processed into {len(chunks)} chunks")
+    print(f"Document processed into {len(chunk_table)} chunks")
     return result
\ No newline at end of file
@@ -1,4 +1,7 @@
-import re
+from utils.text_cleaner import DEFAULT_RULES, TextCleaner
+
+# Compiled once per process; blocks with extra_cleaning_rules build their own
+CLEANER = TextCleaner()
 
 @transformer
 def clean_document(data, **kwargs):
@@ -6,29 +9,26 @@ def clean_document(data, **kwargs):
     Clean and format the extracted PDF text
     """
     # Check if data is available
-    if data is None or "content" not in data:
+    if data is None or not ("pages" in data or "content" in data):
         raise Exception("No PDF content available to clean")
     
-    # Extract text and metadata from previous block
-    text = data["content"]
+    # Extract text and metadata from previous block; older loaders only provide the joined content
     metadata = data["metadata"]
+    pages = [page["text"] for page in data["pages"]] if data.get("pages") else [data["content"]]
     
     print("Cleaning document text...")
     
-    # Clean up common PDF extraction issues
-    # 1. Replace multiple newlines with a single newline
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # 2. Fix broken words that might have been split across lines
-    text = re.sub(r'(\w+)-\n(\w+)', r'\1\2', text)
-    
-    # 3. Remove headers and footers that repeat on each page
-    text = re.sub(r'Journal of High Energy Physics,\s+Gravitation and Cosmology.+?\d+', '', text)
-    text = re.sub(r'DOI:.+?\d+', '', text)
-    
-    # 4. Normalize whitespace
-    text = re.sub(r' {2,}', ' ', text)
-    text = text.strip()
+    # Clean page by page in one fused pass: dehyphenation, blank lines, repeated spaces,
+    # and header/footer lines learned from how often they repeat across pages
+    variables = kwargs.get('variables', {})
+    cleaner = CLEANER
+    if variables.get('extra_cleaning_rules'):
+        extra_rules = [(f"extra{i}", pattern, replacement)
+                       for i, (pattern, replacement) in enumerate(variables['extra_cleaning_rules'])]
+        cleaner = TextCleaner(DEFAULT_RULES + tuple(extra_rules))
+    text, page_starts = cleaner.clean(pages)
+    if cleaner.boilerplate:
+        print(f"Removed {len(cleaner.boilerplate)} repeating header/footer lines: {sorted(cleaner.boilerplate)}")
     
     # Add document information at the beginning
     title_header = f"# {metadata['title']}\n"
@@ -36,12 +36,18 @@ def clean_document(data, **kwargs):
     source_header = f"Source: {metadata['source_url']}\n\n"
     
     formatted_text = title_header + author_header + source_header + text
+    prefix_length = len(formatted_text) - len(text)
     
     # Return cleaned document with metadata
     result = {
         "text": formatted_text,
         "metadata": metadata,
         "character_count": len(formatted_text),
+        # Page number and offset in text where each non-empty page starts
+        "page_starts": [
+            (data["pages"][index]["page"] if data.get("pages") else 1, prefix_length + start)
+            for index, start in page_starts
+        ],
         "processing_time": kwargs.get("execution_date", "Unknown")
     }
     
@@ -1,19 +1,40 @@
 from mage_ai.data_preparation.shared.secrets import get_secret_value
 import pandas as pd
-import json
 import asyncio
 import nest_asyncio
-from mcp.client.stdio import stdio_client, StdioServerParameters
-from mcp import ClientSession
+from functools import partial
+from mcp.client.stdio import StdioServerParameters
 import anthropic
 
+from utils.answer_cache import get_answer_cache
+from utils.chunk_table import ChunkTable, write_chunk_table
+from utils.corpus_file import write_corpus
+from utils.document_qa import answer_questions, normalize_questions
+from utils.mcp_session_pool import get_session_pool
+from utils.prompt_context import FULL_DOCUMENT_TOKEN_LIMIT, ContextAssembler
+from utils.text_chunker import get_token_counter
+
 nest_asyncio.apply()
 
+# The MCP server maps this file instead of receiving every chunk through its environment;
+# it holds a chunk table, or a JSONL corpus when the chunks come as a list
+CORPUS_PATH = '/home/src/mage_data/cole-ws/meet_attractor/document_corpus'
+
+# Answers keyed on model, prompt, question and retrieved chunks; set bypass_answer_cache to force fresh calls
+ANSWER_CACHE_PATH = '/home/src/mage_data/cole-ws/meet_attractor/answer_cache.sqlite'
+
+# Warm server sessions are reused across block runs; a new corpus generation restarts the server
+SERVER_PARAMS = StdioServerParameters(
+    command="python",
+    args=["/home/src/cole-ws/mcp_document_server.py"],  # Your actual MCP server
+    env={"DOCUMENT_CORPUS_PATH": CORPUS_PATH}
+)
+
 @transformer
 def interact_with_anthropic_via_mcp(data, **kwargs):
     api_key = get_secret_value('CLAUDE_API_KEY')
     
-    if not api_key or not data or "chunks" not in data:
+    if not api_key or not data or ("chunks" not in data and "chunk_table" not in data):
         return pd.DataFrame({
             "error": ["Missing API key or chunks"],
             "question": ["Unknown"],
@@ -21,64 +42,55 @@ def interact_with_anthropic_via_mcp(data, **kwargs):
             "source": ["Error"]
         })
     
-    chunks = data["chunks"]
-    query = kwargs.get('variables', {}).get('user_question', "What is the Great Attractor?")
+    # Chunk tables are offsets into one shared text; chunk text is only sliced when read
+    chunks = ChunkTable.from_dict(data["chunk_table"]) if "chunk_table" in data else data["chunks"]
+    variables = kwargs.get('variables', {})
+    query = variables.get('user_question', "What is the Great Attractor?")
     
-    async def run_real_mcp():
-        # Configure MCP server
-        server_params = StdioServerParameters(
-            command="python",
-            args=["/home/src/cole-ws/mcp_document_server.py"],  # Your actual MCP server
-            env={"DOCUMENT_CHUNKS": json.dumps(chunks)}
-        )
-        
-        # Connect to MCP server
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                
-                # Use MCP tools
-                search_result = await session.call_tool(
-                    "search_document",
-                    arguments={"query": query, "max_results": 3}
-                )
-                
-                # Parse results
-                tool_content = search_result.content[0].text
-                search_data = json.loads(tool_content)
-                chunk_ids = search_data["chunk_ids"]
-                
-                # Read MCP resources
-                context_parts = []
-                for chunk_id in chunk_ids:
-                    resource_uri = f"document://great_attractor/chunk_{chunk_id}"
-                    resource = await session.read_resource(resource_uri)
-                    context_parts.append(resource.contents[0].text)
-                
-                return "\n\n---\n\n".join(context_parts)
+    # Batch mode: a list (or newline-separated string) of questions, or a CSV with a question column
+    questions = variables.get('user_questions')
+    if variables.get('questions_path'):
+        questions = pd.read_csv(variables['questions_path'])
+    questions = normalize_questions(questions) or [query]
     
     try:
-        context = asyncio.run(run_real_mcp())
+        # Unchanged chunks leave the corpus (and its generation) untouched
+        if isinstance(chunks, ChunkTable):
+            corpus_version = write_chunk_table(CORPUS_PATH, chunks)
+        else:
+            corpus_version = write_corpus(CORPUS_PATH, chunks)
+        run_with_session = partial(get_session_pool().run_async, SERVER_PARAMS, version=corpus_version)
         
-        # Query Claude with MCP context
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            temperature=0.2,
-            system="Answer based only on the provided context.",
-            messages=[{
-                "role": "user",
-                "content": f"CONTEXT:\n{context}\n\nQUESTION:\n{query}"
-            }]
+        # Query Claude with MCP context, several questions at a time
+        client = anthropic.AsyncAnthropic(api_key=api_key, max_retries=0)
+        cache = get_answer_cache(ANSWER_CACHE_PATH)
+        
+        # A document that fits is sent whole as a cached prefix; otherwise retrieved chunks are deduplicated and budgeted
+        assembler = ContextAssembler(
+            token_budget=int(variables.get('context_token_budget', 8000)),
+            full_document_token_limit=int(variables.get('full_document_prefix_tokens', FULL_DOCUMENT_TOKEN_LIMIT)),
+            count_tokens=get_token_counter(variables.get('chunk_tokenizer', 'approximate')),
         )
+        assembler.set_document(chunks)
+        rows = asyncio.run(answer_questions(
+            questions,
+            run_with_session,
+            client,
+            assembler=assembler,
+            concurrency=int(variables.get('concurrency', 8)),
+            cache=cache,
+            corpus_version=corpus_version,
+            bypass_cache=bool(variables.get('bypass_answer_cache', False)),
+        ))
+        print(f"Answer cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses "
+              f"({cache.hit_rate:.0%} hit rate), {len(cache)} entries")
+        cache_reads = sum(row["cache_read_input_tokens"] or 0 for row in rows)
+        print(f"Prompt cache: {cache_reads} input tokens read from cache")
         
-        return pd.DataFrame({
-            "question": [query],
-            "answer": [response.content[0].text],
-            "source": ["Real MCP Implementation"],
-            "mcp_implementation": ["Full MCP protocol with server"]
-        })
+        results = pd.DataFrame(rows)
+        results["source"] = "Real MCP Implementation"
+        results["mcp_implementation"] = "Full MCP protocol with server"
+        return results
         
     except Exception as e:
         return pd.DataFrame({
@@ -86,4 +98,4 @@ def interact_with_anthropic_via_mcp(data, **kwargs):
             "question": [query],
             "answer": ["MCP processing failed"],
             "source": ["MCP Error"]
-        })
\ No newline at end of file
+        })
@@ -0,0 +1,35 @@
+from typing import Dict, List
+
+from utils.trade_windows import DEFAULT_WINDOWS, WindowSpec, get_order_flow_engine
+
+if 'transformer' not in globals():
+    from mage_ai.data_preparation.decorators import transformer
+
+# Sliding 1s/10s/60s/5m windows plus a 60s window hopping every 10s
+WINDOWS = DEFAULT_WINDOWS + (WindowSpec("60s_hop_10s", 60_000, 10_000),)
+ALLOWED_LATENESS_MS = 2000
+
+
+@transformer
+def transform(messages: List[Dict], *args, **kwargs):
+    """
+    Incremental VWAP and order-flow indicators over multiple horizons
+
+    Args:
+        messages: Trades from calculate_direction_trade_values.
+    Returns:
+        One indicator record per symbol and window emitted by this batch
+        (vwap, imbalance, trade_count, volume, high, low, ...)
+    """
+    engine = get_order_flow_engine(
+        'kafka_demo_',
+        windows=WINDOWS,
+        allowed_lateness_ms=kwargs.get('allowed_lateness_ms', ALLOWED_LATENESS_MS),
+    )
+
+    records = engine.process(messages)
+
+    print(f"Emitted {len(records)} window indicators from {len(messages)} trades "
+          f"(watermark {engine.watermark}, {engine.late_trades} late trades dropped so far)")
+
+    return records
@@ -0,0 +1,116 @@
+"""
+Persistent cache of Anthropic answers for the meet_attractor pipeline.
+
+An answer is keyed on a hash of everything that determines it: model, system prompt,
+temperature, max_tokens, the question (whitespace-normalized), the exact retrieved
+chunk ids, the corpus generation those chunks came from, and the prompt layout. Repeating a question
+against the same document therefore returns the stored answer without an API call.
+A changed document or a different retrieval never reuses it.
+
+Entries expire after ttl_seconds. Beyond max_entries, the least recently used entries
+are evicted. Hit and miss counts are kept per process for logging.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.process_instances import shared_instance
+
+
+def answer_cache_key(model, system, temperature, max_tokens, question, chunk_ids, corpus_version=None, layout=None):
+    payload = json.dumps({
+        "model": model,
+        "system": system,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "question": " ".join(question.split()),
+        "chunk_ids": list(chunk_ids),
+        "corpus_version": corpus_version,
+        "layout": layout,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=10_000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+        """)
+
+    def get(self, key):
+        """Return {"answer", "input_tokens", "output_tokens"} for key, or None on a miss"""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT answer, input_tokens, output_tokens, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and row[3] < now - self.ttl_seconds:
+                self._connection.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._connection.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+        return {"answer": row[0], "input_tokens": row[1], "output_tokens": row[2]}
+
+    def put(self, key, question, answer, input_tokens=None, output_tokens=None):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answers (key, question, answer, input_tokens, output_tokens, created_at, "
+                "last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, question, answer, input_tokens, output_tokens, now, now),
+            )
+            if self.ttl_seconds:
+                self._connection.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            if self.max_entries:
+                evicted = self._connection.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+                self.stats["evicted"] += max(evicted, 0)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM answers")
+
+    def close(self):
+        self._connection.close()
+
+
+def get_answer_cache(path, **kwargs):
+    """The process-wide cache for path (see utils.process_instances)"""
+    return shared_instance((AnswerCache, path), lambda: AnswerCache(path, **kwargs))
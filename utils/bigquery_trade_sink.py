@@ -0,0 +1,284 @@
+"""
+Buffering BigQuery sink for the kafka_demo_ streaming pipeline.
+
+Streaming batches are small (batch_size: 100), and appending each one as its own load
+job is slow and burns through BigQuery's per-table load job quota. This sink spools
+rows to a local SQLite file and loads them in one job once the buffer reaches
+max_rows, max_bytes or max_age_seconds. The load uses Parquet when pyarrow is
+installed and newline-delimited JSON otherwise.
+
+Exactly-once bookkeeping:
+- rows are keyed on (symbol, trade_id); a key already pending or already loaded is
+  ignored, so Kafka redeliveries do not create duplicates
+- each flush claims its rows into a batch with a deterministic BigQuery job id. If the
+  process dies mid-load, the same batch is resubmitted under the same job id on
+  restart. BigQuery rejects the duplicate job, and the sink adopts the original one.
+- a batch whose load fails stays in flight and is retried, under the rules above, on the
+  first write or timer tick after retry_interval_seconds
+- loaded keys are remembered for loaded_retention_hours of trade time, then pruned
+
+The spool is written before batch_write returns, so rows survive a crash even though
+Mage has already committed their Kafka offsets.
+"""
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class TradeSpool:
+    """Durable local buffer of rows waiting to be loaded, plus the ledger of loaded keys"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pending_rows (
+                symbol TEXT NOT NULL,
+                trade_id INTEGER NOT NULL,
+                timestamp INTEGER,
+                row TEXT NOT NULL,
+                batch_id TEXT,
+                PRIMARY KEY (symbol, trade_id)
+            );
+            CREATE INDEX IF NOT EXISTS pending_rows_batch ON pending_rows (batch_id);
+            CREATE TABLE IF NOT EXISTS load_batches (
+                batch_id TEXT PRIMARY KEY,
+                attempt INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS loaded_keys (
+                symbol TEXT NOT NULL,
+                trade_id INTEGER NOT NULL,
+                timestamp INTEGER,
+                PRIMARY KEY (symbol, trade_id)
+            );
+        """)
+        self.pending_rows, self.pending_bytes = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(row)), 0) FROM pending_rows WHERE batch_id IS NULL").fetchone()
+        oldest = self._connection.execute("SELECT MIN(rowid) FROM pending_rows WHERE batch_id IS NULL").fetchone()[0]
+        self.oldest_pending_at = time.monotonic() if oldest is not None else None
+
+    def add(self, rows):
+        """Spool rows, skipping keys already pending or loaded. Returns the number of new rows."""
+        records = []
+        for row in rows:
+            encoded = json.dumps(row, separators=(",", ":"))
+            records.append((row["symbol"], row["trade_id"], row.get("timestamp"), encoded))
+
+        with self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO pending_rows (symbol, trade_id, timestamp, row) "
+                "SELECT ?1, ?2, ?3, ?4 WHERE NOT EXISTS "
+                "(SELECT 1 FROM loaded_keys WHERE symbol = ?1 AND trade_id = ?2)",
+                records,
+            )
+            added = self._connection.total_changes - before
+
+        if added:
+            self.pending_rows += added
+            # Byte count is an estimate when some rows were duplicates
+            self.pending_bytes += sum(len(record[3]) for record in records) * added // len(records)
+            if self.oldest_pending_at is None:
+                self.oldest_pending_at = time.monotonic()
+        return added
+
+    def in_flight_batches(self):
+        return self._connection.execute("SELECT batch_id, attempt FROM load_batches ORDER BY created_at").fetchall()
+
+    def claim_batch(self, max_rows):
+        """Assign up to max_rows unclaimed rows to a new batch and return its id"""
+        batch_id = uuid.uuid4().hex
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO load_batches (batch_id, attempt, created_at) VALUES (?, 0, ?)", (batch_id, time.time()))
+            claimed = self._connection.execute(
+                "UPDATE pending_rows SET batch_id = ? WHERE rowid IN "
+                "(SELECT rowid FROM pending_rows WHERE batch_id IS NULL ORDER BY rowid LIMIT ?)",
+                (batch_id, max_rows),
+            ).rowcount
+            if not claimed:
+                self._connection.execute("DELETE FROM load_batches WHERE batch_id = ?", (batch_id,))
+                return None
+
+        self.pending_rows, self.pending_bytes = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(row)), 0) FROM pending_rows WHERE batch_id IS NULL").fetchone()
+        if not self.pending_rows:
+            self.oldest_pending_at = None
+        return batch_id
+
+    def batch_rows(self, batch_id):
+        return [json.loads(row) for (row,) in self._connection.execute(
+            "SELECT row FROM pending_rows WHERE batch_id = ? ORDER BY rowid", (batch_id,))]
+
+    def retry_batch(self, batch_id):
+        with self._connection:
+            self._connection.execute("UPDATE load_batches SET attempt = attempt + 1 WHERE batch_id = ?", (batch_id,))
+
+    def complete_batch(self, batch_id):
+        """Move a loaded batch's keys to the ledger and drop its rows, atomically"""
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO loaded_keys (symbol, trade_id, timestamp) "
+                "SELECT symbol, trade_id, timestamp FROM pending_rows WHERE batch_id = ?", (batch_id,))
+            self._connection.execute("DELETE FROM pending_rows WHERE batch_id = ?", (batch_id,))
+            self._connection.execute("DELETE FROM load_batches WHERE batch_id = ?", (batch_id,))
+
+    def prune_loaded(self, older_than_ms):
+        with self._connection:
+            self._connection.execute("DELETE FROM loaded_keys WHERE timestamp < ?", (older_than_ms,))
+
+    def close(self):
+        self._connection.close()
+
+
+class LoadJobFailed(Exception):
+    """BigQuery finished the job with an error; its job id cannot be reused"""
+
+
+def _load_rows(client, table_id, job_id, rows):
+    """Run one append load job for rows; a job id that already exists is adopted, not resubmitted"""
+    from google.api_core.exceptions import Conflict
+    from google.cloud import bigquery
+
+    job_config = bigquery.LoadJobConfig(
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        schema_update_options=[bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION],
+        autodetect=True,
+    )
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+
+        job_config.source_format = bigquery.SourceFormat.PARQUET
+        buffer = io.BytesIO()
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), buffer)
+    except ImportError:
+        job_config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+        buffer = io.BytesIO("\n".join(json.dumps(row) for row in rows).encode("utf-8"))
+
+    try:
+        job = client.load_table_from_file(buffer, table_id, job_id=job_id, job_config=job_config, rewind=True)
+    except Conflict:
+        # A previous run submitted this batch before dying; wait on that job instead
+        job = client.get_job(job_id)
+
+    try:
+        job.result()
+    except Exception as e:
+        if job.done() and job.error_result:
+            raise LoadJobFailed(str(job.error_result)) from e
+        raise
+
+
+class BigQueryTradeSink:
+    def __init__(self, client, table_id, spool_path, max_rows=50_000, max_bytes=64 * 1024 * 1024,
+                 max_age_seconds=120, loaded_retention_hours=24, job_id_prefix="kafka_crypto",
+                 retry_interval_seconds=30, load_rows=_load_rows):
+        self.client = client
+        self.table_id = table_id
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.loaded_retention_ms = loaded_retention_hours * 3600 * 1000
+        self.job_id_prefix = job_id_prefix
+        self.retry_interval_seconds = retry_interval_seconds
+        self.spool = TradeSpool(spool_path)
+        self._load_rows = load_rows
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = None
+        self._retry_at = None   # When failed in-flight batches are next due, or None if there are none
+        self.stats = {"received": 0, "duplicates": 0, "flushes": 0, "rows_loaded": 0, "load_errors": 0}
+
+        # Finish batches a previous process claimed but may not have loaded
+        self.flush(force=False)
+
+    def write(self, rows):
+        rows = [row for row in rows if row.get("trade_id") is not None]
+        with self._lock:
+            added = self.spool.add(rows)
+            self.stats["received"] += len(rows)
+            self.stats["duplicates"] += len(rows) - added
+        if self._flush_due():
+            self.flush(force=False)
+
+    def _flush_due(self):
+        if self._retry_at is not None and time.monotonic() >= self._retry_at:
+            return True
+        spool = self.spool
+        if spool.pending_rows >= self.max_rows or spool.pending_bytes >= self.max_bytes:
+            return True
+        return spool.oldest_pending_at is not None and time.monotonic() - spool.oldest_pending_at >= self.max_age_seconds
+
+    def flush(self, force=True):
+        """Load in-flight batches, then (if force or due) everything pending, in max_rows chunks"""
+        with self._lock:
+            self._retry_at = None
+            for batch_id, attempt in self.spool.in_flight_batches():
+                self._load_batch(batch_id, attempt)
+
+            while self.spool.pending_rows and (force or self._flush_due()):
+                batch_id = self.spool.claim_batch(self.max_rows)
+                if batch_id is None:
+                    break
+                if not self._load_batch(batch_id, 0):
+                    break
+
+            if self.loaded_retention_ms:
+                self.spool.prune_loaded(int(time.time() * 1000) - self.loaded_retention_ms)
+
+    def _load_batch(self, batch_id, attempt):
+        rows = self.spool.batch_rows(batch_id)
+        job_id = f"{self.job_id_prefix}_{batch_id}_{attempt}"
+        started = time.monotonic()
+        try:
+            self._load_rows(self.client, self.table_id, job_id, rows)
+        except Exception as e:
+            if isinstance(e, LoadJobFailed):
+                # The next attempt needs a new job id, since a failed job id cannot be reused
+                self.spool.retry_batch(batch_id)
+            # Otherwise the job may still have run; retrying with the same job id adopts it instead of loading twice
+            self.stats["load_errors"] += 1
+            self._retry_at = time.monotonic() + self.retry_interval_seconds
+            logger.error(f"Load job {job_id} for {len(rows)} rows failed: {e}")
+            return False
+
+        self.spool.complete_batch(batch_id)
+        self.stats["flushes"] += 1
+        self.stats["rows_loaded"] += len(rows)
+        logger.info(f"Loaded {len(rows)} rows into {self.table_id} in {time.monotonic() - started:.2f}s (job {job_id})")
+        return True
+
+    def start_age_timer(self, interval=1.0):
+        """Flush aged rows even when no new batches arrive"""
+        def run():
+            while not self._stop.wait(interval):
+                if self._flush_due():
+                    try:
+                        self.flush(force=False)
+                    except Exception as e:
+                        logger.error(f"Background flush failed: {e}")
+
+        self._timer = threading.Thread(target=run, name="bigquery-sink-flush", daemon=True)
+        self._timer.start()
+
+    def close(self):
+        """Stop the timer and load everything still buffered"""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+        self.spool.close()
@@ -0,0 +1,155 @@
+"""
+BM25 full-text index over document chunks for the search_document MCP tool.
+
+The index is built once at load. Text is lowercased, split on word characters, stripped
+of stop words and light-stemmed. Each term's postings are stored as NumPy arrays of
+(row, weight), where weight is the BM25 term-frequency component. That component only
+depends on the chunk, so a query is one vectorized add per query term followed by a
+partial sort for the top k. Queries take milliseconds over tens of thousands of chunks.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:['’][a-z]+)?")
+_ANY_CASE_TOKEN_PATTERN = re.compile(TOKEN_PATTERN.pattern, re.IGNORECASE)
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+# Longest suffix first; (suffix, replacement, minimum stem length)
+_SUFFIXES = (
+    ("ational", "ate", 3), ("ization", "ize", 3), ("fulness", "ful", 3), ("iveness", "ive", 3),
+    ("ements", "", 4), ("ement", "", 4), ("ations", "ate", 3), ("ation", "ate", 3),
+    ("ities", "", 4), ("ity", "", 4), ("ness", "", 4), ("ments", "", 4), ("ment", "", 4),
+    ("ingly", "", 4), ("edly", "", 4), ("ies", "y", 2), ("ing", "", 4), ("ied", "y", 2),
+    ("ed", "", 4), ("ly", "", 4), ("es", "", 4), ("s", "", 3),
+)
+_UNSTEMMED = ("ss", "us", "is")
+
+
+def stem(word):
+    """Strip one common English suffix; a small, predictable stand-in for Porter stemming"""
+    if len(word) <= 3 or word.isdigit() or word.endswith(_UNSTEMMED):
+        return word
+    for suffix, replacement, min_stem in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def _normalize(raw, stem_cache):
+    term = stem_cache.get(raw)
+    if term is None:
+        word = raw.replace("’", "'").split("'", 1)[0]
+        term = stem_cache[raw] = "" if word in STOP_WORDS else stem(word)
+    return term
+
+
+def tokenize(text, stem_cache=None):
+    """Lowercase, drop stop words and stem; returns the list of index terms"""
+    stem_cache = {} if stem_cache is None else stem_cache
+    terms = []
+    for raw in TOKEN_PATTERN.findall(text.lower()):
+        term = _normalize(raw, stem_cache)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def query_terms(query, stem_cache=None):
+    """Distinct index terms of a query, in order; needs no index"""
+    return list(dict.fromkeys(tokenize(query, stem_cache)))
+
+
+class BM25Index:
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        stem_cache = {}
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text, stem_cache))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                rows, frequencies = postings[term]
+                rows.append(row)
+                frequencies.append(count)
+
+        self.size = len(lengths)
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        average_length = float(self.doc_lengths.mean()) if self.size and self.doc_lengths.any() else 1.0
+        norms = k1 * (1 - b + b * self.doc_lengths / average_length)
+
+        self._postings = {}     # term -> (rows, bm25 tf weights, idf)
+        for term, (rows, frequencies) in postings.items():
+            rows = np.asarray(rows, dtype=np.int32)
+            frequencies = np.asarray(frequencies, dtype=np.float32)
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            self._postings[term] = (rows, frequencies * (k1 + 1) / (frequencies + norms[rows]), idf)
+        self._stem_cache = stem_cache
+
+    def __len__(self):
+        return self.size
+
+    def query_terms(self, query):
+        return query_terms(query, self._stem_cache)
+
+    def scores(self, query):
+        """BM25 score of every row for the query, as a float32 array"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in self.query_terms(query):
+            posting = self._postings.get(term)
+            if posting is not None:
+                rows, weights, idf = posting
+                scores[rows] += idf * weights
+        return scores
+
+    def search(self, query, k=3):
+        """Return [(row, score)] for the k best matching rows, best first, and the number of matching rows"""
+        scores = self.scores(query)
+        matches = np.flatnonzero(scores)
+        total_matches = len(matches)
+        if k <= 0 or not total_matches:
+            return [], total_matches
+        if len(matches) > k:
+            # Keep everything tied with the k-th best so the tie-break below sees all of them
+            kth_best = -np.partition(-scores[matches], k - 1)[k - 1]
+            matches = matches[scores[matches] >= kth_best]
+        # Ties go to the earlier row so results are deterministic
+        best = sorted(matches.tolist(), key=lambda row: (-scores[row], row))[:k]
+        return [(row, float(scores[row])) for row in best], total_matches
+
+
+def snippet(text, query_terms, width=240):
+    """Return about width characters of text around the first occurrence of any query term"""
+    terms = set(query_terms)
+    stem_cache = {}
+    center = None
+    for match in _ANY_CASE_TOKEN_PATTERN.finditer(text):
+        if _normalize(match.group().lower(), stem_cache) in terms:
+            center = match.start()
+            break
+    if center is None:
+        excerpt = text[:width]
+        return " ".join(excerpt.split()) + ("..." if len(text) > width else "")
+
+    start = max(0, center - width // 3)
+    end = min(len(text), start + width)
+    # Widen to word boundaries
+    while start > 0 and not text[start - 1].isspace() and center - start < width // 2:
+        start -= 1
+    while end < len(text) and not text[end].isspace() and end - start < width + 40:
+        end += 1
+    excerpt = " ".join(text[start:end].split())
+    return ("..." if start > 0 else "") + excerpt + ("..." if end < len(text) else "")
@@ -0,0 +1,123 @@
+"""
+Indexed store of document chunks for mcp_document_server.
+
+Chunks are loaded once: each chunk_id maps to a row, and the MCP resource descriptors
+are built up front, so listing resources and reading chunk_{id} cost the same however
+large the document is. Chunk text is held either as Python strings or, with mmap_path,
+as one UTF-8 file mapped into memory and sliced by byte offsets. The mmap mode keeps
+large corpora in the page cache instead of the Python heap.
+"""
+import mmap
+import os
+from array import array
+
+URI_PREFIX = "document://great_attractor/chunk_"
+
+
+def normalize_chunks(data):
+    """Accept a list of chunks, the chunk_pdf_text output ({"chunks": [...]}) or a dict of chunks"""
+    if data is None:
+        return []
+    if isinstance(data, dict):
+        if "chunks" in data:
+            return list(data["chunks"])
+        return list(data.values())
+    return list(data)
+
+
+def chunk_uri(chunk_id):
+    return f"{URI_PREFIX}{chunk_id}"
+
+
+def resource_descriptor(chunk_id):
+    return {
+        "uri": chunk_uri(chunk_id),
+        "name": f"Document Chunk {chunk_id}",
+        "description": f"Section {chunk_id} of the Great Attractor research paper",
+        "mimeType": "text/plain",
+    }
+
+
+def chunk_id_from_uri(uri):
+    """Return the chunk id in a chunk URI, or None if the URI is not one"""
+    uri = str(uri)
+    if not uri.startswith(URI_PREFIX):
+        return None
+    try:
+        return int(uri[len(URI_PREFIX):])
+    except ValueError:
+        return None
+
+
+class ChunkStore:
+    generation = None
+
+    def __init__(self, chunks, mmap_path=None):
+        chunks = normalize_chunks(chunks)
+        self.chunk_ids = array("q")
+        self.doc_ids = []
+        self._rows = {}             # chunk_id -> row
+        self._texts = None
+        self._offsets = None        # byte offsets into the mapped file, len(chunks) + 1 entries
+        self._file = None
+        self._buffer = None
+
+        texts = []
+        for row, chunk in enumerate(chunks):
+            chunk_id = int(chunk.get("chunk_id", row))
+            if chunk_id in self._rows:
+                raise ValueError(f"Duplicate chunk_id {chunk_id}")
+            self._rows[chunk_id] = row
+            self.chunk_ids.append(chunk_id)
+            self.doc_ids.append(chunk.get("doc_id"))
+            texts.append(chunk.get("text", ""))
+
+        if mmap_path:
+            self._map_texts(texts, mmap_path)
+        else:
+            self._texts = texts
+
+        self.descriptors = [resource_descriptor(chunk_id) for chunk_id in self.chunk_ids]
+
+    def _map_texts(self, texts, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._offsets = array("q", [0])
+        with open(path, "wb") as f:
+            for text in texts:
+                encoded = text.encode("utf-8")
+                f.write(encoded)
+                self._offsets.append(self._offsets[-1] + len(encoded))
+        self._file = open(path, "rb")
+        if self._offsets[-1]:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = b""
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._rows
+
+    def text(self, chunk_id):
+        """Return a chunk's text; raises KeyError for an unknown chunk_id"""
+        row = self._rows[chunk_id]
+        if self._texts is not None:
+            return self._texts[row]
+        return self._buffer[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def text_at(self, row):
+        return self.text(self.chunk_ids[row])
+
+    def changed(self):
+        return False
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        if self._file is not None:
+            self._file.close()
+        self._buffer = None
+        self._file = None
@@ -0,0 +1,307 @@
+"""
+Compact chunk representation: one shared text buffer plus columns of offsets.
+
+ChunkTable holds a document's text once, with chunks as rows of parallel arrays
+(chunk_id, start_char, end_char, doc index, page, token_count, heading index). Doc ids
+and section headings are interned, so each is stored once. A chunk's text is
+sliced only when it is read, so overlapping chunks cost no extra text memory and a
+table takes about the size of its text plus a few dozen bytes per chunk.
+
+write_chunk_table saves a table as a single file the MCP document server maps
+directly:
+    header   magic CHNKTBL2, chunk count, doc table size, text size, generation
+    columns  int64 chunk_ids, int64 byte start, int64 byte end, int64 start_char,
+             int64 end_char, int32 doc index, int32 page, int32 token_count,
+             int32 heading index
+    docs     JSON {"doc_ids": [...], "headings": [...]}
+    text     the UTF-8 text the byte offsets point into
+ChunkTableFile opens it with mmap and decodes a chunk's bytes only on read. It has
+the same interface as CorpusFile, and still reads CHNKTBL1 files (no heading column,
+docs as a plain list). open_corpus picks the reader for either format.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from utils.chunk_store import resource_descriptor
+from utils.corpus_file import CorpusFile, CorpusNotReady, _file_signature
+
+TABLE_MAGIC = b"CHNKTBL2"
+TABLE_HEADER = struct.Struct("<8sQQQ16s")
+_INT64_COLUMNS = 5
+# int32 column count by format version
+_INT32_COLUMNS = {b"CHNKTBL1": 3, TABLE_MAGIC: 4}
+
+
+class ChunkTable:
+    def __init__(self, text, chunk_ids, starts, ends, doc_index=None, doc_ids=(None,), pages=None, token_counts=None,
+                 heading_index=None, headings=()):
+        count = len(chunk_ids)
+        self.text = text
+        self.chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.doc_index = np.zeros(count, dtype=np.int32) if doc_index is None else np.asarray(doc_index, np.int32)
+        self.doc_ids = list(doc_ids)
+        # -1 marks an unknown page or token count
+        self.pages = np.full(count, -1, dtype=np.int32) if pages is None else np.asarray(pages, np.int32)
+        self.token_counts = (np.full(count, -1, dtype=np.int32) if token_counts is None
+                             else np.asarray(token_counts, np.int32))
+        # -1 marks a chunk before the first heading
+        self.heading_index = (np.full(count, -1, dtype=np.int32) if heading_index is None
+                              else np.asarray(heading_index, np.int32))
+        self.headings = list(headings)
+
+    @classmethod
+    def from_chunks(cls, text, chunks):
+        """Build from chunk dicts with start_char/end_char into text (e.g. from text_chunker.iter_chunks)"""
+        chunk_ids, starts, ends, doc_index, pages, token_counts, heading_index = [], [], [], [], [], [], []
+        doc_ids = {}
+        headings = {}
+        for row, chunk in enumerate(chunks):
+            chunk_ids.append(int(chunk.get("chunk_id", row)))
+            starts.append(chunk["start_char"])
+            ends.append(chunk["end_char"])
+            doc_index.append(doc_ids.setdefault(chunk.get("doc_id"), len(doc_ids)))
+            page = chunk.get("page")
+            pages.append(-1 if page is None else page)
+            token_counts.append(chunk.get("token_count", -1))
+            heading = chunk.get("heading")
+            heading_index.append(-1 if heading is None else headings.setdefault(heading, len(headings)))
+        return cls(text, chunk_ids, starts, ends, doc_index, list(doc_ids) or [None], pages, token_counts,
+                   heading_index, list(headings))
+
+    def to_dict(self):
+        """Columnar form for block outputs; the text appears once"""
+        return {
+            "text": self.text,
+            "chunk_id": self.chunk_ids.tolist(),
+            "start_char": self.starts.tolist(),
+            "end_char": self.ends.tolist(),
+            "doc_index": self.doc_index.tolist(),
+            "doc_ids": self.doc_ids,
+            "page": self.pages.tolist(),
+            "token_count": self.token_counts.tolist(),
+            "heading_index": self.heading_index.tolist(),
+            "headings": self.headings,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["text"], data["chunk_id"], data["start_char"], data["end_char"], data.get("doc_index"),
+                   data.get("doc_ids", [None]), data.get("page"), data.get("token_count"),
+                   data.get("heading_index"), data.get("headings", ()))
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def text_at(self, row):
+        return self.text[self.starts[row]:self.ends[row]]
+
+    def heading_at(self, row):
+        index = int(self.heading_index[row])
+        return self.headings[index] if index >= 0 else None
+
+    def chunk_at(self, row):
+        page = int(self.pages[row])
+        token_count = int(self.token_counts[row])
+        return {
+            "chunk_id": int(self.chunk_ids[row]),
+            "text": self.text_at(row),
+            "start_char": int(self.starts[row]),
+            "end_char": int(self.ends[row]),
+            "doc_id": self.doc_ids[self.doc_index[row]],
+            "page": page if page >= 0 else None,
+            "token_count": token_count if token_count >= 0 else None,
+            "heading": self.heading_at(row),
+        }
+
+    def __iter__(self):
+        """Chunk dicts, materialized one at a time"""
+        return (self.chunk_at(row) for row in range(len(self)))
+
+    def byte_offsets(self):
+        """UTF-8 byte offsets of starts and ends, in one pass over the text"""
+        if self.text.isascii():
+            return self.starts.copy(), self.ends.copy()
+        positions = np.unique(np.concatenate([self.starts, self.ends]))
+        byte_positions = np.empty(len(positions), dtype=np.int64)
+        previous = 0
+        byte_position = 0
+        for i, position in enumerate(positions.tolist()):
+            byte_position += len(self.text[previous:position].encode("utf-8"))
+            byte_positions[i] = byte_position
+            previous = position
+        return (byte_positions[np.searchsorted(positions, self.starts)],
+                byte_positions[np.searchsorted(positions, self.ends)])
+
+
+def write_chunk_table(path, table):
+    """Write table to path as one mmap-able file; returns the generation, unchanged if the content is"""
+    text = table.text.encode("utf-8")
+    byte_starts, byte_ends = table.byte_offsets()
+    columns = b"".join(column.astype(dtype).tobytes() for column, dtype in (
+        (table.chunk_ids, np.int64), (byte_starts, np.int64), (byte_ends, np.int64), (table.starts, np.int64),
+        (table.ends, np.int64), (table.doc_index, np.int32), (table.pages, np.int32),
+        (table.token_counts, np.int32), (table.heading_index, np.int32)))
+    docs = json.dumps({"doc_ids": table.doc_ids, "headings": table.headings}, ensure_ascii=False).encode("utf-8")
+
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (columns, docs, text):
+        digest.update(part)
+    generation = digest.digest()
+    header = TABLE_HEADER.pack(TABLE_MAGIC, len(table), len(docs), len(text), generation)
+
+    try:
+        with open(path, "rb") as f:
+            current = f.read(TABLE_HEADER.size)
+        if current == header and os.path.getsize(path) == len(header) + len(columns) + len(docs) + len(text):
+            return generation.hex()
+    except OSError:
+        pass
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(header)
+        f.write(columns)
+        f.write(docs)
+        f.write(text)
+    # A single file, so readers see either the old table or the new one
+    os.replace(f"{path}.tmp", path)
+    return generation.hex()
+
+
+class ChunkTableFile:
+    """Read-only chunk store over a file written by write_chunk_table; same interface as CorpusFile"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self.signature = _file_signature(path)
+            with open(path, "rb") as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CorpusNotReady(f"Cannot open chunk table {path}: {e}") from e
+
+        try:
+            if len(self._buffer) < TABLE_HEADER.size:
+                raise CorpusNotReady(f"Truncated chunk table {path}")
+            magic, count, docs_size, text_size, generation = TABLE_HEADER.unpack_from(self._buffer)
+            if magic not in _INT32_COLUMNS:
+                raise CorpusNotReady(f"{path} is not a chunk table")
+            int32_count = _INT32_COLUMNS[magic]
+            columns_size = count * (8 * _INT64_COLUMNS + 4 * int32_count)
+            self._text_offset = TABLE_HEADER.size + columns_size + docs_size
+            if len(self._buffer) != self._text_offset + text_size:
+                raise CorpusNotReady(f"Chunk table {path} is {len(self._buffer)} bytes, header expects "
+                                     f"{self._text_offset + text_size}")
+        except (struct.error, CorpusNotReady):
+            self._buffer.close()
+            raise
+
+        int64_columns = np.frombuffer(self._buffer, dtype=np.int64, count=_INT64_COLUMNS * count,
+                                      offset=TABLE_HEADER.size).reshape(_INT64_COLUMNS, count)
+        int32_columns = np.frombuffer(self._buffer, dtype=np.int32, count=int32_count * count,
+                                      offset=TABLE_HEADER.size + 8 * _INT64_COLUMNS * count).reshape(int32_count,
+                                                                                                      count)
+        self.generation = generation.hex()
+        self.chunk_ids, self._byte_starts, self._byte_ends, self.starts, self.ends = int64_columns
+        self.doc_index, self.pages, self.token_counts = int32_columns[:3]
+        docs_offset = TABLE_HEADER.size + columns_size
+        docs = json.loads(self._buffer[docs_offset:docs_offset + docs_size])
+        if isinstance(docs, list):
+            # CHNKTBL1: doc ids only, no headings
+            self.doc_ids, self.headings = docs, []
+            self.heading_index = np.full(count, -1, dtype=np.int32)
+        else:
+            self.doc_ids, self.headings = docs["doc_ids"], docs["headings"]
+            self.heading_index = int32_columns[3]
+        self._rows = None
+        self._descriptors = None
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def _row(self, chunk_id):
+        if self._rows is None:
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.chunk_ids.tolist())}
+        return self._rows[chunk_id]
+
+    def __contains__(self, chunk_id):
+        try:
+            self._row(chunk_id)
+        except KeyError:
+            return False
+        return True
+
+    @property
+    def descriptors(self):
+        if self._descriptors is None:
+            self._descriptors = [resource_descriptor(chunk_id) for chunk_id in self.chunk_ids.tolist()]
+        return self._descriptors
+
+    def heading_at(self, row):
+        index = int(self.heading_index[row])
+        return self.headings[index] if index >= 0 else None
+
+    def text_at(self, row):
+        start = self._text_offset + int(self._byte_starts[row])
+        end = self._text_offset + int(self._byte_ends[row])
+        return self._buffer[start:end].decode("utf-8")
+
+    def text(self, chunk_id):
+        """Return a chunk's text; raises KeyError for an unknown chunk_id"""
+        return self.text_at(self._row(chunk_id))
+
+    def chunk_at(self, row):
+        page = int(self.pages[row])
+        token_count = int(self.token_counts[row])
+        return {
+            "chunk_id": int(self.chunk_ids[row]),
+            "text": self.text_at(row),
+            "start_char": int(self.starts[row]),
+            "end_char": int(self.ends[row]),
+            "doc_id": self.doc_ids[self.doc_index[row]],
+            "page": page if page >= 0 else None,
+            "token_count": token_count if token_count >= 0 else None,
+            "heading": self.heading_at(row),
+        }
+
+    def chunk(self, chunk_id):
+        return self.chunk_at(self._row(chunk_id))
+
+    def changed(self):
+        """True when the file on disk is no longer the one this object mapped"""
+        try:
+            return _file_signature(self.path) != self.signature
+        except OSError:
+            return False
+
+    def close(self):
+        # Views into the map must be dropped before it can be closed
+        self.chunk_ids = np.empty(0, dtype=np.int64)
+        self._byte_starts = self._byte_ends = self.starts = self.ends = None
+        self.doc_index = self.pages = self.token_counts = self.heading_index = None
+        if self._buffer is not None:
+            try:
+                self._buffer.close()
+            except BufferError:
+                # A caller still holds a view (e.g. a chunk_ids slice); the map is released with it
+                pass
+            self._buffer = None
+
+
+def open_corpus(path):
+    """Open a chunk table or a JSONL corpus, whichever path holds"""
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(len(TABLE_MAGIC))
+    except OSError as e:
+        raise CorpusNotReady(f"Cannot open corpus {path}: {e}") from e
+    return ChunkTableFile(path) if magic in _INT32_COLUMNS else CorpusFile(path)
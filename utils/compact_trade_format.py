@@ -0,0 +1,139 @@
+"""
+Compact binary wire format for messages on the binance-crypto-trades topic.
+
+A JSON trade message repeats every key plus constant fields (exchange, data_type,
+stream) and an ISO processing_time, which adds up to ~250 bytes. The compact layout
+packs the same trade into a fixed little-endian struct followed by the symbol:
+
+    magic        uint8    0xB1 (never a valid first byte of a JSON document)
+    version      uint8    schema version, see SCHEMAS
+    flags        uint8    bit 0: buyer_maker, bit 1: buyer_maker is null,
+                          bit 2: data_type is "trade_backfill"
+    trade_id     int64    -1 when missing
+    timestamp    int64    exchange trade time (T) in ms, -1 when missing
+    processing   int64    processing_time as microseconds since the epoch
+    price        float64
+    quantity     float64
+    symbol_len   uint8    length of symbol in bytes
+    symbol       bytes    UTF-8 (ASCII for most pairs, but not all listed symbols are)
+
+stream, exchange and data_type (apart from the backfill flag) are implied by the schema
+and rebuilt on decode, so decode_compact_trade returns the same dict the JSON publisher
+produces.
+"""
+import json
+import struct
+from datetime import datetime
+
+MAGIC = 0xB1
+CURRENT_VERSION = 1
+
+# Schema registry stand-in: version byte -> struct layout of the fixed-size header
+SCHEMAS = {
+    1: struct.Struct("<BBBqqqddB"),
+}
+
+_FLAG_BUYER_MAKER = 0x01
+_FLAG_BUYER_MAKER_NULL = 0x02
+_FLAG_BACKFILL = 0x04
+
+
+class CompactTradeSerializer:
+    """Encodes publisher payload dicts into the compact layout (KafkaProducer value_serializer)"""
+
+    def __init__(self, version=CURRENT_VERSION):
+        if version not in SCHEMAS:
+            raise ValueError(f"Unknown compact schema version: {version}")
+        self.version = version
+        self._pack = SCHEMAS[version].pack
+        # processing_time is identical for every trade in a publisher batch
+        self._last_processing_time = None
+        self._last_processing_micros = 0
+
+    def _processing_micros(self, processing_time):
+        if processing_time is None:
+            return 0
+        if isinstance(processing_time, (int, float)):
+            return int(processing_time)
+        if processing_time != self._last_processing_time:
+            self._last_processing_micros = int(datetime.fromisoformat(processing_time).timestamp() * 1_000_000)
+            self._last_processing_time = processing_time
+        return self._last_processing_micros
+
+    def __call__(self, value):
+        buyer_maker = value.get("buyer_maker")
+        if buyer_maker is None:
+            flags = _FLAG_BUYER_MAKER_NULL
+        else:
+            flags = _FLAG_BUYER_MAKER if buyer_maker else 0
+        if value.get("data_type") == "trade_backfill":
+            flags |= _FLAG_BACKFILL
+
+        trade_id = value.get("trade_id")
+        timestamp = value.get("timestamp")
+        symbol = (value.get("symbol") or "").encode("utf-8")
+
+        return self._pack(
+            MAGIC,
+            self.version,
+            flags,
+            -1 if trade_id is None else trade_id,
+            -1 if timestamp is None else timestamp,
+            self._processing_micros(value.get("processing_time")),
+            value.get("price", 0.0),
+            value.get("quantity", 0.0),
+            len(symbol),
+        ) + symbol
+
+
+def is_compact(payload):
+    """True when a raw Kafka value uses the compact layout"""
+    return isinstance(payload, (bytes, bytearray, memoryview)) and len(payload) > 0 and payload[0] == MAGIC
+
+
+def decode_compact_trade(payload):
+    """Decode a compact message back into the publisher's JSON-equivalent dict"""
+    version = payload[1]
+    layout = SCHEMAS.get(version)
+    if layout is None:
+        raise ValueError(f"Unknown compact schema version: {version}")
+
+    (_, _, flags, trade_id, timestamp, processing_micros,
+     price, quantity, symbol_len) = layout.unpack_from(payload)
+    symbol = bytes(payload[layout.size:layout.size + symbol_len]).decode("utf-8")
+
+    if flags & _FLAG_BUYER_MAKER_NULL:
+        buyer_maker = None
+    else:
+        buyer_maker = bool(flags & _FLAG_BUYER_MAKER)
+
+    return {
+        "symbol": symbol,
+        "price": price,
+        "quantity": quantity,
+        "timestamp": None if timestamp == -1 else timestamp,
+        "buyer_maker": buyer_maker,
+        "trade_id": None if trade_id == -1 else trade_id,
+        "stream": f"{symbol.lower()}@trade",
+        "processing_time": datetime.fromtimestamp(processing_micros / 1_000_000).isoformat(),
+        "exchange": "binance",
+        "data_type": "trade_backfill" if flags & _FLAG_BACKFILL else "trade",
+    }
+
+
+def decode_trade_message(message):
+    """
+    Normalize a message from the Kafka loader into a trade dict.
+
+    Handles already-deserialized JSON dicts (serialization_method JSON) as well as raw
+    values (serialization_method RAW_VALUE) in either the compact or the JSON layout.
+    """
+    if isinstance(message, dict):
+        return message
+    if is_compact(message):
+        return decode_compact_trade(message)
+    return json.loads(message)
+
+
+def decode_trade_messages(messages):
+    return [decode_trade_message(message) for message in messages]
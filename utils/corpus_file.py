@@ -0,0 +1,178 @@
+"""
+On-disk document corpus the MCP document server opens lazily with mmap.
+
+A corpus is two files:
+    corpus.jsonl      a header line, then one JSON chunk per line
+    corpus.jsonl.idx  header (magic, chunk count, data size, generation), then int64
+                      chunk_ids[count] and int64 byte offsets[count + 1] into the JSONL
+
+Opening a corpus maps both files and reads the two headers, so it takes the same time
+for ten chunks or a million. A chunk is decoded only when it is read. The generation is
+a content hash written into both headers. A reader that sees different generations has
+caught a writer mid-swap and reports CorpusNotReady. Rewriting identical chunks is a
+no-op, so unchanged documents keep their generation, and their persisted vector index.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from utils.chunk_store import normalize_chunks, resource_descriptor
+
+INDEX_MAGIC = b"CHNKIDX1"
+INDEX_HEADER = struct.Struct("<8sQQ16s")
+CORPUS_FORMAT = "document-chunks"
+CORPUS_VERSION = 1
+
+
+class CorpusNotReady(ValueError):
+    """The corpus files are missing, truncated or from different writes"""
+
+
+def index_path_for(path):
+    return f"{path}.idx"
+
+
+def _read_index_header(index_path):
+    with open(index_path, "rb") as f:
+        header = f.read(INDEX_HEADER.size)
+    if len(header) < INDEX_HEADER.size:
+        raise CorpusNotReady(f"Truncated corpus index {index_path}")
+    magic, count, data_size, generation = INDEX_HEADER.unpack(header)
+    if magic != INDEX_MAGIC:
+        raise CorpusNotReady(f"{index_path} is not a corpus index")
+    return count, data_size, generation.hex()
+
+
+def write_corpus(path, chunks):
+    """Write chunks as a corpus at path; returns the generation, unchanged if the content is"""
+    chunks = normalize_chunks(chunks)
+    digest = hashlib.blake2b(digest_size=16)
+    lines = []
+    chunk_ids = np.empty(len(chunks), dtype=np.int64)
+    for row, chunk in enumerate(chunks):
+        chunk = dict(chunk, chunk_id=int(chunk.get("chunk_id", row)))
+        chunk_ids[row] = chunk["chunk_id"]
+        line = json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        digest.update(line)
+        lines.append(line)
+    generation = digest.digest()
+
+    index_path = index_path_for(path)
+    try:
+        _, data_size, current_generation = _read_index_header(index_path)
+        if current_generation == generation.hex() and os.path.getsize(path) == data_size:
+            return current_generation
+    except (OSError, CorpusNotReady):
+        pass
+
+    header = json.dumps({"format": CORPUS_FORMAT, "version": CORPUS_VERSION, "generation": generation.hex(),
+                         "chunks": len(chunks)}).encode("utf-8") + b"\n"
+    offsets = np.empty(len(chunks) + 1, dtype=np.int64)
+    offsets[0] = len(header)
+    offsets[1:] = len(header) + np.cumsum([len(line) for line in lines], dtype=np.int64)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(header)
+        f.writelines(lines)
+    with open(f"{index_path}.tmp", "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(chunks), int(offsets[-1]), generation))
+        f.write(chunk_ids.tobytes())
+        f.write(offsets.tobytes())
+    # Readers check that both generations match, so a reader between these two renames retries
+    os.replace(f"{path}.tmp", path)
+    os.replace(f"{index_path}.tmp", index_path)
+    return generation.hex()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class CorpusFile:
+    """Read-only chunk store over a corpus written by write_corpus; same interface as ChunkStore"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = index_path_for(path)
+        try:
+            self.signature = (_file_signature(path), _file_signature(self.index_path))
+            count, data_size, generation = _read_index_header(self.index_path)
+            with open(path, "rb") as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CorpusNotReady(f"Cannot open corpus {path}: {e}") from e
+
+        try:
+            header = json.loads(self._buffer[:self._buffer.find(b"\n") + 1])
+            if header.get("format") != CORPUS_FORMAT or header.get("generation") != generation:
+                raise CorpusNotReady(f"Corpus {path} does not match its index (being rewritten?)")
+            if len(self._buffer) != data_size:
+                raise CorpusNotReady(f"Corpus {path} is {len(self._buffer)} bytes, index expects {data_size}")
+            arrays = np.memmap(self.index_path, dtype=np.int64, mode="r", offset=INDEX_HEADER.size,
+                               shape=(2 * count + 1,))
+        except (ValueError, CorpusNotReady):
+            self._buffer.close()
+            raise
+
+        self.generation = generation
+        self.chunk_ids = arrays[:count]
+        self._offsets = arrays[count:]
+        self._rows = None
+        self._descriptors = None
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def _row(self, chunk_id):
+        if self._rows is None:
+            # Built on first lookup so opening stays independent of corpus size
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.chunk_ids.tolist())}
+        return self._rows[chunk_id]
+
+    def __contains__(self, chunk_id):
+        try:
+            self._row(chunk_id)
+        except KeyError:
+            return False
+        return True
+
+    @property
+    def descriptors(self):
+        if self._descriptors is None:
+            self._descriptors = [resource_descriptor(chunk_id) for chunk_id in self.chunk_ids.tolist()]
+        return self._descriptors
+
+    def chunk_at(self, row):
+        return json.loads(self._buffer[self._offsets[row]:self._offsets[row + 1]])
+
+    def chunk(self, chunk_id):
+        return self.chunk_at(self._row(chunk_id))
+
+    def text_at(self, row):
+        return self.chunk_at(row).get("text", "")
+
+    def text(self, chunk_id):
+        """Return a chunk's text; raises KeyError for an unknown chunk_id"""
+        return self.text_at(self._row(chunk_id))
+
+    def changed(self):
+        """True when either file on disk is no longer the one this object mapped"""
+        try:
+            return (_file_signature(self.path), _file_signature(self.index_path)) != self.signature
+        except OSError:
+            return False
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        self.chunk_ids = np.empty(0, dtype=np.int64)
+        self._offsets = None
@@ -0,0 +1,219 @@
+"""
+Local cache of downloaded documents and their extracted pages for the document loaders.
+
+- Downloads are stored once per content hash (sha256) under <directory>/blobs. Each URL
+  remembers the ETag and Last-Modified of its last response. The next fetch sends them
+  as If-None-Match / If-Modified-Since, and a 304 reuses the stored file without
+  downloading it again. If revalidation fails on a network error, the stored copy is
+  used.
+- Extracted pages are stored by content hash and extractor version. An unchanged
+  document skips parsing even when it is served from a new URL.
+- Past max_bytes (blobs plus compressed page text), the least recently used documents
+  and their pages are evicted.
+
+Hits, misses and evictions are counted per process in stats and logged.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.process_instances import shared_instance
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCache:
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, timeout=60, chunk_size=1 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.stats = {"revalidated": 0, "downloaded": 0, "stale": 0, "page_hits": 0, "page_misses": 0,
+                      "evicted": 0}
+
+        self._blobs = os.path.join(directory, "blobs")
+        os.makedirs(self._blobs, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                content_hash TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                pages BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (content_hash, extractor)
+            );
+            CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used);
+        """)
+
+    def blob_path(self, content_hash):
+        return os.path.join(self._blobs, f"{content_hash}.bin")
+
+    def _cached_download(self, url):
+        row = self._connection.execute(
+            "SELECT content_hash, etag, last_modified FROM downloads WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self.blob_path(row[0])):
+            return None
+        return row
+
+    def _touch(self, content_hash):
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE blobs SET last_used = ? WHERE content_hash = ?",
+                                     (time.time(), content_hash))
+
+    def fetch(self, url, session=None):
+        """Return (path, content hash) of the document at url, downloading it only if it changed"""
+        import requests
+
+        http = session or requests
+        cached = self._cached_download(url)
+        headers = {}
+        if cached is not None:
+            if cached[1]:
+                headers["If-None-Match"] = cached[1]
+            if cached[2]:
+                headers["If-Modified-Since"] = cached[2]
+
+        try:
+            response = http.get(url, headers=headers, stream=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            if cached is None:
+                raise
+            self.stats["stale"] += 1
+            logger.warning(f"Could not revalidate {url} ({e}); using cached copy {cached[0][:12]}")
+            self._touch(cached[0])
+            return self.blob_path(cached[0]), cached[0]
+
+        with response:
+            if response.status_code == 304 and cached is not None:
+                self.stats["revalidated"] += 1
+                logger.info(f"Document cache hit for {url}: not modified ({cached[0][:12]})")
+                self._touch(cached[0])
+                self._evict(keep=cached[0])
+                return self.blob_path(cached[0]), cached[0]
+            response.raise_for_status()
+            content_hash, size = self._store_blob(response)
+
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO downloads (url, content_hash, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, content_hash, response.headers.get("ETag"), response.headers.get("Last-Modified"), now))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO blobs (content_hash, size, last_used) VALUES (?, ?, ?)",
+                (content_hash, size, now))
+        self.stats["downloaded"] += 1
+        logger.info(f"Document cache miss for {url}: downloaded {size} bytes ({content_hash[:12]})")
+        self._evict(keep=content_hash)
+        return self.blob_path(content_hash), content_hash
+
+    def _store_blob(self, response):
+        """Stream the body to a temporary file while hashing it, then move it to its content address"""
+        digest = hashlib.sha256()
+        size = 0
+        temporary = os.path.join(self._blobs, f".download-{os.getpid()}-{threading.get_ident()}")
+        try:
+            with open(temporary, "wb") as output:
+                for block in response.iter_content(self.chunk_size):
+                    digest.update(block)
+                    output.write(block)
+                    size += len(block)
+            content_hash = digest.hexdigest()
+            os.replace(temporary, self.blob_path(content_hash))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return content_hash, size
+
+    def get_pages(self, content_hash, extractor):
+        """Cached page records for a document, or None"""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT pages FROM pages WHERE content_hash = ? AND extractor = ?",
+                (content_hash, extractor)).fetchone()
+            if row is None:
+                self.stats["page_misses"] += 1
+                return None
+            self._connection.execute("UPDATE pages SET last_used = ? WHERE content_hash = ? AND extractor = ?",
+                                     (time.time(), content_hash, extractor))
+            self.stats["page_hits"] += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put_pages(self, content_hash, extractor, pages):
+        data = zlib.compress(json.dumps(pages, separators=(",", ":")).encode("utf-8"))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages (content_hash, extractor, pages, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (content_hash, extractor, data, len(data), time.time()))
+        self._evict(keep=content_hash)
+
+    def size(self):
+        with self._lock:
+            blobs = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            pages = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        return blobs + pages
+
+    def _evict(self, keep=None):
+        """Drop least recently used documents (blob, pages and URLs) until under max_bytes"""
+        if not self.max_bytes:
+            return
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        with self._lock, self._connection:
+            candidates = self._connection.execute(
+                "SELECT content_hash, MAX(last_used) AS used FROM ("
+                "SELECT content_hash, last_used FROM blobs UNION ALL SELECT content_hash, last_used FROM pages"
+                ") GROUP BY content_hash ORDER BY used").fetchall()
+            for content_hash, _ in candidates:
+                if total <= self.max_bytes:
+                    break
+                if content_hash == keep:
+                    continue
+                freed = self._connection.execute(
+                    "SELECT (SELECT COALESCE(SUM(size), 0) FROM blobs WHERE content_hash = ?) + "
+                    "(SELECT COALESCE(SUM(size), 0) FROM pages WHERE content_hash = ?)",
+                    (content_hash, content_hash)).fetchone()[0]
+                for table in ("blobs", "pages", "downloads"):
+                    self._connection.execute(f"DELETE FROM {table} WHERE content_hash = ?", (content_hash,))
+                if os.path.exists(self.blob_path(content_hash)):
+                    os.remove(self.blob_path(content_hash))
+                total -= freed
+                self.stats["evicted"] += 1
+                logger.info(f"Evicted document {content_hash[:12]} ({freed} bytes) from the document cache")
+
+    def clear(self):
+        with self._lock, self._connection:
+            for table in ("downloads", "blobs", "pages"):
+                self._connection.execute(f"DELETE FROM {table}")
+        for name in os.listdir(self._blobs):
+            os.remove(os.path.join(self._blobs, name))
+
+    def close(self):
+        self._connection.close()
+
+
+def get_document_cache(directory, **kwargs):
+    """The process-wide cache for directory (see utils.process_instances)"""
+    return shared_instance((DocumentCache, directory), lambda: DocumentCache(directory, **kwargs))
@@ -0,0 +1,196 @@
+"""
+Question answering over the MCP document server for the meet_attractor pipeline.
+
+answer_questions runs a batch in two phases:
+1. retrieval: search_document and one read_chunks call per question, run concurrently
+   over one pooled MCP session (servers without read_chunks get concurrent resource reads)
+2. generation: Anthropic calls fan out through a bounded asyncio pool. Rate limits and
+   overloads (429/529/5xx) are retried with backoff, honouring retry-after.
+
+Each question yields one result row with its answer, chunk ids, per-phase latency and
+token counts. A failing question records its error instead of failing the batch. With
+an answer cache, repeated questions over the same retrieved chunks skip phase 2.
+"""
+import asyncio
+import json
+import random
+import time
+import weakref
+
+import anthropic
+
+from utils.answer_cache import answer_cache_key
+from utils.prompt_context import ContextAssembler
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def normalize_questions(questions):
+    """Accept a question string (one per line), a list, or a DataFrame/Series with a question column"""
+    if questions is None:
+        return []
+    if isinstance(questions, str):
+        questions = questions.splitlines()
+    elif hasattr(questions, "columns"):
+        column = "question" if "question" in questions.columns else questions.columns[0]
+        questions = questions[column].tolist()
+    elif hasattr(questions, "tolist"):
+        questions = questions.tolist()
+    return [str(question).strip() for question in questions if question is not None and str(question).strip()]
+
+
+_session_tools = weakref.WeakKeyDictionary()
+
+
+async def _has_tool(session, name):
+    """Whether the server offers a tool; the tool list is fetched once per session"""
+    tools = _session_tools.get(session)
+    if tools is None:
+        result = await session.list_tools()
+        tools = _session_tools[session] = {tool.name for tool in result.tools}
+    return name in tools
+
+
+async def read_chunks(session, chunk_ids):
+    """Texts of chunk_ids in order: one read_chunks call, or concurrent resource reads on older servers"""
+    if not chunk_ids:
+        return []
+    if await _has_tool(session, "read_chunks"):
+        result = await session.call_tool("read_chunks", arguments={"chunk_ids": list(chunk_ids)})
+        data = json.loads(result.content[0].text)
+        if data.get("missing"):
+            raise ValueError(f"Chunks not found: {data['missing']}")
+        texts = {chunk["chunk_id"]: chunk["text"] for chunk in data["chunks"]}
+        return [texts[chunk_id] for chunk_id in chunk_ids]
+
+    resources = await asyncio.gather(*(
+        session.read_resource(f"document://great_attractor/chunk_{chunk_id}") for chunk_id in chunk_ids
+    ))
+    return [resource.contents[0].text for resource in resources]
+
+
+async def retrieve_chunks(session, query, max_results=3):
+    """Search the document and read the matching chunks; returns [(chunk_id, text)] in rank order"""
+    search_result = await session.call_tool(
+        "search_document",
+        arguments={"query": query, "max_results": max_results}
+    )
+    search_data = json.loads(search_result.content[0].text)
+    chunk_ids = search_data.get("chunk_ids", [])
+    return list(zip(chunk_ids, await read_chunks(session, chunk_ids)))
+
+
+def _retry_delay(error, attempt, base_seconds, cap_seconds):
+    """Seconds to wait before retrying error, or None if it should not be retried"""
+    if isinstance(error, anthropic.APIStatusError):
+        if error.status_code not in RETRYABLE_STATUS_CODES:
+            return None
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), cap_seconds)
+            except ValueError:
+                pass
+    elif not isinstance(error, anthropic.APIConnectionError):
+        return None
+    return random.uniform(0, min(cap_seconds, base_seconds * 2 ** attempt))
+
+
+async def ask_claude(client, system, messages, model=DEFAULT_MODEL, max_tokens=1000, temperature=0.2,
+                     max_retries=6, backoff_base_seconds=1.0, backoff_cap_seconds=60.0):
+    """One messages.create call on an AsyncAnthropic client, retried on rate limits and overloads"""
+    attempt = 0
+    while True:
+        try:
+            return await client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=messages
+            )
+        except Exception as e:
+            delay = _retry_delay(e, attempt, backoff_base_seconds, backoff_cap_seconds)
+            if delay is None or attempt >= max_retries:
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+async def answer_questions(questions, run_with_session, client, model=DEFAULT_MODEL, assembler=None,
+                           max_tokens=1000, temperature=0.2, concurrency=8, retrieval_concurrency=32,
+                           max_results=3, cache=None, corpus_version=None, bypass_cache=False, **retry_kwargs):
+    """
+    Answer every question and return one dict per question, in input order.
+
+    run_with_session(fn) must await fn(session) on an MCP session, e.g.
+    functools.partial(pool.run_async, server_params, version=corpus_version).
+
+    With an AnswerCache, a question whose retrieved chunks (and corpus_version) match a
+    stored answer skips the Anthropic call. bypass_cache skips the lookup but still
+    stores the fresh answer.
+
+    The prompt is laid out by assembler (a prompt_context.ContextAssembler; the default
+    caches the system prompt and document preamble and sends the retrieved chunks after them).
+    """
+    assembler = assembler or ContextAssembler()
+    questions = normalize_questions(questions)
+    rows = [{"question": question, "answer": None, "chunk_ids": [], "retrieval_ms": None, "llm_ms": None,
+             "latency_ms": None, "input_tokens": None, "output_tokens": None, "cache_read_input_tokens": None,
+             "cache_creation_input_tokens": None, "cached": False, "error": None}
+            for question in questions]
+    retrieved = [None] * len(questions)
+
+    async def retrieve_all(session):
+        retrieval_limit = asyncio.Semaphore(retrieval_concurrency)
+
+        async def retrieve(i):
+            async with retrieval_limit:
+                started = time.perf_counter()
+                try:
+                    retrieved[i] = await retrieve_chunks(session, questions[i], max_results)
+                except Exception as e:
+                    rows[i]["error"] = f"retrieval failed: {e}"
+                rows[i]["retrieval_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        await asyncio.gather(*(retrieve(i) for i in range(len(questions))))
+
+    if questions:
+        await run_with_session(retrieve_all)
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def generate(i):
+        if retrieved[i] is None:
+            return
+        system, messages, rows[i]["chunk_ids"] = assembler.build(questions[i], retrieved[i])
+        key = None
+        if cache is not None:
+            key = answer_cache_key(model, assembler.system, temperature, max_tokens, questions[i], rows[i]["chunk_ids"],
+                                   corpus_version, layout=assembler.layout)
+            cached = None if bypass_cache else cache.get(key)
+            if cached is not None:
+                rows[i].update(cached, cached=True, llm_ms=0.0)
+                rows[i]["latency_ms"] = rows[i]["retrieval_ms"]
+                return
+
+        async with limit:
+            started = time.perf_counter()
+            try:
+                response = await ask_claude(client, system, messages, model=model, max_tokens=max_tokens,
+                                            temperature=temperature, **retry_kwargs)
+                rows[i]["answer"] = response.content[0].text
+                rows[i]["input_tokens"] = response.usage.input_tokens
+                rows[i]["output_tokens"] = response.usage.output_tokens
+                rows[i]["cache_read_input_tokens"] = getattr(response.usage, "cache_read_input_tokens", None)
+                rows[i]["cache_creation_input_tokens"] = getattr(response.usage, "cache_creation_input_tokens", None)
+                if key is not None:
+                    cache.put(key, questions[i], rows[i]["answer"], rows[i]["input_tokens"], rows[i]["output_tokens"])
+            except Exception as e:
+                rows[i]["error"] = f"generation failed: {e}"
+            rows[i]["llm_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        rows[i]["latency_ms"] = round(rows[i]["retrieval_ms"] + rows[i]["llm_ms"], 1)
+
+    await asyncio.gather(*(generate(i) for i in range(len(questions))))
+    return rows
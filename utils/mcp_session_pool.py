@@ -0,0 +1,224 @@
+"""
+Pool of long-lived MCP client sessions for the Mage blocks that talk to mcp_document_server.
+
+Spawning the server, importing mcp and running the MCP handshake cost far more than a
+search. The pool keeps initialized sessions alive between block runs and questions.
+
+- Sessions run on the pool's own event loop in a daemon thread. They outlive the
+  asyncio.run() loop of any single block run, and callers from any thread or loop can
+  use them.
+- Sessions are keyed on the server command, args, env and a corpus version (e.g. the
+  corpus generation). Asking for a new version closes the sessions of older versions,
+  so a changed document gets a fresh server.
+- A session that has been idle for health_check_seconds is pinged before reuse. A
+  session that fails a ping or raises during use is discarded, never returned to the
+  pool.
+- Sessions idle longer than idle_timeout_seconds are closed.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import time
+
+from utils.process_instances import shared_instance
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledSession:
+    def __init__(self, key, server_params):
+        self.key = key
+        self.server_params = server_params
+        self.session = None
+        self.last_used = time.monotonic()
+        self.ready = None
+        self.closing = None
+        self.task = None
+
+
+class MCPSessionPool:
+    def __init__(self, max_sessions_per_key=4, idle_timeout_seconds=600, health_check_seconds=30,
+                 ping_timeout_seconds=5, start_timeout_seconds=60):
+        self.max_sessions_per_key = max_sessions_per_key
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.health_check_seconds = health_check_seconds
+        self.ping_timeout_seconds = ping_timeout_seconds
+        self.start_timeout_seconds = start_timeout_seconds
+        self.stats = {"created": 0, "reused": 0, "health_check_failures": 0, "discarded": 0, "evicted_idle": 0,
+                      "evicted_version": 0}
+
+        self._idle = {}         # key -> [_PooledSession], most recently used last
+        self._versions = {}     # key without version -> current version
+        self._capacity = {}     # key -> asyncio.Semaphore
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._evictor = None
+        self._thread = threading.Thread(target=self._run_loop, name="mcp-session-pool", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        # Created before the loop runs, so it exists by the time close() schedules anything
+        self._evictor = self._loop.create_task(self._evict_idle_forever())
+        self._loop.run_forever()
+
+    @staticmethod
+    def _base_key(server_params):
+        return (server_params.command, tuple(server_params.args), tuple(sorted((server_params.env or {}).items())),
+                server_params.cwd and str(server_params.cwd))
+
+    async def _session_task(self, pooled):
+        """Own one server's context managers for its whole life; they must be exited by the task that entered them"""
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        try:
+            async with stdio_client(pooled.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    pooled.session = session
+                    pooled.ready.set_result(session)
+                    await pooled.closing.wait()
+        except Exception as e:
+            if not pooled.ready.done():
+                pooled.ready.set_exception(e)
+            else:
+                logger.warning(f"MCP session for {pooled.key[0]} ended with error: {e}")
+        finally:
+            if not pooled.ready.done():
+                pooled.ready.set_exception(ConnectionError("MCP session closed before it was ready"))
+
+    async def _create(self, key, server_params):
+        pooled = _PooledSession(key, server_params)
+        pooled.ready = self._loop.create_future()
+        pooled.closing = asyncio.Event()
+        pooled.task = asyncio.create_task(self._session_task(pooled))
+        try:
+            await asyncio.wait_for(asyncio.shield(pooled.ready), self.start_timeout_seconds)
+        except BaseException:
+            await self._close(pooled)
+            raise
+        self.stats["created"] += 1
+        return pooled
+
+    async def _close(self, pooled):
+        pooled.closing.set()
+        try:
+            await asyncio.wait_for(pooled.task, self.ping_timeout_seconds)
+        except Exception:
+            pooled.task.cancel()
+
+    async def _healthy(self, pooled):
+        if time.monotonic() - pooled.last_used < self.health_check_seconds:
+            return not pooled.task.done()
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), self.ping_timeout_seconds)
+            return True
+        except Exception:
+            self.stats["health_check_failures"] += 1
+            return False
+
+    async def _retire_old_versions(self, base_key, version):
+        if self._versions.get(base_key, version) != version:
+            for key in [key for key in self._idle if key[0] == base_key and key[1] != version]:
+                self._capacity.pop(key, None)
+                for pooled in self._idle.pop(key):
+                    self.stats["evicted_version"] += 1
+                    await self._close(pooled)
+        self._versions[base_key] = version
+
+    async def _acquire(self, server_params, version):
+        base_key = self._base_key(server_params)
+        key = (base_key, version)
+        await self._retire_old_versions(base_key, version)
+
+        idle = self._idle.setdefault(key, [])
+        while idle:
+            pooled = idle.pop()
+            if await self._healthy(pooled):
+                self.stats["reused"] += 1
+                return key, pooled
+            await self._close(pooled)
+        return key, await self._create(key, server_params)
+
+    async def _run(self, server_params, version, fn):
+        if self._closed:
+            raise RuntimeError("MCP session pool is closed")
+        base_key = self._base_key(server_params)
+        capacity = self._capacity.setdefault((base_key, version), asyncio.Semaphore(self.max_sessions_per_key))
+        async with capacity:
+            key, pooled = await self._acquire(server_params, version)
+            try:
+                result = await fn(pooled.session)
+            except BaseException:
+                # The session may be mid-request or broken; never hand it out again
+                self.stats["discarded"] += 1
+                await self._close(pooled)
+                raise
+            pooled.last_used = time.monotonic()
+            if self._versions.get(base_key) == version and not self._closed:
+                self._idle.setdefault(key, []).append(pooled)
+            else:
+                await self._close(pooled)
+            return result
+
+    async def _evict_idle_forever(self):
+        while not self._closed:
+            await asyncio.sleep(min(self.idle_timeout_seconds, 30))
+            cutoff = time.monotonic() - self.idle_timeout_seconds
+            for key, idle in list(self._idle.items()):
+                expired = [pooled for pooled in idle if pooled.last_used < cutoff]
+                if expired:
+                    self._idle[key] = [pooled for pooled in idle if pooled.last_used >= cutoff]
+                    for pooled in expired:
+                        self.stats["evicted_idle"] += 1
+                        await self._close(pooled)
+
+    def _submit(self, server_params, version, fn):
+        # Once closed the loop is stopped, and a coroutine handed to it would never run
+        if self._closed:
+            raise RuntimeError("MCP session pool is closed")
+        return asyncio.run_coroutine_threadsafe(self._run(server_params, version, fn), self._loop)
+
+    def run(self, server_params, fn, version=None, timeout=None):
+        """Run `await fn(session)` on a pooled session and return its result; blocks the calling thread"""
+        return self._submit(server_params, version, fn).result(timeout)
+
+    async def run_async(self, server_params, fn, version=None):
+        """Awaitable form of run for callers on another event loop"""
+        return await asyncio.wrap_future(self._submit(server_params, version, fn))
+
+    def idle_sessions(self):
+        return sum(len(idle) for idle in self._idle.values())
+
+    def close(self):
+        """Stop idle eviction, close every idle session and stop the pool's event loop"""
+        if self._closed:
+            return
+
+        async def close_all():
+            self._closed = True
+            self._evictor.cancel()
+            await asyncio.gather(self._evictor, return_exceptions=True)
+            for idle in self._idle.values():
+                for pooled in idle:
+                    await self._close(pooled)
+            self._idle.clear()
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(30)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+
+def _create_pool(**kwargs):
+    pool = MCPSessionPool(**kwargs)
+    atexit.register(pool.close)
+    return pool
+
+
+def get_session_pool(**kwargs):
+    """The process-wide pool, so sessions survive across Mage block runs; kwargs apply only when it is first created"""
+    return shared_instance((MCPSessionPool, "default"), lambda: _create_pool(**kwargs))
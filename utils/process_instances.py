@@ -0,0 +1,27 @@
+"""
+Process-wide instances shared across Mage block runs.
+
+Mage calls a block function once per batch or run, so anything a block opens (a SQLite
+cache, a state store, an order-flow engine) would otherwise be rebuilt on every call,
+losing in-memory state and resetting its stats. shared_instance keeps one instance per
+key for the life of the process.
+"""
+import threading
+
+_INSTANCES = {}
+_LOCK = threading.Lock()
+
+
+def shared_instance(key, create):
+    """Return the instance stored under key, calling create() to make it on first use"""
+    with _LOCK:
+        instance = _INSTANCES.get(key)
+        if instance is None:
+            instance = _INSTANCES[key] = create()
+        return instance
+
+
+def drop_instance(key):
+    """Forget the instance under key (e.g. once it is closed); the next shared_instance call makes a new one"""
+    with _LOCK:
+        _INSTANCES.pop(key, None)
@@ -0,0 +1,195 @@
+"""
+Context assembly for Anthropic calls that keeps prompts cache-friendly.
+
+Prompt caching matches byte-identical prefixes, so the prompt is laid out from most to
+least stable. The system blocks are shared by every question: the system prompt, then
+the whole document when it fits in full_document_token_limit, or else a preamble (how
+context is presented, plus the document's outline when the chunks carry headings).
+The cache_control breakpoint closes them once they reach min_cache_tokens, the
+shortest prompt Anthropic caches. The retrieved context and the question follow,
+since they change from question to question.
+
+- Retrieved chunks are chosen in rank order until token_budget is reached, then
+  rendered in document (chunk id) order. Questions that retrieve the same chunks in a
+  different rank order still produce the same prefix.
+- Consecutive chunks overlap by up to a few hundred characters (see chunk_pdf_text).
+  The overlap is detected and merged, so each passage is sent once.
+- In full-document mode the document is deduplicated the same way, and the user turn
+  only names the most relevant sections. Set full_document_token_limit to 0 to always
+  send retrieved chunks instead.
+
+Token counts use the same estimate as chunk budgets (text_chunker.approximate_tokens)
+unless count_tokens is given.
+"""
+import hashlib
+
+from utils.text_chunker import approximate_tokens
+
+CACHE_CONTROL = {"type": "ephemeral"}
+DEFAULT_SYSTEM_PROMPT = "Answer based only on the provided context."
+DEFAULT_PREAMBLE = ("Each question comes with CONTEXT: sections of the document, labelled with their section "
+                    "numbers and given in document order. Cite the section numbers your answer relies on.")
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+# Prompts shorter than this are not cached (1024 tokens for Sonnet and Opus; Haiku needs 2048)
+MIN_CACHE_TOKENS = 1024
+# Documents up to this size are sent whole as the cached prefix
+FULL_DOCUMENT_TOKEN_LIMIT = 32_000
+
+
+def _overlap(previous, following, max_overlap, min_overlap=16):
+    """Length of the longest suffix of previous that is also a prefix of following"""
+    if len(following) < min_overlap:
+        return 0
+    probe = following[:min_overlap]
+    lowest = max(0, len(previous) - max_overlap)
+    position = previous.rfind(probe, lowest)
+    best = 0
+    while position != -1:
+        length = len(previous) - position
+        if following.startswith(previous[position:]):
+            best = length
+        position = previous.rfind(probe, lowest, position + min_overlap - 1)
+    return best
+
+
+def merge_passages(chunks, max_overlap=2000):
+    """
+    Merge chunks [(chunk_id, text)] in chunk id order into passages [(chunk_ids, text)].
+    Consecutive ids whose texts overlap are joined with the overlap removed.
+    """
+    passages = []
+    for chunk_id, text in sorted(chunks, key=lambda chunk: chunk[0]):
+        if passages and passages[-1][0][-1] == chunk_id - 1:
+            previous_ids, previous_text = passages[-1]
+            overlap = _overlap(previous_text, text, max_overlap)
+            if overlap:
+                passages[-1] = (previous_ids + [chunk_id], previous_text + text[overlap:])
+                continue
+        passages.append(([chunk_id], text))
+    return passages
+
+
+def trim_to_tokens(text, token_budget, count_tokens=approximate_tokens):
+    """Longest prefix of text that count_tokens puts within token_budget"""
+    if count_tokens(text) <= token_budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def document_outline(chunks):
+    """Section-numbered heading lines for chunks that start under a new heading"""
+    lines = []
+    previous = None
+    for row, chunk in enumerate(chunks):
+        heading = chunk.get("heading")
+        if heading and heading != previous:
+            lines.append(f"{_section_label([int(chunk.get('chunk_id', row))])} {heading}")
+        previous = heading
+    return "\n".join(lines)
+
+
+def _section_label(chunk_ids):
+    if len(chunk_ids) == 1:
+        return f"[Section {chunk_ids[0]}]"
+    return f"[Sections {chunk_ids[0]}-{chunk_ids[-1]}]"
+
+
+def render_passages(passages):
+    return PASSAGE_SEPARATOR.join(f"{_section_label(chunk_ids)}\n{text}" for chunk_ids, text in passages)
+
+
+class ContextAssembler:
+    def __init__(self, system=DEFAULT_SYSTEM_PROMPT, token_budget=8000,
+                 full_document_token_limit=FULL_DOCUMENT_TOKEN_LIMIT, max_overlap=2000,
+                 count_tokens=approximate_tokens, preamble=DEFAULT_PREAMBLE, min_cache_tokens=MIN_CACHE_TOKENS):
+        self.system = system
+        self.preamble = preamble
+        self.document_preamble = preamble
+        self.token_budget = token_budget
+        self.full_document_token_limit = full_document_token_limit
+        self.max_overlap = max_overlap
+        self.count_tokens = count_tokens
+        self.min_cache_tokens = min_cache_tokens
+        self.document_text = None
+        self.prefix_tokens = self.count_tokens(self._prefix_text())
+
+    def set_document(self, chunks):
+        """
+        Put the document into the stable prefix: the whole document if it fits in
+        full_document_token_limit, else its outline after the preamble
+        """
+        chunks = list(chunks)
+        outline = document_outline(chunks)
+        self.document_preamble = "\n\n".join(part for part in (
+            self.preamble, f"DOCUMENT OUTLINE:\n{outline}" if outline else None) if part)
+        self.document_text = None
+        if self.full_document_token_limit:
+            pairs = [(int(chunk.get("chunk_id", row)), chunk.get("text", "")) for row, chunk in enumerate(chunks)]
+            text = render_passages(merge_passages(pairs, self.max_overlap))
+            if self.count_tokens(text) <= self.full_document_token_limit:
+                self.document_text = text
+        self.prefix_tokens = self.count_tokens(self._prefix_text())
+
+    def _prefix_blocks(self):
+        """System blocks shared by every question, with a cache breakpoint if they are long enough to cache"""
+        system = [{"type": "text", "text": self.system}]
+        if self.document_text is not None:
+            system.append({"type": "text", "text": f"DOCUMENT:\n{self.document_text}"})
+        elif self.document_preamble:
+            system.append({"type": "text", "text": self.document_preamble})
+        # Shorter prefixes are never cached, and a breakpoint on one would only be ignored
+        if self.prefix_tokens >= self.min_cache_tokens:
+            system[-1]["cache_control"] = CACHE_CONTROL
+        return system
+
+    def _prefix_text(self):
+        if self.document_text is not None:
+            return f"{self.system}DOCUMENT:\n{self.document_text}"
+        return f"{self.system}{self.document_preamble}"
+
+    @property
+    def layout(self):
+        """Identifies the prompt layout, for answer cache keys"""
+        mode = "full-document" if self.document_text is not None else "retrieved"
+        preamble = hashlib.sha256(self.document_preamble.encode("utf-8")).hexdigest()[:16]
+        return f"{mode}:{self.token_budget}:{self.full_document_token_limit}:{preamble}"
+
+    def select(self, retrieved):
+        """Chunks [(chunk_id, text)] in rank order that fit token_budget; the best one is always kept"""
+        selected = []
+        used = 0
+        for chunk_id, text in retrieved:
+            tokens = self.count_tokens(text)
+            if selected and used + tokens > self.token_budget:
+                continue
+            if not selected and tokens > self.token_budget:
+                # Keep the top chunk even when it alone is over budget, trimmed to fit
+                text = trim_to_tokens(text, self.token_budget, self.count_tokens)
+                tokens = self.count_tokens(text)
+            selected.append((chunk_id, text))
+            used += tokens
+        return selected
+
+    def build(self, question, retrieved):
+        """Return (system blocks, messages, chunk ids used) for one question"""
+        system = self._prefix_blocks()
+        if self.document_text is not None:
+            chunk_ids = [chunk_id for chunk_id, _ in retrieved]
+            focus = ", ".join(str(chunk_id) for chunk_id in sorted(chunk_ids))
+            content = [{"type": "text", "text": f"Most relevant sections: {focus}\n\nQUESTION:\n{question}"}]
+            return system, [{"role": "user", "content": content}], chunk_ids
+
+        selected = self.select(retrieved)
+        context = render_passages(merge_passages(selected, self.max_overlap))
+        content = [
+            {"type": "text", "text": f"CONTEXT:\n{context}"},
+            {"type": "text", "text": f"QUESTION:\n{question}"},
+        ]
+        return system, [{"role": "user", "content": content}], sorted(chunk_id for chunk_id, _ in selected)
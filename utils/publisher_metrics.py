@@ -0,0 +1,209 @@
+"""
+In-process metrics for the Binance -> Kafka publisher, exposed in the Prometheus text
+format over a small HTTP endpoint.
+
+Only the handful of primitives the publisher needs are implemented here (counters,
+gauges and cumulative histograms with labels) so no client library is required.
+"""
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+
+class Gauge(_Metric):
+    """A gauge set directly, or sampled at scrape time from a callback returning {labelvalues: value}"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), sample=None):
+        super().__init__(name, documentation, labelnames)
+        self._sample = sample
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self):
+        if self._sample is not None:
+            values = self._sample()
+            with self._lock:
+                self._values = dict(values)
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # per-bucket counts (plus +Inf), sum, count
+                state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((labels, [list(state[0]), state[1], state[2]]) for labels, state in self._values.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class PublisherMetrics:
+    """The metric set reported by TradePublisher and the shard receive loops"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self._queue_depths = {}
+        register = self.registry.register
+
+        self.frames_received = register(Counter(
+            "binance_frames_received_total", "Raw websocket frames received", ["shard"]))
+        self.trades_received = register(Counter(
+            "binance_trades_received_total", "Trades decoded from websocket frames", ["symbol"]))
+        self.trades_published = register(Counter(
+            "binance_trades_published_total", "Trades acknowledged by Kafka", ["symbol"]))
+        self.send_errors = register(Counter(
+            "binance_kafka_send_errors_total", "Kafka sends that failed", ["symbol"]))
+        self.send_latency = register(Histogram(
+            "binance_kafka_send_latency_seconds", "Time from producer.send to broker acknowledgement",
+            buckets=LATENCY_BUCKETS))
+        self.reconnects = register(Counter(
+            "binance_websocket_reconnects_total", "Websocket reconnect attempts", ["shard"]))
+        self.event_lag = register(Histogram(
+            "binance_trade_event_lag_seconds", "Delay between exchange trade time (T) and publishing",
+            buckets=LAG_BUCKETS))
+        self.last_event_lag = register(Gauge(
+            "binance_trade_last_event_lag_seconds", "Event-time lag of the latest trade per symbol", ["symbol"]))
+        self.queue_depth = register(Gauge(
+            "binance_publisher_queue_depth", "Frames waiting in the publisher queue", ["shard"],
+            sample=self._sample_queue_depths))
+
+    def track_queue(self, shard_id, queue):
+        self._queue_depths[str(shard_id)] = queue
+
+    def _sample_queue_depths(self):
+        return {(shard_id,): queue.qsize() for shard_id, queue in self._queue_depths.items()}
+
+    def on_send_success(self, symbol, sent_at, record_metadata=None):
+        """future.add_callback target; sent_at is the time.monotonic() of producer.send"""
+        self.trades_published.inc(symbol)
+        self.send_latency.observe(time.monotonic() - sent_at)
+
+    def on_send_error(self, symbol, exception=None):
+        """future.add_errback target"""
+        self.send_errors.inc(symbol)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the publisher log
+        pass
+
+
+def start_metrics_server(registry, host="127.0.0.1", port=9108):
+    """Serve registry.render() at http://host:port/metrics from a daemon thread"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
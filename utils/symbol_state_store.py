@@ -0,0 +1,206 @@
+"""
+Per-symbol running state for the kafka_demo_ streaming transformer.
+
+Aggregates live in memory and are checkpointed to SQLite together with the highest
+Kafka offset seen per partition and the last trade id per symbol, in one transaction.
+Mage commits consumer offsets after each batch the pipeline processes, so checkpointing
+at the end of every batch (checkpoint_every_batches=1, the default) keeps the store
+aligned with the committed offsets. A larger interval trades durability for fewer writes:
+after a crash, batches since the last checkpoint are missing from the totals.
+
+On restart Kafka may redeliver messages that were already applied. Those are recognised
+by their trade id (sequential per symbol) and dropped from the batch, so totals are
+never double counted.
+
+Backfilled trades (data_type "trade_backfill") fill a gap below the live watermark, so
+they are exempt from it. They are deduplicated on their own (symbol, trade id) keys,
+which are checkpointed with the totals. Keys more than BACKFILL_RETENTION_TRADES
+below the watermark are pruned.
+"""
+import os
+import sqlite3
+import time
+
+from utils.process_instances import drop_instance, shared_instance
+
+BACKFILL_RETENTION_TRADES = 1_000_000
+
+
+class SymbolStateStore:
+    def __init__(self, path, checkpoint_every_batches=1, checkpoint_interval_seconds=None):
+        self.path = path
+        self.checkpoint_every_batches = checkpoint_every_batches
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS symbol_state (
+                symbol TEXT PRIMARY KEY,
+                cumulative_price REAL NOT NULL,
+                trade_count INTEGER NOT NULL,
+                last_trade_id INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS consumer_offsets (
+                topic TEXT NOT NULL,
+                partition INTEGER NOT NULL,
+                last_offset INTEGER NOT NULL,
+                PRIMARY KEY (topic, partition)
+            );
+            CREATE TABLE IF NOT EXISTS backfilled_trades (
+                symbol TEXT NOT NULL,
+                trade_id INTEGER NOT NULL,
+                PRIMARY KEY (symbol, trade_id)
+            );
+        """)
+
+        self._totals = {}
+        self._last_trade_ids = {}
+        self._offsets = {}
+        for symbol, cumulative_price, trade_count, last_trade_id in self._connection.execute(
+                "SELECT symbol, cumulative_price, trade_count, last_trade_id FROM symbol_state"):
+            self._totals[symbol] = (cumulative_price, trade_count)
+            if last_trade_id is not None:
+                self._last_trade_ids[symbol] = last_trade_id
+        for topic, partition, last_offset in self._connection.execute(
+                "SELECT topic, partition, last_offset FROM consumer_offsets"):
+            self._offsets[(topic, partition)] = last_offset
+        self._backfilled = {}
+        for symbol, trade_id in self._connection.execute("SELECT symbol, trade_id FROM backfilled_trades"):
+            self._backfilled.setdefault(symbol, set()).add(trade_id)
+
+        self._dirty_symbols = set()
+        self._dirty_offsets = set()
+        self._new_backfills = []
+        self._batches_since_checkpoint = 0
+        self._last_checkpoint_at = time.monotonic()
+        self.replayed = 0
+
+    def totals(self):
+        """symbol -> (cumulative_price, trade_count)"""
+        return self._totals
+
+    def update_totals(self, totals):
+        self._totals.update(totals)
+        self._dirty_symbols.update(totals)
+
+    def offsets(self):
+        """(topic, partition) -> last offset included in the state"""
+        return dict(self._offsets)
+
+    def filter_new(self, messages):
+        """
+        Drop messages already applied to the state (redelivered after a restart) and
+        advance the per-symbol trade id watermark for the rest. Backfilled trades are
+        checked against the backfill keys seen so far instead of the watermark.
+        """
+        last_trade_ids = self._last_trade_ids
+        fresh = []
+        batch_max = {}
+        for message in messages:
+            symbol = message["symbol"]
+            trade_id = message.get("trade_id")
+            if trade_id is not None and message.get("data_type") == "trade_backfill":
+                seen = self._backfilled.setdefault(symbol, set())
+                if trade_id in seen:
+                    self.replayed += 1
+                    continue
+                seen.add(trade_id)
+                self._new_backfills.append((symbol, trade_id))
+            elif trade_id is not None:
+                last = last_trade_ids.get(symbol)
+                if last is not None and trade_id <= last:
+                    self.replayed += 1
+                    continue
+                if trade_id > batch_max.get(symbol, -1):
+                    batch_max[symbol] = trade_id
+            fresh.append(message)
+
+        last_trade_ids.update(batch_max)
+        self._dirty_symbols.update(batch_max)
+        return fresh
+
+    def record_offsets(self, metadata):
+        """Track the highest offset per partition from Kafka message metadata dicts"""
+        for item in metadata:
+            key = (item.get("topic"), item.get("partition"))
+            offset = item.get("offset")
+            if offset is not None and offset > self._offsets.get(key, -1):
+                self._offsets[key] = offset
+                self._dirty_offsets.add(key)
+
+    def end_batch(self):
+        """Checkpoint when the batch or time interval is due"""
+        self._batches_since_checkpoint += 1
+        due = self._batches_since_checkpoint >= self.checkpoint_every_batches
+        if self.checkpoint_interval_seconds is not None:
+            due = due or time.monotonic() - self._last_checkpoint_at >= self.checkpoint_interval_seconds
+        if due:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Write changed symbols, offsets and backfill keys in a single transaction"""
+        if self._dirty_symbols or self._dirty_offsets or self._new_backfills:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT INTO symbol_state (symbol, cumulative_price, trade_count, last_trade_id) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET cumulative_price = excluded.cumulative_price, "
+                    "trade_count = excluded.trade_count, last_trade_id = excluded.last_trade_id",
+                    [(symbol, *self._totals.get(symbol, (0.0, 0)), self._last_trade_ids.get(symbol))
+                     for symbol in self._dirty_symbols],
+                )
+                self._connection.executemany(
+                    "INSERT INTO consumer_offsets (topic, partition, last_offset) VALUES (?, ?, ?) "
+                    "ON CONFLICT(topic, partition) DO UPDATE SET last_offset = excluded.last_offset",
+                    [(topic, partition, self._offsets[(topic, partition)])
+                     for topic, partition in self._dirty_offsets],
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO backfilled_trades (symbol, trade_id) VALUES (?, ?)", self._new_backfills)
+                self._prune_backfills()
+            self._dirty_symbols.clear()
+            self._dirty_offsets.clear()
+            self._new_backfills.clear()
+        self._batches_since_checkpoint = 0
+        self._last_checkpoint_at = time.monotonic()
+
+    def _prune_backfills(self):
+        for symbol in {symbol for symbol, _ in self._new_backfills}:
+            last = self._last_trade_ids.get(symbol)
+            if last is None:
+                continue
+            cutoff = last - BACKFILL_RETENTION_TRADES
+            self._backfilled[symbol] = {trade_id for trade_id in self._backfilled[symbol] if trade_id >= cutoff}
+            self._connection.execute("DELETE FROM backfilled_trades WHERE symbol = ? AND trade_id < ?",
+                                     (symbol, cutoff))
+
+    def close(self):
+        self.checkpoint()
+        self._connection.close()
+        drop_instance((SymbolStateStore, self.path))
+
+
+def get_state_store(path, **kwargs):
+    """The process-wide store for path, opened on first use"""
+    return shared_instance((SymbolStateStore, path), lambda: SymbolStateStore(path, **kwargs))
+
+
+def split_metadata(messages):
+    """
+    Separate trade payloads from Kafka metadata when the loader sets include_metadata: true
+    (messages shaped {"data": ..., "metadata": {...}}); plain messages pass through.
+    """
+    payloads = []
+    metadata = []
+    for message in messages:
+        if isinstance(message, dict) and "metadata" in message and "data" in message:
+            payloads.append(message["data"])
+            metadata.append(message["metadata"])
+        else:
+            payloads.append(message)
+    return payloads, metadata
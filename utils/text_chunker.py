@@ -0,0 +1,213 @@
+"""
+Structure-aware chunking of cleaned documents for the meet_attractor pipeline.
+
+iter_chunks lazily yields chunks that are contiguous spans of the text:
+- A heading (markdown "#", numbered "2.1 Results", or a short all-caps line) starts a
+  new chunk once the current one holds at least min_tokens. A numbered or all-caps line
+  followed by a lowercase line is taken as wrapped body text, not a heading.
+- Paragraphs are packed whole up to max_tokens. A paragraph that is too long is split
+  into sentences, and a sentence that is too long is split at whitespace.
+- Overlap is sentence-based. A chunk repeats up to overlap_sentences trailing
+  sentences of the previous chunk, provided they fit in max_overlap_tokens. There is
+  no overlap across a heading.
+
+Sizes are measured in model tokens. The default counter approximates BPE token counts
+with one regex and no dependencies. "tiktoken:<encoding>" uses tiktoken when it is
+installed.
+"""
+import re
+from bisect import bisect_right
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_LINE = re.compile(r"[^\n]+")
+_SENTENCE_START = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_MARKDOWN_HEADING = re.compile(r"#{1,6}\s+\S")
+# "2 Results", "3.1. Data", "ABSTRACT"; not a wrapped sentence such as "100 Mpc away from the"
+_HEADING = re.compile(r"(?:\d{1,2}(?:\.\d{1,2})*\.?\s+[A-Z][^.!?,;:]{0,60}|[A-Z][A-Z0-9 ,:&'-]{3,60})(?<![\s,-])$")
+_CONTINUATION = re.compile(r"\s*[a-z(]")
+_DANGLING_WORD = re.compile(r"\b(?:a|an|and|as|at|by|for|from|in|of|on|or|the|to|with)$", re.IGNORECASE)
+
+
+def approximate_tokens(text):
+    """Roughly what a BPE tokenizer gives for English: one token per ~6 word characters or punctuation mark"""
+    return sum((len(piece) + 5) // 6 for piece in _PIECES.findall(text))
+
+
+def get_token_counter(name="approximate"):
+    """"approximate" or "tiktoken:<encoding name>" (e.g. tiktoken:cl100k_base)"""
+    if name == "approximate":
+        return approximate_tokens
+    if name.startswith("tiktoken:"):
+        if tiktoken is None:
+            raise ImportError("tiktoken is not installed; use the approximate token counter instead")
+        encoding = tiktoken.get_encoding(name.split(":", 1)[1])
+        return lambda text: len(encoding.encode_ordinary(text))
+    raise ValueError(f"Unknown token counter {name!r}")
+
+
+def is_heading(line, next_line=None):
+    """
+    A markdown heading, or a short numbered or all-caps line. next_line is the line after
+    it in the same paragraph; a lowercase start there means line is wrapped body text.
+    """
+    line = line.strip()
+    if _MARKDOWN_HEADING.match(line):
+        return len(line) <= 100
+    if next_line is not None and _CONTINUATION.match(next_line):
+        return False
+    return bool(_HEADING.match(line)) and not _DANGLING_WORD.search(line)
+
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _sentence_spans(text, start, end):
+    spans = []
+    for match in _SENTENCE_START.finditer(text, start, end):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, end))
+    return spans
+
+
+def _paragraph_spans(text):
+    """(start, end, heading) for paragraphs, with heading lines split out as their own spans"""
+    start = 0
+    breaks = [match.span() for match in _PARAGRAPH_BREAK.finditer(text)] + [(len(text), len(text))]
+    for paragraph_end, next_start in breaks:
+        span_start = start
+        lines = list(_LINE.finditer(text, start, paragraph_end))
+        for i, line in enumerate(lines):
+            if is_heading(line.group(), lines[i + 1].group() if i + 1 < len(lines) else None):
+                if line.start() > span_start:
+                    yield span_start, line.start(), False
+                yield line.start(), line.end(), True
+                span_start = line.end()
+        if span_start < paragraph_end:
+            yield span_start, paragraph_end, False
+        start = next_start
+
+
+class _Unit:
+    __slots__ = ("start", "end", "tokens", "heading")
+
+    def __init__(self, start, end, tokens, heading=False):
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+        self.heading = heading
+
+
+def _units(text, max_tokens, count_tokens):
+    """Paragraphs and headings, with anything over max_tokens broken into sentences or word runs"""
+    for start, end, heading in _paragraph_spans(text):
+        start, end = _trim(text, start, end)
+        if start == end:
+            continue
+        tokens = count_tokens(text[start:end])
+        if tokens <= max_tokens or heading:
+            yield _Unit(start, end, tokens, heading)
+            continue
+        for sentence_start, sentence_end in _sentence_spans(text, start, end):
+            sentence_start, sentence_end = _trim(text, sentence_start, sentence_end)
+            if sentence_start == sentence_end:
+                continue
+            tokens = count_tokens(text[sentence_start:sentence_end])
+            if tokens <= max_tokens:
+                yield _Unit(sentence_start, sentence_end, tokens)
+                continue
+            # No sentence boundary to use; cut at whitespace near the token budget
+            window = max(1, (sentence_end - sentence_start) * max_tokens // tokens)
+            position = sentence_start
+            while position < sentence_end:
+                cut = min(sentence_end, position + window)
+                while True:
+                    if cut < sentence_end:
+                        space = text.rfind(" ", position + 1, cut)
+                        cut = space if space > position else cut
+                    piece_start, piece_end = _trim(text, position, cut)
+                    tokens = count_tokens(text[piece_start:piece_end])
+                    if tokens <= max_tokens or cut - position <= 1:
+                        break
+                    # Denser than the sentence on average; shrink the window in proportion
+                    cut = position + max(1, (cut - position) * max_tokens // tokens)
+                if piece_start < piece_end:
+                    yield _Unit(piece_start, piece_end, tokens)
+                position = cut
+
+
+def iter_chunks(text, max_tokens=1000, min_tokens=200, overlap_sentences=1, max_overlap_tokens=64,
+                count_tokens=approximate_tokens, page_starts=None):
+    """
+    Yield {"chunk_id", "text", "start_char", "end_char", "character_count", "token_count",
+    "heading", "page"} dicts; page is set when page_starts [(page, start offset)] is given.
+    """
+    page_numbers = [page for page, _ in page_starts or []]
+    page_offsets = [offset for _, offset in page_starts or []]
+    chunk_id = 0
+    heading = None
+    current = []
+
+    def make_chunk(units):
+        start, end = units[0].start, units[-1].end
+        chunk_text = text[start:end]
+        page = None
+        if page_offsets and start >= page_offsets[0]:
+            page = page_numbers[bisect_right(page_offsets, start) - 1]
+        return {
+            "chunk_id": chunk_id,
+            "text": chunk_text,
+            "start_char": start,
+            "end_char": end,
+            "character_count": len(chunk_text),
+            "token_count": sum(unit.tokens for unit in units),
+            "heading": heading,
+            "page": page,
+        }
+
+    def overlap(units):
+        """Trailing sentences of units to repeat at the start of the next chunk"""
+        if not overlap_sentences:
+            return []
+        last = units[-1]
+        sentences = _sentence_spans(text, last.start, last.end)[-overlap_sentences:]
+        for sentence_start, _ in sentences:
+            sentence_start, _ = _trim(text, sentence_start, last.end)
+            if sentence_start <= units[0].start:
+                continue
+            tokens = count_tokens(text[sentence_start:last.end])
+            if tokens <= max_overlap_tokens:
+                return [_Unit(sentence_start, last.end, tokens)]
+        return []
+
+    used = 0
+    for unit in _units(text, max_tokens, count_tokens):
+        if current and unit.heading and used >= min_tokens:
+            yield make_chunk(current)
+            chunk_id += 1
+            current, used = [], 0
+        elif current and used + unit.tokens > max_tokens:
+            yield make_chunk(current)
+            chunk_id += 1
+            current = overlap(current)
+            used = sum(item.tokens for item in current)
+            if used + unit.tokens > max_tokens:
+                current, used = [], 0
+        if unit.heading:
+            heading = text[unit.start:unit.end]
+        current.append(unit)
+        used += unit.tokens
+
+    if current:
+        yield make_chunk(current)
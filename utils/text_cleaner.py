@@ -0,0 +1,114 @@
+"""
+Text cleaning for extracted PDF pages in the meet_attractor pipeline.
+
+TextCleaner compiles its rules once into a single alternation, so each page is cleaned
+in one regex pass instead of one pass per rule. A rule is (name, pattern, replacement).
+The replacement is a plain string (no backreferences, since group numbers shift once
+rules are fused) or a callable taking the match. Rules should not overlap; use
+lookarounds for context (see dehyphenate).
+
+Running headers and footers are learned rather than hard-coded. A line near the top or
+bottom of a page is boilerplate when its digit-normalized form ("Page 12 of 40" ->
+"page # of #") appears on at least min_fraction of the pages and rarely mid-page.
+Learning keeps counts for edge lines only, and pages are then cleaned one at a time, so
+memory stays proportional to a page and not to the document.
+"""
+import re
+from collections import Counter
+
+DEFAULT_RULES = (
+    # Words hyphenated across a line break
+    ("dehyphenate", r"(?<=\w)-\n(?=\w)", ""),
+    ("blank_lines", r"\n{3,}", "\n\n"),
+    ("spaces", r" {2,}", " "),
+)
+
+_DIGITS = re.compile(r"\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_line(line):
+    return _WHITESPACE.sub(" ", _DIGITS.sub("#", line)).strip().lower()
+
+
+def _edge_lines(lines, edge_lines):
+    """Indexes of the first and last edge_lines non-empty lines"""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return set(filled[:edge_lines] + filled[-edge_lines:])
+
+
+class TextCleaner:
+    def __init__(self, rules=DEFAULT_RULES, learn_boilerplate=True, edge_lines=3, min_fraction=0.5, min_pages=3):
+        self.rules = tuple(rules)
+        self.learn_boilerplate = learn_boilerplate
+        self.edge_lines = edge_lines
+        self.min_fraction = min_fraction
+        self.min_pages = min_pages
+        self.boilerplate = set()
+
+        self._replacements = {}
+        alternatives = []
+        for i, (name, pattern, replacement) in enumerate(self.rules):
+            group = f"rule{i}"
+            re.compile(pattern)  # Report a bad rule by itself rather than as part of the fused pattern
+            alternatives.append(f"(?P<{group}>{pattern})")
+            self._replacements[group] = replacement
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+
+    def _replace(self, match):
+        replacement = self._replacements[match.lastgroup]
+        return replacement(match) if callable(replacement) else replacement
+
+    def learn(self, pages):
+        """Find lines repeated at the top or bottom of enough pages; pages is an iterable of page texts"""
+        counts = Counter()
+        page_count = 0
+        for text in pages:
+            page_count += 1
+            lines = text.split("\n")
+            counts.update({normalize_line(lines[i]) for i in _edge_lines(lines, self.edge_lines)})
+        threshold = max(self.min_pages, self.min_fraction * page_count)
+        candidates = {line for line, count in counts.items() if line and count >= threshold}
+
+        # Lines that also recur mid-page (e.g. numbered list items) are content, not headers
+        interior = Counter()
+        if candidates:
+            for text in pages:
+                lines = text.split("\n")
+                edges = _edge_lines(lines, self.edge_lines)
+                interior.update({form for form in (normalize_line(line) for i, line in enumerate(lines)
+                                                   if i not in edges) if form in candidates})
+        self.boilerplate = {line for line in candidates if interior[line] < self.min_pages}
+        return self.boilerplate
+
+    def clean_page(self, text):
+        if self.boilerplate:
+            lines = text.split("\n")
+            edges = _edge_lines(lines, self.edge_lines)
+            text = "\n".join(line for i, line in enumerate(lines)
+                             if i not in edges or normalize_line(line) not in self.boilerplate)
+        if self._pattern is not None:
+            text = self._pattern.sub(self._replace, text)
+        return text.strip()
+
+    def iter_clean(self, pages):
+        """Yield cleaned page texts in order; pages must be re-iterable when learning boilerplate"""
+        if self.learn_boilerplate:
+            self.learn(pages)
+        for text in pages:
+            yield self.clean_page(text)
+
+    def clean(self, pages, separator="\n\n"):
+        """Return (document text, [(page index, start offset)]) with empty pages dropped"""
+        parts = []
+        starts = []
+        offset = 0
+        for index, text in enumerate(self.iter_clean(pages)):
+            if not text:
+                continue
+            if parts:
+                offset += len(separator)
+            starts.append((index, offset))
+            parts.append(text)
+            offset += len(text)
+        return separator.join(parts), starts
@@ -0,0 +1,157 @@
+"""
+Reconnect backoff, trade-id gap detection and REST backfill for the Binance publisher.
+
+Futures trade ids (`t`) are sequential per symbol, so a jump from the last published
+id to the next received one means trades were missed (usually while reconnecting).
+Missed trades are recovered from the aggTrades REST endpoint through a fetcher, any
+callable of the form
+
+    fetcher(symbol, start_time_ms, end_time_ms) -> list of aggTrade dicts
+
+with Binance's aggTrade keys (a, p, q, f, l, T, m). RestAggTradesFetcher calls the
+real endpoint; point its base_url at a local mock, or pass any other callable, in tests.
+"""
+import json
+import logging
+import random
+import urllib.parse
+import urllib.request
+from typing import NamedTuple, Optional
+
+from utils.trade_codecs import TradeEvent
+
+logger = logging.getLogger(__name__)
+
+BINANCE_REST_BASE_URL = "https://fapi.binance.com"
+AGG_TRADES_LIMIT = 1000
+MAX_BACKFILL_TRADES = 10000
+
+
+class ReconnectBackoff:
+    """Exponential backoff with full jitter: delay is uniform in [0, min(cap, base * 2**attempt)]"""
+
+    def __init__(self, base=0.5, cap=60.0, rng=None):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+        self._rng = rng or random.Random()
+
+    def next_delay(self):
+        ceiling = min(self.cap, self.base * (2 ** self.attempt))
+        self.attempt += 1
+        return self._rng.uniform(0, ceiling)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class TradeGap(NamedTuple):
+    symbol: str
+    last_trade_id: int      # last trade id published before the gap
+    next_trade_id: int      # first trade id received after the gap
+    last_timestamp: int     # trade time (ms) of last_trade_id
+    next_timestamp: int     # trade time (ms) of next_trade_id
+
+    @property
+    def missing(self):
+        return self.next_trade_id - self.last_trade_id - 1
+
+
+class TradeIdTracker:
+    """
+    Remembers the last trade id and trade time per symbol and reports jumps.
+    Not thread-safe; the publisher only calls it from its worker thread.
+    """
+
+    def __init__(self):
+        self._last = {}
+
+    def observe(self, event) -> Optional[TradeGap]:
+        if event.trade_id is None:
+            return None
+
+        last = self._last.get(event.symbol)
+        if last is not None and event.trade_id <= last[0]:
+            # Duplicate or out-of-order trade, nothing new to track
+            return None
+
+        self._last[event.symbol] = (event.trade_id, event.timestamp)
+        if last is not None and event.trade_id > last[0] + 1:
+            return TradeGap(event.symbol, last[0], event.trade_id, last[1], event.timestamp)
+        return None
+
+    def last_trade_ids(self):
+        return {symbol: last[0] for symbol, last in self._last.items()}
+
+
+class RestAggTradesFetcher:
+    """Fetches one page of aggTrades for a time range from the Binance futures REST API"""
+
+    def __init__(self, base_url=BINANCE_REST_BASE_URL, limit=AGG_TRADES_LIMIT, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.limit = limit
+        self.timeout = timeout
+
+    def __call__(self, symbol, start_time_ms, end_time_ms):
+        query = urllib.parse.urlencode({
+            "symbol": symbol.upper(),
+            "startTime": start_time_ms,
+            "endTime": end_time_ms,
+            "limit": self.limit,
+        })
+        with urllib.request.urlopen(f"{self.base_url}/fapi/v1/aggTrades?{query}", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+def backfill_gap(gap, fetcher, max_trades=MAX_BACKFILL_TRADES):
+    """
+    Recover the trades in a gap as TradeEvents.
+
+    aggTrades merges fills at the same price and side, so each recovered event is one
+    aggregate trade carrying its last trade id (`l`) and summed quantity. Only aggregates
+    lying wholly inside the gap are returned. One that straddles a boundary includes
+    fills that were already published live, and its quantity cannot be split, so it is
+    skipped and logged.
+    """
+    if gap.missing > max_trades:
+        raise ValueError(f"Gap of {gap.missing} trades for {gap.symbol} exceeds backfill limit of {max_trades}")
+
+    stream = f"{gap.symbol.lower()}@trade"
+    events = []
+    seen_agg_ids = set()
+    straddling = 0
+    start_time = gap.last_timestamp
+
+    while True:
+        page = fetcher(gap.symbol, start_time, gap.next_timestamp)
+        new_records = [record for record in page if record["a"] not in seen_agg_ids]
+        if not new_records:
+            break
+
+        for record in new_records:
+            seen_agg_ids.add(record["a"])
+            if record["l"] <= gap.last_trade_id or record["f"] >= gap.next_trade_id:
+                continue
+            if record["f"] <= gap.last_trade_id or record["l"] >= gap.next_trade_id:
+                straddling += 1
+                logger.warning(f"Skipping aggTrade {record['a']} for {gap.symbol} (trade ids {record['f']}-"
+                               f"{record['l']}): it overlaps trades published before or after the gap")
+                continue
+            events.append(TradeEvent(
+                stream,
+                gap.symbol,
+                float(record["p"]),
+                float(record["q"]),
+                record["T"],
+                record["m"],
+                record["l"],
+            ))
+
+        last_record = new_records[-1]
+        if last_record["l"] >= gap.next_trade_id - 1 or len(page) < getattr(fetcher, "limit", AGG_TRADES_LIMIT):
+            break
+        start_time = last_record["T"]
+
+    if straddling:
+        logger.warning(f"Backfill for {gap.symbol} skipped {straddling} aggregate trades overlapping the gap edges")
+    return events
@@ -0,0 +1,179 @@
+"""
+Codecs for decoding Binance combined-stream trade frames and encoding Kafka payloads.
+
+Every codec exposes the same two calls:
+    decode_trade(frame) -> TradeEvent, or None when the frame is not a valid trade
+    encode(value)       -> bytes, used as the KafkaProducer value_serializer
+
+msgspec and orjson are optional. get_codec("auto") picks the fastest one installed
+and falls back to the standard library json module.
+"""
+import json
+from typing import NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class TradeEvent(NamedTuple):
+    stream: str
+    symbol: str
+    price: float
+    quantity: float
+    timestamp: int
+    buyer_maker: bool
+    trade_id: int
+
+
+def _event_from_mapping(data) -> Optional[TradeEvent]:
+    # Each message from combined streams has the following structure:
+    # {
+    #   "stream": "btcusdt@trade",
+    #   "data": { ... trade data ... }
+    # }
+    if not isinstance(data, dict):
+        return None
+    stream = data.get("stream")
+    trade_data = data.get("data")
+    if not stream or not trade_data:
+        return None
+    try:
+        return TradeEvent(
+            stream,
+            trade_data.get("s"),
+            float(trade_data.get("p", 0)),
+            float(trade_data.get("q", 0)),
+            trade_data.get("T"),
+            trade_data.get("m"),
+            trade_data.get("t"),
+        )
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class JsonCodec:
+    """Standard library json, always available"""
+
+    name = "json"
+
+    def decode_trade(self, frame) -> Optional[TradeEvent]:
+        try:
+            data = json.loads(frame)
+        except (TypeError, ValueError):
+            return None
+        return _event_from_mapping(data)
+
+    def encode(self, value) -> bytes:
+        return json.dumps(value).encode("utf-8")
+
+
+class OrjsonCodec:
+    """orjson parses into the same dicts as json, several times faster"""
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+
+    def decode_trade(self, frame) -> Optional[TradeEvent]:
+        try:
+            data = self._loads(frame)
+        except (TypeError, ValueError):
+            return None
+        return _event_from_mapping(data)
+
+    def encode(self, value) -> bytes:
+        return self._dumps(value)
+
+
+if msgspec is not None:
+    class _TradeData(msgspec.Struct):
+        s: str
+        p: str
+        q: str
+        T: int
+        m: bool
+        t: int
+
+    class _TradeFrame(msgspec.Struct):
+        stream: str
+        data: _TradeData
+
+
+class MsgspecCodec:
+    """
+    Typed decoder for the trade schema. Only the fields we publish are materialized,
+    and the unused ones (e, E, X, ...) are skipped without building Python objects.
+    """
+
+    name = "msgspec"
+
+    def __init__(self):
+        if msgspec is None:
+            raise ImportError("msgspec is not installed")
+        self._decode = msgspec.json.Decoder(_TradeFrame).decode
+        self._encode = msgspec.json.Encoder().encode
+        self._errors = (msgspec.DecodeError, TypeError, ValueError)
+
+    def decode_trade(self, frame) -> Optional[TradeEvent]:
+        try:
+            message = self._decode(frame)
+            trade_data = message.data
+            return TradeEvent(
+                message.stream,
+                trade_data.s,
+                float(trade_data.p),
+                float(trade_data.q),
+                trade_data.T,
+                trade_data.m,
+                trade_data.t,
+            )
+        except self._errors:
+            return None
+
+    def encode(self, value) -> bytes:
+        return self._encode(value)
+
+
+CODECS = {
+    "msgspec": MsgspecCodec,
+    "orjson": OrjsonCodec,
+    "json": JsonCodec,
+}
+
+
+def available_codecs():
+    """Names of the codecs whose dependencies are installed, fastest first"""
+    names = []
+    for name, codec_class in CODECS.items():
+        try:
+            codec_class()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_codec(name="auto"):
+    """
+    Return a codec instance by name. "auto" picks the fastest installed codec;
+    an explicitly named codec that is not installed falls back to stdlib json.
+    """
+    if name == "auto":
+        return CODECS[available_codecs()[0]]()
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}. Expected one of {list(CODECS)}")
+    try:
+        return CODECS[name]()
+    except ImportError:
+        return JsonCodec()
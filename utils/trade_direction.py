@@ -0,0 +1,103 @@
+"""
+Columnar computation of directional trade values for the kafka_demo_ streaming transformer.
+
+The batch is converted to NumPy arrays once; trade values, the buy/sell split and net
+buying pressure are element-wise array ops, and the per-symbol running price totals
+are computed as one cumsum per symbol over a stable (symbol, timestamp) ordering. That
+matches the sequential sums of the original per-message loop exactly.
+
+Running totals can be seeded from a previous batch (see utils/symbol_state_store.py),
+in which case the cumsum continues from the seed instead of restarting at zero.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+
+def direction_columns(symbols, timestamps, prices, quantities, buyer_maker, initial_totals=None):
+    """
+    Compute the derived columns for one batch. Inputs are equal-length sequences;
+    outputs are arrays aligned with the input order.
+
+    buyer_maker = True means the taker sold (bearish), False means the taker bought.
+    cumulative_price_total and average_price accumulate per symbol in timestamp order,
+    starting from initial_totals[symbol] = (cumulative_price, trade_count) when given.
+
+    Returns (columns, totals) where totals maps each symbol in the batch to its
+    (cumulative_price, trade_count) after the batch.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    buyer_maker = np.asarray(buyer_maker, dtype=bool)
+    count = len(prices)
+
+    trade_value_usd = prices * quantities
+    sell_value = np.where(buyer_maker, trade_value_usd, 0.0)
+    buy_value = np.where(buyer_maker, 0.0, trade_value_usd)
+    net_buy_pressure = buy_value - sell_value
+    trade_side = np.where(buyer_maker, "SELL", "BUY")
+
+    # Stable sort by symbol then timestamp, the same order as sorted(key=(symbol, timestamp))
+    symbol_names, symbol_codes = np.unique(np.asarray(symbols, dtype=object).astype(str), return_inverse=True)
+    order = np.lexsort((np.asarray(timestamps), symbol_codes))
+    sorted_codes = symbol_codes[order]
+    sorted_prices = prices[order]
+
+    cumulative_sorted = np.empty(count, dtype=np.float64)
+    trade_count_sorted = np.empty(count, dtype=np.float64)
+    group_starts = np.flatnonzero(np.r_[count > 0, sorted_codes[1:] != sorted_codes[:-1]])
+    group_ends = np.r_[group_starts[1:], count]
+    totals = {}
+    for start, end in zip(group_starts, group_ends):
+        symbol = str(symbol_names[sorted_codes[start]])
+        initial_price, initial_count = (initial_totals or {}).get(symbol, (0.0, 0))
+        if initial_count:
+            # Prepend the seed so the running sum is accumulated in the same order as a single loop
+            cumulative_sorted[start:end] = np.cumsum(np.r_[initial_price, sorted_prices[start:end]])[1:]
+        else:
+            cumulative_sorted[start:end] = np.cumsum(sorted_prices[start:end])
+        trade_count_sorted[start:end] = np.arange(initial_count + 1, initial_count + end - start + 1)
+        totals[symbol] = (float(cumulative_sorted[end - 1]), int(trade_count_sorted[end - 1]))
+
+    cumulative_price_total = np.empty(count, dtype=np.float64)
+    cumulative_price_total[order] = cumulative_sorted
+    average_price = np.empty(count, dtype=np.float64)
+    average_price[order] = cumulative_sorted / trade_count_sorted
+
+    columns = {
+        "trade_value_usd": trade_value_usd,
+        "buy_value": buy_value,
+        "sell_value": sell_value,
+        "trade_side": trade_side,
+        "net_buy_pressure": net_buy_pressure,
+        "cumulative_price_total": cumulative_price_total,
+        "average_price": average_price,
+    }
+    return columns, totals
+
+
+def add_direction_values(messages: List[Dict], state=None) -> List[Dict]:
+    """
+    Add the derived columns to each message dict in place and return the messages.
+    With a SymbolStateStore, running totals continue from and are saved back to the store.
+    """
+    if not messages:
+        return messages
+
+    columns, totals = direction_columns(
+        [message["symbol"] for message in messages],
+        [message["timestamp"] for message in messages],
+        [message["price"] for message in messages],
+        [message["quantity"] for message in messages],
+        [message["buyer_maker"] for message in messages],
+        initial_totals=state.totals() if state is not None else None,
+    )
+
+    names = list(columns)
+    for message, values in zip(messages, zip(*(columns[name].tolist() for name in names))):
+        message.update(zip(names, values))
+
+    if state is not None:
+        state.update_totals(totals)
+
+    return messages
@@ -0,0 +1,226 @@
+"""
+Incremental sliding and hopping window indicators over the trade stream.
+
+Each (symbol, window) pair keeps its trades in a two-stack FIFO aggregator: pushing a
+trade and evicting the oldest one are amortized O(1), and the window aggregate (trade
+count, volume, notional, buy/sell value, high, low) is read in O(1) without re-scanning
+the window or subtracting floats. VWAP and buy/sell imbalance are derived from it.
+
+Trades may arrive out of order. They are held in a reorder buffer until the watermark
+(highest trade time seen minus allowed_lateness_ms) passes them, then released to the
+windows in event-time order. Trades older than the watermark are late and are dropped
+and counted.
+
+Sliding windows emit the window ending at the watermark for every symbol touched by a
+batch. Hopping windows emit once per hop boundary the watermark crosses.
+"""
+import heapq
+import itertools
+from typing import NamedTuple, Optional
+
+from utils.process_instances import shared_instance
+
+_NEG_INF = float("-inf")
+_POS_INF = float("inf")
+
+# (trade_count, volume, notional, buy_value, sell_value, high, low)
+_EMPTY = (0, 0.0, 0.0, 0.0, 0.0, _NEG_INF, _POS_INF)
+
+
+def _combine(a, b):
+    return (
+        a[0] + b[0],
+        a[1] + b[1],
+        a[2] + b[2],
+        a[3] + b[3],
+        a[4] + b[4],
+        a[5] if a[5] >= b[5] else b[5],
+        a[6] if a[6] <= b[6] else b[6],
+    )
+
+
+class WindowSpec(NamedTuple):
+    name: str
+    size_ms: int
+    hop_ms: Optional[int] = None    # None for a sliding window
+
+
+DEFAULT_WINDOWS = (
+    WindowSpec("1s", 1_000),
+    WindowSpec("10s", 10_000),
+    WindowSpec("60s", 60_000),
+    WindowSpec("5m", 300_000),
+)
+
+
+class TwoStackAggregator:
+    """FIFO of (timestamp, aggregate) with O(1) amortized push, pop and whole-queue aggregate"""
+
+    def __init__(self):
+        # Oldest item on top; each entry carries the aggregate of itself and every newer entry below it
+        self._front = []
+        self._back = []
+        self._back_aggregate = _EMPTY
+
+    def __len__(self):
+        return len(self._front) + len(self._back)
+
+    def push(self, timestamp, value):
+        self._back.append((timestamp, value))
+        self._back_aggregate = _combine(self._back_aggregate, value)
+
+    def oldest_timestamp(self):
+        if self._front:
+            return self._front[-1][0]
+        if self._back:
+            return self._back[0][0]
+        return None
+
+    def pop(self):
+        if not self._front:
+            aggregate = _EMPTY
+            for timestamp, value in reversed(self._back):
+                aggregate = _combine(value, aggregate)
+                self._front.append((timestamp, aggregate))
+            self._back.clear()
+            self._back_aggregate = _EMPTY
+        self._front.pop()
+
+    def evict_through(self, cutoff):
+        """Remove every item with timestamp <= cutoff"""
+        while True:
+            oldest = self.oldest_timestamp()
+            if oldest is None or oldest > cutoff:
+                return
+            self.pop()
+
+    def aggregate(self):
+        if self._front:
+            return _combine(self._front[-1][1], self._back_aggregate)
+        return self._back_aggregate
+
+
+def _indicator(symbol, spec, window_end, aggregate):
+    trade_count, volume, notional, buy_value, sell_value, high, low = aggregate
+    directional = buy_value + sell_value
+    return {
+        "symbol": symbol,
+        "window": spec.name,
+        "window_type": "sliding" if spec.hop_ms is None else "hopping",
+        "window_start": window_end - spec.size_ms,
+        "window_end": window_end,
+        "trade_count": trade_count,
+        "volume": volume,
+        "notional": notional,
+        "vwap": notional / volume if volume else None,
+        "buy_value": buy_value,
+        "sell_value": sell_value,
+        "imbalance": (buy_value - sell_value) / directional if directional else None,
+        "high": high if trade_count else None,
+        "low": low if trade_count else None,
+    }
+
+
+class OrderFlowEngine:
+    """Multi-horizon VWAP and order-flow indicators for the outputs of calculate_direction_trade_values"""
+
+    def __init__(self, windows=DEFAULT_WINDOWS, allowed_lateness_ms=2_000):
+        self.windows = tuple(WindowSpec(*spec) for spec in windows)
+        self.allowed_lateness_ms = allowed_lateness_ms
+        self.max_event_time = None
+        self.watermark = None
+        self.late_trades = 0
+        self._pending = []
+        self._sequence = itertools.count()
+        self._aggregators = {}      # (symbol, window name) -> TwoStackAggregator
+        self._next_boundary = {}    # (symbol, window name) -> next hop boundary to emit
+
+    def _aggregators_for(self, symbol):
+        aggregators = []
+        for spec in self.windows:
+            key = (symbol, spec.name)
+            aggregator = self._aggregators.get(key)
+            if aggregator is None:
+                aggregator = self._aggregators[key] = TwoStackAggregator()
+            aggregators.append((spec, aggregator))
+        return aggregators
+
+    def process(self, trades):
+        """Add a batch of trades and return the indicator records it produces"""
+        for trade in trades:
+            timestamp = trade["timestamp"]
+            if self.watermark is not None and timestamp <= self.watermark:
+                self.late_trades += 1
+                continue
+            if self.max_event_time is None or timestamp > self.max_event_time:
+                self.max_event_time = timestamp
+
+            price = trade["price"]
+            quantity = trade["quantity"]
+            notional = trade.get("trade_value_usd", price * quantity)
+            value = (1, quantity, notional, trade.get("buy_value", 0.0), trade.get("sell_value", 0.0), price, price)
+            heapq.heappush(self._pending, (timestamp, next(self._sequence), trade["symbol"], value))
+
+        if self.max_event_time is None:
+            return []
+        return self._advance(self.max_event_time - self.allowed_lateness_ms)
+
+    def flush(self):
+        """Release every buffered trade regardless of lateness, e.g. on shutdown"""
+        if self.max_event_time is None:
+            return []
+        return self._advance(self.max_event_time)
+
+    def _advance(self, watermark):
+        if self.watermark is not None and watermark <= self.watermark:
+            return []
+
+        records = []
+        touched = set()
+        pending = self._pending
+        while pending and pending[0][0] <= watermark:
+            timestamp, _, symbol, value = heapq.heappop(pending)
+            touched.add(symbol)
+            for spec, aggregator in self._aggregators_for(symbol):
+                if spec.hop_ms is not None:
+                    records.extend(self._emit_hops(symbol, spec, aggregator, timestamp))
+                aggregator.evict_through(timestamp - spec.size_ms)
+                aggregator.push(timestamp, value)
+
+        self.watermark = watermark
+
+        for symbol in sorted(touched):
+            for spec, aggregator in self._aggregators_for(symbol):
+                if spec.hop_ms is None:
+                    aggregator.evict_through(watermark - spec.size_ms)
+                    records.append(_indicator(symbol, spec, watermark, aggregator.aggregate()))
+                else:
+                    records.extend(self._emit_hops(symbol, spec, aggregator, watermark + 1))
+        return records
+
+    def _emit_hops(self, symbol, spec, aggregator, before):
+        """Emit every hop window of this symbol that ends before the given event time"""
+        key = (symbol, spec.name)
+        boundary = self._next_boundary.get(key)
+        if boundary is None:
+            # First trade for this symbol: the first window ends at the next hop boundary
+            self._next_boundary[key] = (before // spec.hop_ms + 1) * spec.hop_ms
+            return []
+
+        records = []
+        while boundary < before:
+            aggregator.evict_through(boundary - spec.size_ms)
+            aggregate = aggregator.aggregate()
+            if aggregate[0] == 0:
+                # No trades remain after this boundary, so every window up to `before` is empty
+                boundary = -(-before // spec.hop_ms) * spec.hop_ms
+                break
+            records.append(_indicator(symbol, spec, boundary, aggregate))
+            boundary += spec.hop_ms
+        self._next_boundary[key] = boundary
+        return records
+
+
+def get_order_flow_engine(name="default", **kwargs):
+    """The process-wide engine called name; kwargs apply only when it is first created"""
+    return shared_instance((OrderFlowEngine, name), lambda: OrderFlowEngine(**kwargs))
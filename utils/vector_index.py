@@ -0,0 +1,247 @@
+"""
+Vector search over document chunks for the search_document MCP tool.
+
+Chunks are embedded once into a float32 matrix of unit vectors. Embedders share one
+call, embed(texts) -> np.ndarray, so the model is pluggable:
+    HashingEmbedder              deterministic feature hashing of stemmed terms and term
+                                 bigrams; no model download, used in tests and as fallback
+    SentenceTransformerEmbedder  any local sentence-transformers model on CPU (optional)
+
+VectorIndex searches exactly below exact_threshold chunks. Above it, an IVF index
+clusters the vectors with spherical k-means and stores each cluster contiguously, so a
+query scores only the nprobe nearest clusters. The index can be saved next to the
+chunks and is reused while the chunk fingerprint and embedder match.
+
+hybrid_search fuses BM25 and cosine scores over the union of both candidate lists.
+"""
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+
+import numpy as np
+
+from utils.bm25_index import tokenize
+
+try:
+    import sentence_transformers
+except ImportError:
+    sentence_transformers = None
+
+
+class HashingEmbedder:
+    """Signed feature hashing of terms and adjacent-term bigrams with sublinear tf weights"""
+
+    def __init__(self, dim=384, bigram_weight=0.5):
+        self.dim = dim
+        self.bigram_weight = bigram_weight
+        self.name = f"hashing-{dim}"
+        self._buckets = {}
+
+    def _bucket(self, feature):
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            bucket = self._buckets[feature] = (value % self.dim, 1.0 if value >> 63 else -1.0)
+        return bucket
+
+    def embed(self, texts):
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        stem_cache = {}
+        for row, text in enumerate(texts):
+            terms = tokenize(text, stem_cache)
+            features = Counter(terms)
+            if self.bigram_weight:
+                for bigram, count in Counter(zip(terms, terms[1:])).items():
+                    features[" ".join(bigram)] += count * self.bigram_weight
+            vector = vectors[row]
+            for feature, count in features.items():
+                index, sign = self._bucket(feature)
+                vector[index] += sign * (1 + math.log(count)) if count >= 1 else sign * count
+        return _normalize_rows(vectors)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64):
+        if sentence_transformers is None:
+            raise ImportError("sentence-transformers is not installed; use the hashing embedder instead")
+        self.model = sentence_transformers.SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.name = f"sentence-transformers:{model_name}"
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                    normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def get_embedder(name="hashing"):
+    """"hashing", "hashing-<dim>" or "sentence-transformers:<model name>" """
+    if name.startswith("sentence-transformers:"):
+        return SentenceTransformerEmbedder(name.split(":", 1)[1])
+    if name == "hashing":
+        return HashingEmbedder()
+    if name.startswith("hashing-"):
+        return HashingEmbedder(dim=int(name.split("-", 1)[1]))
+    raise ValueError(f"Unknown embedder {name!r}")
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """Positions of the k highest scores, best first, ties to the lower position"""
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.int64)
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def chunk_fingerprint(chunk_ids, texts):
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk_id, text in zip(chunk_ids, texts):
+        digest.update(f"{chunk_id}\x00".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+def _spherical_kmeans(vectors, clusters, iterations, rng):
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters from random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class VectorIndex:
+    def __init__(self, embeddings, nlist=None, nprobe=8, exact_threshold=4096, seed=0,
+                 embedder_name=None, fingerprint=None, _ivf=None):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.nprobe = nprobe
+        self.embedder_name = embedder_name
+        self.fingerprint = fingerprint
+        self.centroids = None
+        self._rows = None       # cluster-ordered position -> row
+        self._offsets = None    # cluster c occupies positions offsets[c]:offsets[c + 1]
+        self._clustered = None  # embeddings in cluster order
+
+        if _ivf is not None:
+            self.centroids, self._rows, self._offsets = _ivf
+        elif len(self.embeddings) >= exact_threshold:
+            self._build_ivf(nlist or int(4 * math.sqrt(len(self.embeddings))), np.random.default_rng(seed))
+        if self.centroids is not None:
+            self._clustered = self.embeddings[self._rows]
+
+    def _build_ivf(self, nlist, rng):
+        sample_size = min(len(self.embeddings), nlist * 64)
+        sample = self.embeddings[rng.choice(len(self.embeddings), sample_size, replace=False)]
+        self.centroids = _spherical_kmeans(sample, nlist, 10, rng)
+        assignments = np.argmax(self.embeddings @ self.centroids.T, axis=1)
+        self._rows = np.argsort(assignments, kind="stable")
+        self._offsets = np.searchsorted(assignments[self._rows], np.arange(nlist + 1))
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def similarities(self, query_vector, rows):
+        return self.embeddings[rows] @ query_vector
+
+    def search(self, query_vector, k=3):
+        """Return [(row, cosine similarity)] for the k nearest rows, best first"""
+        if not len(self.embeddings):
+            return []
+        if self.centroids is None:
+            scores = self.embeddings @ query_vector
+            best = _top_k(scores, k)
+            return [(int(row), float(scores[row])) for row in best]
+
+        probes = _top_k(self.centroids @ query_vector, self.nprobe)
+        positions = np.concatenate([np.arange(self._offsets[c], self._offsets[c + 1]) for c in probes])
+        scores = self._clustered[positions] @ query_vector
+        rows = self._rows[positions]
+        best = _top_k(scores, k)
+        if not len(best):
+            return []
+        # Keep everything tied with the k-th best and order ties by row, so results do not depend on cluster layout
+        tied = np.flatnonzero(scores >= scores[best[-1]])
+        ranked = sorted(zip(rows[tied].tolist(), scores[tied].tolist()), key=lambda hit: (-hit[1], hit[0]))
+        return [(row, float(score)) for row, score in ranked[:k]]
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {"embeddings": self.embeddings}
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, rows=self._rows, offsets=self._offsets)
+        meta = {"embedder": self.embedder_name, "fingerprint": self.fingerprint, "nprobe": self.nprobe}
+        temporary = f"{path}.tmp.npz"
+        np.savez(temporary, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            ivf = (data["centroids"], data["rows"], data["offsets"]) if "centroids" in data else None
+            return cls(data["embeddings"], nprobe=meta["nprobe"], embedder_name=meta["embedder"],
+                       fingerprint=meta["fingerprint"], _ivf=ivf)
+
+
+def load_or_build_index(embedder, chunk_ids, texts, path=None, fingerprint=None, **kwargs):
+    """
+    Reuse the index saved at path if it was built from the same chunks and embedder. Pass a
+    fingerprint that already identifies the chunks (e.g. a corpus generation) to skip hashing them.
+    """
+    if fingerprint is None:
+        texts = list(texts)
+        fingerprint = chunk_fingerprint(chunk_ids, texts)
+    if path and os.path.exists(path):
+        try:
+            index = VectorIndex.load(path)
+            if index.fingerprint == fingerprint and index.embedder_name == embedder.name:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = VectorIndex(embedder.embed(texts), embedder_name=embedder.name, fingerprint=fingerprint, **kwargs)
+    if path:
+        index.save(path)
+    return index
+
+
+def hybrid_search(bm25, vectors, query, query_vector, k=3, alpha=0.5, candidates=50):
+    """
+    Fuse BM25 and vector scores: alpha * cosine + (1 - alpha) * bm25 / max bm25, computed
+    over the union of each method's top candidates. Returns [(row, fused, bm25, cosine)].
+    """
+    bm25_scores = bm25.scores(query)
+    bm25_rows = [row for row in _top_k(bm25_scores, candidates).tolist() if bm25_scores[row] > 0]
+    vector_rows = [row for row, _ in vectors.search(query_vector, candidates)]
+    rows = np.asarray(sorted(set(bm25_rows) | set(vector_rows)), dtype=np.int64)
+    if not len(rows):
+        return []
+
+    lexical = bm25_scores[rows].astype(np.float64)
+    top_lexical = lexical.max()
+    if top_lexical > 0:
+        lexical = lexical / top_lexical
+    cosine = np.clip(vectors.similarities(query_vector, rows), 0.0, 1.0)
+    fused = alpha * cosine + (1 - alpha) * lexical
+    best = _top_k(fused, k)
+    return [(int(rows[i]), float(fused[i]), float(bm25_scores[rows[i]]), float(cosine[i])) for i in best]